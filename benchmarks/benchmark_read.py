@@ -0,0 +1,112 @@
+"""
+Times ExcelParser's loading of a workbook with each available read engine, side by side,
+with & without a dtype override for the report text column.
+
+Run with:
+    python benchmarks/benchmark_read.py [--rows 20000] [--repeat 3]
+    python benchmarks/benchmark_read.py --workbook <file.xlsx> --sheet <name> --column <name>
+
+If no workbook is given, a synthetic one with echo-style report text is generated.
+"""
+import argparse
+import importlib.util
+import os
+import random
+import tempfile
+import time
+
+import openpyxl
+
+from excelpostprocessor.excel_postprocessor import ExcelParser
+
+SHEET_NAME = "Patients"
+SOURCE_COLUMN = "REPORT"
+
+
+def make_workbook(filename: str, rows: int, seed: int = 0) -> None:
+    """Writes a synthetic workbook whose report column looks like our echo reports.
+
+    Parameters
+    ----------
+    filename : str
+    rows : int
+    seed : int
+    """
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    sheet = wb.create_sheet(SHEET_NAME)
+    sheet.append(["MRN", "Exam Type", SOURCE_COLUMN])
+
+    for mrn in range(rows):
+        report = (
+            f"Date of Exam: {rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(1990, 2023)}. "
+            f"LV EF MOD BP: {rng.randint(10, 80)}% LVIDd: {rng.uniform(1, 7):.2f} cm "
+            f"TAPSE (2D): {rng.uniform(1, 3):.2f} cm RVSP/PASP: {rng.randint(15, 90)} mmHg "
+            + "Normal left ventricular size and function. " * rng.randint(1, 6)
+        )
+        sheet.append([mrn, rng.choice(["Echo", "IVUS", "Stress"]), report])
+
+    wb.save(filename)
+
+
+def time_load(
+    filename: str, sheet_name: str, engine: str, dtype: dict, repeat: int
+) -> float:
+    """Best-of-N wall time to instantiate an ExcelParser.
+
+    Returns
+    -------
+    seconds : float
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ExcelParser(
+            excel_filename=filename, sheet_name=sheet_name, engine=engine, dtype=dtype
+        )
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workbook", help="Existing workbook to time.")
+    parser.add_argument("--sheet", default=SHEET_NAME, help="Sheet to read.")
+    parser.add_argument(
+        "--column", default=SOURCE_COLUMN, help="Report text column for dtype."
+    )
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic rows.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filename = args.workbook
+
+        if not filename:
+            filename = os.path.join(temp_dir, "benchmark.xlsx")
+            make_workbook(filename=filename, rows=args.rows)
+
+        engines = ["openpyxl"]
+
+        if importlib.util.find_spec("python_calamine"):
+            engines.append("calamine")
+
+        print(f"{'engine':<10} {'dtype':<8} {'seconds':>8}")
+
+        for engine in engines:
+            for dtype in [None, {args.column: "string"}]:
+                seconds = time_load(
+                    filename=filename,
+                    sheet_name=args.sheet,
+                    engine=engine,
+                    dtype=dtype,
+                    repeat=args.repeat,
+                )
+                label = "string" if dtype else "inferred"
+                print(f"{engine:<10} {label:<8} {seconds:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,28 @@
     Excel Postprocessor applies Regular Expressions to an existing Excel workbook, extracting data into a new column.
 """
 import argparse
+import json
 import sys
+from typing import Union
 
-from excelpostprocessor.parser_runner import ParserRunner
+#   These modules import pandas & openpyxl only once a workbook is processed,
+#   so '--help' & '--check-config' return quickly.
+from excelpostprocessor.memory_planner import parse_size
+from excelpostprocessor.parser_runner import ESTIMATE_SAMPLE_ROWS, ParserRunner
+from excelpostprocessor.pipeline import PipelineRunner
+from excelpostprocessor.service import DEFAULT_PORT, ParserService
+from excelpostprocessor.watcher import FolderWatcher
 
 CONFIG_FILENAME = "excel_postprocess.xml"
 
+#   Modes other than processing the config file's workbook, in the order main() looks for them.
+MODES = ("check_config", "estimate", "profile", "serve", "spool", "watch", "workbook")
 
-def main(config_filename: str) -> None:
-    runner = ParserRunner(config_filename=config_filename)
-    runner.process()
+#   Options only used when processing the config file's workbook.
+RUN_OPTIONS = ("config_cache", "checkpoint", "memory_budget", "resume", "write_workers")
 
 
-if __name__ == "__main__":
+def build_argument_parser() -> argparse.ArgumentParser:
     #   Handle 'help' case.
     parser = argparse.ArgumentParser(
         description=r"""
@@ -47,6 +56,35 @@ if __name__ == "__main__":
             excel_postprocess.exe --config <name of config file.xml>
 
         If the config file name is not specified, app will look for the default file excel_postprocess.xml.
+
+        To check a config file for mistakes without processing the workbook, run:
+            excel_postprocess.exe --config <name of config file.xml> --check-config
+
+        To keep the app running & accept many jobs without paying its startup cost each time, run:
+            excel_postprocess.exe --serve [--port 8765]
+        and send it lines of JSON like {"config": "a.xml", "workbook": "b.xlsx"}, or run:
+            excel_postprocess.exe --spool <directory>
+        and drop job files with the same JSON into the directory.
+
+        To process workbooks as they land in a directory, run:
+            excel_postprocess.exe --watch <directory> --match "echo_*.xlsx=echo.xml" --match "*.xlsx=other.xml"
+        Without --match, every .xlsx file is processed with the --config file.
+
+        To see roughly how long a run will take, how much memory it needs & how large its outputs will be,
+        from a sample of each sheet's rows, without processing the workbook, run:
+            excel_postprocess.exe --config <name of config file.xml> --estimate [--sample-rows 1000]
+
+        To time every pattern on every row & save the slowest patterns & rows, with the constructs
+        in each pattern that make it backtrack, as JSON (for CI to compare from run to run), run:
+            excel_postprocess.exe --config <name of config file.xml> --profile profile.json
+
+        To keep each sheet within a memory budget, processing it whole, in chunks or streamed
+        as its size (read from the workbook before loading it) calls for, run:
+            excel_postprocess.exe --config <name of config file.xml> --memory-budget 8G
+
+        To process many workbooks with one config file, overlapping the reading of one
+        with the parsing & writing of others, run:
+            excel_postprocess.exe --config <name of config file.xml> --workbook a.xlsx --workbook b.xlsx
         """,
         epilog="""The app creates a new Excel workbook for each worksheet to be processed.""",
         formatter_class=argparse.RawTextHelpFormatter,
@@ -55,7 +93,512 @@ if __name__ == "__main__":
     parser.add_argument(
         "--config", default=CONFIG_FILENAME, help="Name of XML config file."
     )
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="Validate the config file & exit without processing the workbook.",
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="Estimate the run's time, memory & output size from a sample of rows & exit.",
+    )
+    parser.add_argument(
+        "--sample-rows",
+        type=int,
+        default=ESTIMATE_SAMPLE_ROWS,
+        help="For --estimate: rows sampled from each sheet. .xlsx sheets are streamed only as far as "
+        "the last row sampled; other formats are still read whole to take the sample.",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="Time every pattern on every row, save the results as JSON in this file & exit.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a service, accepting jobs over a local socket.",
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="Port for --serve."
+    )
+    parser.add_argument(
+        "--spool", help="Run as a service, running job files dropped in this directory."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2, help="Jobs run at once in service mode."
+    )
+    parser.add_argument(
+        "--watch", help="Process workbooks as they land in this directory."
+    )
+    parser.add_argument(
+        "--match",
+        action="append",
+        metavar="PATTERN=CONFIG",
+        help="For --watch: config file for workbooks whose names match the pattern.",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="For --watch: seconds a file must stay unchanged before it's processed.",
+    )
+    parser.add_argument(
+        "--config-cache",
+        metavar="DIRECTORY",
+        help="Keep the compiled config in this directory, so later runs skip parsing it.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="Note each sheet finished in a journal next to the workbook, so the run can be resumed.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the sheets an earlier, checkpointed run already finished (& keep checkpointing).",
+    )
+    parser.add_argument(
+        "--write-workers",
+        type=int,
+        default=0,
+        help="Processes writing output workbooks in the background while the next sheet is processed.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=memory_budget,
+        metavar="SIZE",
+        help="Memory each sheet may use, like 8G or 512MB: picks in-memory, chunked or streamed processing.",
+    )
+    parser.add_argument(
+        "--workbook",
+        action="append",
+        help="Process this workbook instead of the one named in the config file (may be repeated).",
+    )
+    return parser
+
+
+def memory_budget(text: str) -> int:
+    """Reads the --memory-budget argument.
+
+    Parameters
+    ----------
+    text : str  Like '8G', '512MB' or a number of bytes.
+
+    Returns
+    -------
+    budget : int    Bytes.
+    """
+    try:
+        return parse_size(text=text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def watch_rules(matches: Union[list, None], config_filename: str) -> list:
+    """Turns the --match arguments into (filename pattern, config filename) pairs.
+
+    Parameters
+    ----------
+    matches : list of str or None
+    config_filename : str   Used for all .xlsx files if there are no --match arguments.
+
+    Returns
+    -------
+    rules : list of (str, str)
+    """
+    if not matches:
+        return [("*.xlsx", config_filename)]
+
+    rules = []
+
+    for match in matches:
+        pattern, separator, config = match.partition("=")
+
+        if not separator or not pattern or not config:
+            raise SyntaxError(f"Expected --match PATTERN=CONFIG, not '{match}'.")
+
+        rules.append((pattern, config))
+
+    return rules
+
+
+def check_config(config_filename: str) -> bool:
+    """Validates the config file, including its regular expressions, without reading the workbook.
+
+    Parameters
+    ----------
+    config_filename : str
+
+    Returns
+    -------
+    valid : bool
+    """
+    try:
+        plan = ParserRunner(config_filename=config_filename).plan()
+    except (FileExistsError, SyntaxError, TypeError) as e:
+        print(f"Config file '{config_filename}' is not valid: {e}")
+        return False
+
+    num_rules = sum(
+        len(sheet_plan.cleaning) + len(sheet_plan.extracts)
+        for sheet_plan in plan.sheets
+    )
+    print(
+        f"Config file '{config_filename}' is valid: "
+        f"{len(plan.sheets)} sheet(s), {num_rules} rule(s)."
+    )
+    return True
+
+
+def estimate(config_filename: str, sample_rows: int) -> bool:
+    """Prints an estimate of the run's time, peak memory & output size, flagging the costliest rules.
+
+    Parameters
+    ----------
+    config_filename : str
+    sample_rows : int
+
+    Returns
+    -------
+    estimated : bool
+    """
+    try:
+        run_estimate = ParserRunner(config_filename=config_filename).estimate(
+            sample_rows=sample_rows
+        )
+    except (FileExistsError, SyntaxError, TypeError) as e:
+        print(f"Unable to estimate with config file '{config_filename}': {e}")
+        return False
+
+    for sheet in run_estimate["sheets"]:
+        if sheet.get("skipped"):
+            continue
+
+        print(
+            f"Sheet '{sheet['sheet']}': {sheet['rows']:,} rows (sampled {sheet['sample_rows']:,}), "
+            f"about {format_seconds(sheet['seconds'])}, "
+            f"peak memory {format_bytes(sheet['peak_memory_bytes'])}, "
+            f"output {format_bytes(sheet['output_bytes'])}."
+        )
+
+        for rule in sheet["rules"]:
+            if rule["dominant"]:
+                label = " ".join(filter(None, (rule["rule"], rule["new_column"])))
+                print(
+                    f"    {rule['share']:.0%} of rule time: {label} "
+                    f"'{rule['pattern'] or '(pattern list)'}'"
+                )
+
+    print(
+        f"Total: about {format_seconds(run_estimate['seconds'])}, "
+        f"peak memory {format_bytes(run_estimate['peak_memory_bytes'])}, "
+        f"output {format_bytes(run_estimate['output_bytes'])}."
+    )
+    return True
+
+
+def format_bytes(size: float) -> str:
+    """Shows a size in the largest unit that keeps it at least 1, like '1.5 GB'.
+
+    Parameters
+    ----------
+    size : float    Bytes.
+
+    Returns
+    -------
+    text : str
+    """
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+
+        size /= 1024
+
+    return f"{size:.1f} TB"
+
+
+def format_seconds(seconds: float) -> str:
+    """Shows a duration as hours, minutes & seconds, like '1h 05m' or '3m 20s'.
+
+    Parameters
+    ----------
+    seconds : float
+
+    Returns
+    -------
+    text : str
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+
+    return f"{seconds}s"
+
+
+def profile(config_filename: str, report_filename: str) -> bool:
+    """Profiles the rules, saves the report & prints the slowest patterns.
+
+    Parameters
+    ----------
+    config_filename : str
+    report_filename : str
+
+    Returns
+    -------
+    profiled : bool
+    """
+    try:
+        run_profile = ParserRunner(config_filename=config_filename).profile()
+    except (FileExistsError, SyntaxError, TypeError) as e:
+        print(f"Unable to profile with config file '{config_filename}': {e}")
+        return False
+
+    with open(report_filename, "w", encoding="utf-8") as file:
+        json.dump(run_profile, file, indent=2)
+
+    for pattern in run_profile["slowest_patterns"][:5]:
+        hotspots = ", ".join(pattern["hotspots"]) or "none found"
+        print(
+            f"{pattern['seconds']:.3f}s in sheet '{pattern['sheet']}': "
+            f"'{pattern['pattern']}' (backtracking: {hotspots})"
+        )
+
+    print(f"Profile saved in '{report_filename}'.")
+    return True
+
+
+def process(
+    config_filename: str,
+    write_workers: int,
+    cache_directory: Union[str, None],
+    memory_budget: Union[int, None],
+    resume: bool,
+    checkpoint: bool,
+) -> bool:
+    """Processes the workbook named in the config file.
+
+    Parameters
+    ----------
+    config_filename : str
+    write_workers : int
+    cache_directory : str or None
+    memory_budget : int or None
+    resume : bool
+    checkpoint : bool
+
+    Returns
+    -------
+    succeeded : bool    False if any background write failed.
+    """
+    runner = ParserRunner(
+        config_filename=config_filename,
+        write_workers=write_workers,
+        cache_directory=cache_directory,
+        memory_budget=memory_budget,
+    )
+    runner.process(resume=resume, checkpoint=checkpoint)
+    succeeded = True
+
+    for sheet_stats in runner.flush():
+        if sheet_stats.get("error"):
+            print(f"Unable to write '{sheet_stats['sheet']}': {sheet_stats['error']}")
+            succeeded = False
+
+    return succeeded
+
+
+def process_workbooks(config_filename: str, workbooks: list) -> bool:
+    """Processes many workbooks with one config file, overlapping their reading, parsing & writing.
+
+    Parameters
+    ----------
+    config_filename : str
+    workbooks : list of str
+
+    Returns
+    -------
+    succeeded : bool    False if any workbook (or sheet) failed.
+    """
+    jobs = [(config_filename, workbook) for workbook in workbooks]
+    results = PipelineRunner().run(jobs=jobs)
+
+    for result in results:
+        if result.get("error"):
+            print(f"Unable to process '{result['source']}': {result['error']}")
+
+    return all(result["success"] for result in results)
+
+
+def reject_ignored_options(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> None:
+    """Stops with a usage error if options are given that the mode picked would ignore.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+    args : argparse.Namespace
+    """
+    mode = next((mode for mode in MODES if getattr(args, mode)), None)
+    ignored = [option for option in RUN_OPTIONS if getattr(args, option)]
+
+    if mode is not None and ignored:
+        parser.error(
+            f"--{mode.replace('_', '-')} can't be used with "
+            + ", ".join("--" + option.replace("_", "-") for option in ignored)
+            + "."
+        )
+
+
+def run_mode(args: argparse.Namespace) -> bool:
+    """Runs the mode the arguments ask for: the first of MODES given, or else processes
+    the config file's workbook.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    Returns
+    -------
+    succeeded : bool
+    """
+    if args.check_config:
+        return check_config(config_filename=args.config)
+
+    if args.estimate:
+        return estimate(config_filename=args.config, sample_rows=args.sample_rows)
+
+    if args.profile:
+        return profile(config_filename=args.config, report_filename=args.profile)
+
+    if args.serve:
+        return serve(port=args.port, workers=args.workers)
+
+    if args.spool:
+        return spool(spool_directory=args.spool, workers=args.workers)
+
+    if args.watch:
+        return watch(
+            directory=args.watch,
+            rules=watch_rules(matches=args.match, config_filename=args.config),
+            workers=args.workers,
+            debounce_seconds=args.debounce,
+        )
+
+    if args.workbook:
+        return process_workbooks(config_filename=args.config, workbooks=args.workbook)
+
+    return process(
+        config_filename=args.config,
+        write_workers=args.write_workers,
+        cache_directory=args.config_cache,
+        memory_budget=args.memory_budget,
+        resume=args.resume,
+        checkpoint=args.checkpoint,
+    )
+
+
+def serve(port: int, workers: int) -> bool:
+    """Accepts jobs over a local socket until interrupted.
+
+    Parameters
+    ----------
+    port : int
+    workers : int
+
+    Returns
+    -------
+    succeeded : bool
+    """
+    service = ParserService(workers=workers)
+
+    try:
+        service.serve_socket(port=port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+    return True
+
+
+def spool(spool_directory: str, workers: int) -> bool:
+    """Runs the job files dropped in a directory until interrupted.
+
+    Parameters
+    ----------
+    spool_directory : str
+    workers : int
+
+    Returns
+    -------
+    succeeded : bool
+    """
+    service = ParserService(workers=workers)
+
+    try:
+        service.serve_spool(spool_directory=spool_directory)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+    return True
+
+
+def watch(directory: str, rules: list, workers: int, debounce_seconds: float) -> bool:
+    """Processes workbooks as they land in a directory, until interrupted.
+
+    Parameters
+    ----------
+    directory : str
+    rules : list of (str, str)  See watch_rules().
+    workers : int
+    debounce_seconds : float
+
+    Returns
+    -------
+    succeeded : bool
+    """
+    watcher = FolderWatcher(
+        directory=directory,
+        rules=rules,
+        workers=workers,
+        debounce_seconds=debounce_seconds,
+    )
+
+    try:
+        watcher.watch()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    return True
+
+
+def main(argv: Union[list, None] = None) -> None:
+    parser = build_argument_parser()
 
     # https://stackoverflow.com/a/47440202
-    args = parser.parse_args(args=None if sys.argv[1:] else ["--help"])
-    main(config_filename=args.config)
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parser.parse_args(args=argv if argv else ["--help"])
+    reject_ignored_options(parser=parser, args=args)
+    succeeded = run_mode(args=args)
+
+    #   Checks & reports always exit with their status; the other modes only signal failure.
+    if not succeeded or args.check_config or args.estimate or args.profile:
+        sys.exit(0 if succeeded else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Module: contains class CheckpointJournal, which records the sheets a run has finished
+so a rerun with --resume can skip them.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Union
+
+from excelpostprocessor.plan import SheetPlan, WorkbookPlan
+
+CHECKPOINT_SUFFIX = "_checkpoint"
+JOURNAL_VERSION = 1
+
+#   Bytes hashed at a time, so large outputs aren't read into memory whole.
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_hash(filename: str) -> str:
+    """Hashes a file's contents.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    sha256 : str    Hex digest.
+    """
+    sha256 = hashlib.sha256()
+
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+def journal_filename(source_file: str) -> str:
+    """Names the journal kept for a workbook: next to it & its outputs.
+
+    Parameters
+    ----------
+    source_file : str
+
+    Returns
+    -------
+    journal_filename : str
+    """
+    name = os.path.splitext(os.path.basename(source_file))[0]
+    return os.path.join(
+        os.path.dirname(source_file), name + CHECKPOINT_SUFFIX + ".json"
+    )
+
+
+class CheckpointJournal:
+    """
+    A JSON file next to the outputs, kept when a run asks for checkpoints (or resumes), listing each finished sheet with the fingerprint of the rules
+    & source it was made from and the hash of the workbook written. It's rewritten (atomically)
+    as each sheet finishes, so it survives the run crashing.
+    """
+
+    def __init__(self, filename: str, resume: bool = False) -> None:
+        """Starts a journal, or reopens one to resume from.
+
+        Parameters
+        ----------
+        filename : str
+        resume : bool   Keep the sheets already recorded in the file. Otherwise start afresh.
+        """
+        if not isinstance(filename, str):
+            raise TypeError("Argument 'filename' is not the expected str.")
+
+        self.__filename = filename
+        self.__sheets: dict = {}
+
+        if resume:
+            self.__sheets = self.__read()
+
+    def completed(self, sheet_name: str, fingerprint: str) -> Union[dict, None]:
+        """Looks for a sheet finished by an earlier run from the same rules & source,
+        whose output is still there, unchanged.
+
+        Parameters
+        ----------
+        sheet_name : str
+        fingerprint : str   From fingerprint().
+
+        Returns
+        -------
+        entry : dict or None    The sheet's 'output', 'rows' & any 'diagnostics', or None to redo it.
+        """
+        entry = self.__sheets.get(sheet_name)
+
+        if not isinstance(entry, dict) or entry.get("fingerprint") != fingerprint:
+            return None
+
+        for key in ("output", "diagnostics"):
+            filename = entry.get(key)
+
+            if filename is None and key == "diagnostics":
+                continue
+
+            if not isinstance(filename, str) or not os.path.isfile(filename):
+                return None
+
+            if file_hash(filename) != entry.get(key + "_sha256"):
+                return None
+
+        return entry
+
+    def filename(self) -> str:
+        """Where the journal is kept.
+
+        Returns
+        -------
+        filename : str
+        """
+        return self.__filename
+
+    @staticmethod
+    def fingerprint(plan: WorkbookPlan, sheet_plan: SheetPlan, source_file: str) -> str:
+        """Identifies everything a sheet's output depends on: its rules, the settings that
+        change the results & the source workbook's size and modification time.
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        sheet_plan : SheetPlan
+        source_file : str
+
+        Returns
+        -------
+        fingerprint : str
+        """
+        stat = os.stat(source_file)
+        text = repr(
+            (
+                JOURNAL_VERSION,
+                os.path.abspath(source_file),
+                stat.st_size,
+                stat.st_mtime_ns,
+                plan.engine,
+                plan.string_storage,
+                plan.diagnostics,
+                sheet_plan,
+            )
+        )
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __read(self) -> dict:
+        """Reads the sheets recorded in the journal file, if there is a usable one.
+
+        Returns
+        -------
+        sheets : dict   Sheet name -> entry.
+        """
+        try:
+            with open(self.__filename, encoding="utf-8") as file:
+                journal = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(journal, dict) or journal.get("version") != JOURNAL_VERSION:
+            return {}
+
+        sheets = journal.get("sheets")
+        return sheets if isinstance(sheets, dict) else {}
+
+    def record(
+        self,
+        sheet_name: str,
+        fingerprint: str,
+        output: str,
+        rows: int,
+        diagnostics: Union[str, None] = None,
+    ) -> None:
+        """Notes a finished sheet & saves the journal.
+
+        Parameters
+        ----------
+        sheet_name : str
+        fingerprint : str               From fingerprint().
+        output : str                    The workbook written.
+        rows : int
+        diagnostics : Optional str      The diagnostics workbook written, if any.
+        """
+        self.__sheets[sheet_name] = {
+            "fingerprint": fingerprint,
+            "output": output,
+            "output_sha256": file_hash(output),
+            "rows": rows,
+            "diagnostics": diagnostics,
+            "diagnostics_sha256": None
+            if diagnostics is None
+            else file_hash(diagnostics),
+        }
+
+        #   Write a new file & swap it in, so a crash mid-write can't leave half a journal.
+        #   The new file's name is unique, so runs on the same workbook don't write over each other's.
+        handle, temp_filename = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.__filename)),
+            prefix=os.path.basename(self.__filename) + ".",
+            suffix=".tmp",
+        )
+
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                json.dump(
+                    {"version": JOURNAL_VERSION, "sheets": self.__sheets},
+                    file,
+                    indent=2,
+                )
+
+            os.replace(temp_filename, self.__filename)
+        except BaseException:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+
+            raise
@@ -0,0 +1,282 @@
+"""
+Module: contains class ColumnStore, which moves large text columns out of the Python heap
+into memory-mapped Arrow (Feather) files.
+"""
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+from typing import TYPE_CHECKING, NamedTuple, Union
+
+from excelpostprocessor.input_engine import _module_available
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas
+
+#   Columns smaller than this stay in memory; mapping them isn't worth a file.
+DEFAULT_MIN_BYTES = 16 * 1024 * 1024
+FILE_EXTENSION = ".feather"
+
+
+class MappedFrame(NamedTuple):
+    """
+    A DataFrame with its memory-mapped columns replaced by references to their files,
+    so it can be pickled to another process without copying those columns.
+    """
+
+    frame: "pandas.DataFrame"
+    mapped: dict
+    columns: list
+
+
+class ColumnStore:
+    """
+    Writes large text columns to uncompressed Feather files & reads them back memory-mapped.
+    The operating system then pages the text in & out as needed, so a sheet can be larger than RAM,
+    & any process that opens the same file shares the pages instead of receiving a pickled copy.
+    """
+
+    def __init__(
+        self, directory: Union[str, None] = None, min_bytes: int = DEFAULT_MIN_BYTES
+    ) -> None:
+        """Sets up the store.
+
+        Parameters
+        ----------
+        directory : Optional str    Where to put the files. If not specified, uses a new temporary
+                                        directory, removed by close() or when Python exits.
+        min_bytes : int             Leave columns smaller than this in memory.
+        """
+        if not _module_available("pyarrow"):
+            raise ImportError("Spilling columns to disk needs pyarrow to be installed.")
+
+        if not isinstance(min_bytes, int) or min_bytes < 0:
+            raise TypeError("Argument 'min_bytes' is not the expected int >= 0.")
+
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="excelpostprocessor_")
+            self.__remove_directory = True
+            atexit.register(shutil.rmtree, directory, True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.__remove_directory = False
+
+        self.__directory = directory
+        self.__min_bytes = min_bytes
+        self.__counter = itertools.count()
+        self.__prefix = f"column_{os.getpid()}_{id(self)}_"
+
+        #   filename -> pyarrow.ChunkedArray read from it, to recognize columns already mapped.
+        self.__files: dict = {}
+
+    def __getstate__(self) -> dict:
+        #   Pickle the settings, not the mapped arrays: the copy reopens files as it needs them.
+        state = self.__dict__.copy()
+        state["_ColumnStore__files"] = {}
+        state["_ColumnStore__counter"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+
+        #   Files made by this copy are named apart from the original's, but under its prefix,
+        #   so the original's close() removes them too. The directory stays the original's to remove.
+        self.__counter = itertools.count()
+        self.__prefix = f"{self.__prefix}{os.getpid()}_{id(self)}_"
+        self.__remove_directory = False
+
+    def close(self) -> None:
+        """Removes the files written through this store (& the directory, if it was made for it)."""
+        self.__files.clear()
+
+        if self.__remove_directory:
+            shutil.rmtree(self.__directory, ignore_errors=True)
+            return
+
+        for filename in os.listdir(self.__directory):
+            if filename.startswith(self.__prefix) and filename.endswith(FILE_EXTENSION):
+                try:
+                    os.remove(os.path.join(self.__directory, filename))
+                except OSError:  # pragma: no cover
+                    #   Still mapped somewhere (Windows won't delete those).
+                    pass
+
+    def dehydrate(self, df: "pandas.DataFrame") -> MappedFrame:
+        """Swaps a DataFrame's memory-mapped columns for their filenames, ready for pickling.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+
+        Returns
+        -------
+        mapped_frame : MappedFrame
+        """
+        mapped = {}
+
+        for column_name in df.columns:
+            filename = self.filename(df[column_name])
+
+            if filename is not None:
+                mapped[column_name] = (filename, df[column_name].dtype)
+
+        return MappedFrame(
+            frame=df.drop(columns=list(mapped)),
+            mapped=mapped,
+            columns=list(df.columns),
+        )
+
+    def directory(self) -> str:
+        """Where the files go.
+
+        Returns
+        -------
+        directory : str
+        """
+        return self.__directory
+
+    def filename(self, column: "pandas.Series") -> Union[str, None]:
+        """Finds the file a column is mapped from.
+
+        Parameters
+        ----------
+        column : pandas.Series
+
+        Returns
+        -------
+        filename : str or None  None if the column is held in memory.
+        """
+        arrow_array = getattr(column.array, "__arrow_array__", None)
+
+        if arrow_array is None:
+            return None
+
+        chunked_array = arrow_array()
+
+        for filename, mapped_array in self.__files.items():
+            if mapped_array is chunked_array:
+                mapped_filename: str = filename
+                return mapped_filename
+
+        return None
+
+    def map(self, column: "pandas.Series") -> "pandas.Series":
+        """Moves a large text column into a memory-mapped file.
+
+        Parameters
+        ----------
+        column : pandas.Series
+
+        Returns
+        -------
+        column : pandas.Series  The same values, as Arrow-backed strings read from the file,
+                                    or the column unchanged if it's small, not text or already mapped.
+        """
+        import pandas
+        import pyarrow
+        import pyarrow.feather
+
+        if self.filename(column) is not None:
+            return column
+
+        if column.memory_usage(index=False, deep=True) < self.__min_bytes:
+            return column
+
+        if pandas.api.types.infer_dtype(column, skipna=True) != "string":
+            return column
+
+        if (
+            isinstance(column.dtype, pandas.StringDtype)
+            and column.dtype.storage == "pyarrow"
+        ):
+            dtype = column.dtype
+        else:
+            dtype = pandas.StringDtype(storage="pyarrow")
+
+        filename = os.path.join(
+            self.__directory,
+            f"{self.__prefix}{next(self.__counter)}{FILE_EXTENSION}",
+        )
+        #   Arrow-backed columns are handed over as they are, without making Python strings.
+        values = pyarrow.array(column, from_pandas=True)
+
+        if values.type != pyarrow.large_string():
+            values = values.cast(pyarrow.large_string())
+
+        pyarrow.feather.write_feather(
+            pyarrow.table({"values": values}), filename, compression="uncompressed"
+        )
+        del values
+        return self.__open(
+            filename=filename, dtype=dtype, index=column.index, name=column.name
+        )
+
+    def map_frame(self, df: "pandas.DataFrame") -> "pandas.DataFrame":
+        """Maps each of a DataFrame's large text columns.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+
+        Returns
+        -------
+        df : pandas.DataFrame
+        """
+        for column_name in df.columns:
+            column = df[column_name]
+            mapped_column = self.map(column)
+
+            if mapped_column is not column:
+                df[column_name] = mapped_column
+
+        return df
+
+    def __open(
+        self,
+        filename: str,
+        dtype: "pandas.StringDtype",
+        index: "pandas.Index",
+        name: object,
+    ) -> "pandas.Series":
+        """Reads a column file memory-mapped, without copying the text onto the heap.
+
+        Parameters
+        ----------
+        filename : str
+        dtype : pandas.StringDtype
+        index : pandas.Index
+        name : column name
+
+        Returns
+        -------
+        column : pandas.Series
+        """
+        import pandas
+        import pyarrow.feather
+
+        chunked_array = pyarrow.feather.read_table(filename, memory_map=True).column(0)
+        self.__files[filename] = chunked_array
+        return pandas.Series(
+            dtype.__from_arrow__(chunked_array), index=index, name=name
+        )
+
+    def rehydrate(self, mapped_frame: MappedFrame) -> "pandas.DataFrame":
+        """Undoes dehydrate, mapping the columns' files again (in this process, if it's another).
+
+        Parameters
+        ----------
+        mapped_frame : MappedFrame
+
+        Returns
+        -------
+        df : pandas.DataFrame
+        """
+        df = mapped_frame.frame.copy(deep=False)
+
+        for column_name, (filename, dtype) in mapped_frame.mapped.items():
+            df[column_name] = self.__open(
+                filename=filename, dtype=dtype, index=df.index, name=column_name
+            )
+
+        return df[mapped_frame.columns]
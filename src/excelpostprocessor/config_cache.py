@@ -0,0 +1,126 @@
+"""
+Module: contains class PlanCache, which keeps compiled configs on disk so that separate processes
+running the same config don't each parse & validate it again.
+"""
+import hashlib
+import os
+import pickle
+from typing import Union
+
+from excelpostprocessor.plan import (
+    CleaningRule,
+    ExtractRule,
+    RowFilter,
+    SheetPlan,
+    WorkbookPlan,
+)
+
+#   Changes whenever the plan classes do, so plans pickled by another version are ignored.
+PLAN_LAYOUT = repr(
+    (
+        WorkbookPlan._fields,
+        SheetPlan._fields,
+        RowFilter._fields,
+        CleaningRule._fields,
+        ExtractRule._fields,
+    )
+)
+CACHE_EXTENSION = ".plan"
+
+
+class PlanCache:
+    """
+    Stores each config's WorkbookPlan pickled in a directory, keyed by the config file's path
+    & checked against a hash of its contents. Only point it at a directory you trust:
+    loading a pickle can run code.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Sets up the cache.
+
+        Parameters
+        ----------
+        directory : str     Made if it doesn't exist.
+        """
+        if not isinstance(directory, str):
+            raise TypeError("Argument 'directory' is not the expected str.")
+
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+
+    def __filename(self, config_filename: str) -> str:
+        """Names the cache file for a config file.
+
+        Parameters
+        ----------
+        config_filename : str
+
+        Returns
+        -------
+        filename : str
+        """
+        key = hashlib.sha256(
+            os.path.abspath(config_filename).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.__directory, key[:32] + CACHE_EXTENSION)
+
+    def load(
+        self, config_filename: str, content_hash: str
+    ) -> Union[WorkbookPlan, None]:
+        """Gets a config's cached plan, if it was compiled from the same contents.
+
+        Parameters
+        ----------
+        config_filename : str
+        content_hash : str      Hash of the config file as it is now.
+
+        Returns
+        -------
+        plan : WorkbookPlan or None
+        """
+        try:
+            with open(self.__filename(config_filename=config_filename), "rb") as file:
+                layout, cached_hash, plan = pickle.load(file)
+        except (
+            OSError,
+            EOFError,
+            pickle.UnpicklingError,
+            #   Pickled by a version of the app with other classes.
+            AttributeError,
+            ImportError,
+            IndexError,
+            TypeError,
+            ValueError,
+        ):
+            return None
+
+        if layout != PLAN_LAYOUT or cached_hash != content_hash:
+            return None
+
+        if not isinstance(plan, WorkbookPlan):
+            return None
+
+        return plan
+
+    def save(self, config_filename: str, content_hash: str, plan: WorkbookPlan) -> None:
+        """Stores a config's plan.
+
+        Parameters
+        ----------
+        config_filename : str
+        content_hash : str      Hash of the config file the plan was compiled from.
+        plan : WorkbookPlan
+        """
+        filename = self.__filename(config_filename=config_filename)
+
+        #   Write a new file & swap it in, so another process never reads half a plan.
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+
+        with open(temp_filename, "wb") as file:
+            pickle.dump(
+                (PLAN_LAYOUT, content_hash, plan),
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+        os.replace(temp_filename, filename)
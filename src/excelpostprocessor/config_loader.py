@@ -0,0 +1,93 @@
+"""
+Module: reads config .xml files into the nested dicts the runner validates,
+streaming very large files instead of holding their text & whole tree in memory.
+"""
+import os
+from typing import Union
+
+from excelpostprocessor.input_engine import _module_available
+
+#   Config files at least this large are parsed incrementally.
+STREAMING_MIN_BYTES = 1024 * 1024
+
+
+def parse_config(filename: str, streaming: Union[bool, None] = None) -> dict:
+    """Parses a config file into nested dicts shaped as xmltodict.parse makes them:
+    an element with only text becomes its text, attributes become '@name' keys,
+    text beside attributes or children becomes '#text' & a repeated element becomes a list.
+
+    Parameters
+    ----------
+    filename : str
+    streaming : Optional bool   Parse incrementally with iterparse (lxml's, if installed). If not specified,
+                                    does so for files of at least STREAMING_MIN_BYTES.
+
+    Returns
+    -------
+    config : dict
+    """
+    if streaming is None:
+        streaming = os.path.getsize(filename) >= STREAMING_MIN_BYTES
+
+    if not streaming:
+        import xmltodict
+
+        with open(filename, "r", encoding="utf-8") as file:
+            parsed: dict = xmltodict.parse(file.read())
+
+        return parsed
+
+    if _module_available("lxml"):
+        from lxml.etree import iterparse
+    else:
+        from xml.etree.ElementTree import iterparse
+
+    #   One [attributes & children so far] dict per element being read.
+    stack: list = [{}]
+
+    for event, element in iterparse(filename, events=("start", "end")):
+        if not isinstance(element.tag, str):
+            #   lxml reports comments & processing instructions too.
+            continue
+
+        if event == "start":
+            stack.append({"@" + key: value for key, value in element.attrib.items()})
+            continue
+
+        item = stack.pop()
+        text = "".join(
+            [element.text or ""] + [child.tail or "" for child in element]
+        ).strip()
+
+        if not item:
+            value: Union[dict, str, None] = text or None
+        else:
+            if text:
+                item["#text"] = text
+
+            value = item
+
+        _add_child(parent=stack[-1], tag=element.tag, value=value)
+
+        #   Children are done with once their parent is; drop them to keep memory flat.
+        del element[:]
+
+    config: dict = stack[0]
+    return config
+
+
+def _add_child(parent: dict, tag: str, value: Union[dict, str, None]) -> None:
+    """Adds an element's value to its parent's dict, making a list if the tag repeats.
+
+    Parameters
+    ----------
+    parent : dict
+    tag : str
+    value : dict, str or None
+    """
+    if tag not in parent:
+        parent[tag] = value
+    elif isinstance(parent[tag], list):
+        parent[tag].append(value)
+    else:
+        parent[tag] = [parent[tag], value]
@@ -0,0 +1,244 @@
+"""
+Module: contains class MatchDiagnostics, which tallies how well each rule matched
+& writes a side report with a sample of the rows nothing matched.
+"""
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas
+
+#   The side report is named after the sheet's output workbook, plus this.
+DIAGNOSTICS_SUFFIX = "_diagnostics"
+DEFAULT_SAMPLE_SIZE = 10
+
+#   Longest text Excel will hold in a cell.
+MAX_CELL_LENGTH = 32767
+
+
+class MatchDiagnostics:
+    """
+    Collects per-rule (and per-pattern) match counts & timings while ExcelParser runs its rules,
+    from the results it computes anyway rather than by matching the text again.
+    """
+
+    def __init__(
+        self, sample_size: int = DEFAULT_SAMPLE_SIZE, seed: Union[int, None] = None
+    ) -> None:
+        """Starts with no rules recorded.
+
+        Parameters
+        ----------
+        sample_size : int       Unmatched rows kept per extract rule.
+        seed : Optional int     Makes the sample repeatable.
+        """
+        if not isinstance(sample_size, int) or sample_size < 0:
+            raise TypeError("Argument 'sample_size' is not the expected int >= 0.")
+
+        self.__sample_size = sample_size
+        self.__seed = seed
+        self.__rules: list = []
+        self.__unmatched: list = []
+
+    def record_cleaning(
+        self, column_name: str, pattern: str, changed: int, seconds: float
+    ) -> None:
+        """Notes one cleaning rule.
+
+        Parameters
+        ----------
+        column_name : str
+        pattern : str
+        changed : int       Rows the rule changed.
+        seconds : float
+        """
+        self.__rules.append(
+            {
+                "column": column_name,
+                "rule": "cleaning",
+                "new_column": None,
+                "pattern": pattern,
+                "alternative": None,
+                "rows": None,
+                "matches": changed,
+                "nulls": None,
+                "seconds": seconds,
+            }
+        )
+
+    def record_extract(
+        self,
+        source: "pandas.Series",
+        new_column: str,
+        extracted: Union["pandas.Series", "pandas.DataFrame"],
+        alternatives: list,
+        seconds: float,
+    ) -> None:
+        """Notes one extract rule & samples the rows it didn't match.
+
+        Parameters
+        ----------
+        source : pandas.Series      The source column, as it was matched.
+        new_column : str
+        extracted : pandas.Series or DataFrame  The rule's result, with nulls where nothing matched.
+        alternatives : list of (str, int, float)    (pattern, matches, seconds) for each pattern tried.
+        seconds : float
+        """
+        rows = len(extracted)
+        matched = extracted.notna()
+
+        if matched.ndim > 1:
+            #   Several groups: a row counts as matched if any of them was found.
+            matched = matched.any(axis=1)
+
+        matches = int(matched.sum())
+
+        for index, (pattern, pattern_matches, pattern_seconds) in enumerate(
+            alternatives
+        ):
+            self.__rules.append(
+                {
+                    "column": source.name,
+                    "rule": "extract",
+                    "new_column": new_column,
+                    "pattern": pattern,
+                    "alternative": index + 1 if len(alternatives) > 1 else None,
+                    "rows": rows,
+                    "matches": pattern_matches,
+                    "nulls": rows - pattern_matches,
+                    "seconds": pattern_seconds,
+                }
+            )
+
+        if len(alternatives) > 1:
+            #   And a line for the pattern list as a whole.
+            self.__rules.append(
+                {
+                    "column": source.name,
+                    "rule": "extract",
+                    "new_column": new_column,
+                    "pattern": None,
+                    "alternative": "all",
+                    "rows": rows,
+                    "matches": matches,
+                    "nulls": rows - matches,
+                    "seconds": seconds,
+                }
+            )
+
+        unmatched = source[~matched.to_numpy()]
+
+        if self.__sample_size and len(unmatched) > self.__sample_size:
+            unmatched = unmatched.sample(
+                n=self.__sample_size, random_state=self.__seed
+            ).sort_index()
+        elif not self.__sample_size:
+            unmatched = unmatched.iloc[:0]
+
+        for position, text in zip(unmatched.index.tolist(), unmatched.tolist()):
+            self.__unmatched.append(
+                {
+                    "new_column": new_column,
+                    "row": position,
+                    "text": text,
+                }
+            )
+
+    def rules(self) -> list:
+        """The per-rule counts recorded so far, with each extract's match rate.
+
+        Returns
+        -------
+        rules : list of dict
+        """
+        rules = []
+
+        for rule in self.__rules:
+            rule = dict(rule)
+
+            if rule["rows"]:
+                rule["match_rate"] = rule["matches"] / rule["rows"]
+            else:
+                rule["match_rate"] = None
+
+            rules.append(rule)
+
+        return rules
+
+    def unmatched(self) -> list:
+        """The sample of source rows that extract rules didn't match.
+
+        Returns
+        -------
+        unmatched : list of dict    'new_column', 'row' (DataFrame index) & 'text'.
+        """
+        return list(self.__unmatched)
+
+    def write(self, filename: str) -> str:
+        """Writes the side report: a 'Rules' sheet of counts & an 'Unmatched' sheet of sample rows.
+
+        Parameters
+        ----------
+        filename : str
+
+        Returns
+        -------
+        filename : str
+        """
+        import openpyxl
+        import pandas
+
+        wb_obj = openpyxl.Workbook(write_only=True)
+        rules_sheet = wb_obj.create_sheet("Rules")
+        rules_sheet.append(
+            [
+                "Column",
+                "Rule",
+                "New column",
+                "Pattern",
+                "Alternative",
+                "Rows",
+                "Matches",
+                "Nulls",
+                "Match rate",
+                "Seconds",
+            ]
+        )
+
+        for rule in self.rules():
+            rules_sheet.append(
+                [
+                    rule["column"],
+                    rule["rule"],
+                    rule["new_column"],
+                    rule["pattern"],
+                    rule["alternative"],
+                    rule["rows"],
+                    rule["matches"],
+                    rule["nulls"],
+                    rule["match_rate"],
+                    rule["seconds"],
+                ]
+            )
+
+        unmatched_sheet = wb_obj.create_sheet("Unmatched")
+
+        #   Spreadsheet row numbers, counting the header row, are easier to look up than DataFrame indexes.
+        unmatched_sheet.append(["New column", "Row", "Text"])
+
+        for sample in self.__unmatched:
+            row = sample["row"]
+
+            if isinstance(row, int):
+                row += 2
+
+            text = sample["text"]
+
+            if isinstance(text, str):
+                text = text[:MAX_CELL_LENGTH]
+            elif pandas.isna(text):
+                text = None
+
+            unmatched_sheet.append([sample["new_column"], row, text])
+
+        wb_obj.save(filename)
+        return filename
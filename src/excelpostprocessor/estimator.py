@@ -0,0 +1,190 @@
+"""
+Module: contains class RunEstimator, which times a config's rules on a random sample of each sheet's rows
+& scales the results up, so a long run can be sized before it's started.
+"""
+import random
+import time
+import tracemalloc
+from typing import Union
+
+from excelpostprocessor.diagnostics import MatchDiagnostics
+from excelpostprocessor.excel_postprocessor import ExcelParser
+from excelpostprocessor.input_engine import InputEngine
+from excelpostprocessor.parser_runner import ESTIMATE_SAMPLE_ROWS, ParserRunner
+from excelpostprocessor.plan import SheetPlan, WorkbookPlan
+
+#   The costliest rules are flagged until together they account for this share of a sheet's rule time.
+DOMINANT_SHARE = 0.8
+
+
+class RunEstimator:
+    """
+    Reads a random sample of a sheet's rows, runs the sheet's rules on it & writes the results
+    to memory, timing each step, then scales the timings, memory & output size up to the whole sheet.
+    Everything is assumed to grow in proportion to the rows, so treat the figures as rough.
+    """
+
+    def __init__(
+        self, sample_rows: int = ESTIMATE_SAMPLE_ROWS, seed: Union[int, None] = None
+    ) -> None:
+        """Sets up the estimator.
+
+        Parameters
+        ----------
+        sample_rows : int       Rows read from each sheet.
+        seed : Optional int     Makes the sample repeatable.
+        """
+        if not isinstance(sample_rows, int) or sample_rows < 1:
+            raise TypeError("Argument 'sample_rows' is not the expected positive int.")
+
+        self.__sample_rows = sample_rows
+        self.__seed = seed
+
+    @staticmethod
+    def __dominant_rules(rules: list) -> list:
+        """Works out each rule's share of the rule time & flags the ones that dominate it.
+
+        Parameters
+        ----------
+        rules : list of dict    From MatchDiagnostics.rules(), with 'seconds' already scaled up.
+
+        Returns
+        -------
+        rules : list of dict    'rule', 'new_column', 'pattern', 'seconds', 'share' & 'dominant'.
+        """
+        total_seconds = sum(rule["seconds"] for rule in rules)
+        costliest_first = sorted(
+            range(len(rules)), key=lambda index: rules[index]["seconds"], reverse=True
+        )
+        dominant = set()
+        share_so_far = 0.0
+
+        for index in costliest_first:
+            if not total_seconds or share_so_far >= DOMINANT_SHARE:
+                break
+
+            dominant.add(index)
+            share_so_far += rules[index]["seconds"] / total_seconds
+
+        return [
+            {
+                "rule": rule["rule"],
+                "new_column": rule["new_column"],
+                "pattern": rule["pattern"],
+                "seconds": rule["seconds"],
+                "share": rule["seconds"] / total_seconds if total_seconds else None,
+                "dominant": index in dominant,
+            }
+            for index, rule in enumerate(rules)
+        ]
+
+    def estimate_sheet(
+        self, plan: WorkbookPlan, sheet_plan: SheetPlan, source_file: str
+    ) -> dict:
+        """Estimates what processing one sheet will take.
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        sheet_plan : SheetPlan
+        source_file : str
+
+        Returns
+        -------
+        estimate : dict     'sheet', 'rows', 'sample_rows', 'read_seconds', 'rules_seconds',
+                                'write_seconds', 'seconds', 'peak_memory_bytes', 'output_bytes'
+                                & 'rules' (see __dominant_rules).
+
+        Raises
+        ------
+        ValueError  If the sheet isn't in the workbook.
+        """
+        input_engine = InputEngine(filename=source_file, engine=plan.engine)
+        rng = random.Random(self.__seed)
+
+        start = time.perf_counter()
+        rows = input_engine.row_count(sheet_name=sheet_plan.name)
+
+        if rows is None or rows <= self.__sample_rows:
+            #   Small, or no cheap way to count: read it all & sample from that.
+            df = input_engine.read(sheet_name=sheet_plan.name, dtype=sheet_plan.dtype)
+            rows = len(df)
+
+            if rows > self.__sample_rows:
+                df = df.iloc[sorted(rng.sample(range(rows), self.__sample_rows))]
+        else:
+            #   An .xlsx sheet is streamed up to the last row sampled, keeping only the sample.
+            #   Other formats are still read through to pick the sample out, which takes about as long
+            #   as reading them whole.
+            df = input_engine.read(
+                sheet_name=sheet_plan.name,
+                dtype=sheet_plan.dtype,
+                rows=set(rng.sample(range(rows), self.__sample_rows)),
+            )
+
+        read_seconds = time.perf_counter() - start
+        scale = rows / len(df) if len(df) else 0.0
+        input_bytes = int(df.memory_usage(deep=True).sum())
+
+        diagnostics = MatchDiagnostics(sample_size=0)
+        excel_parser = ExcelParser.from_dataframe(
+            df=df,
+            sheet_name=sheet_plan.name,
+            string_storage=plan.string_storage,
+            diagnostics=diagnostics,
+            chunk_rows=plan.chunk_rows,
+        )
+
+        start = time.perf_counter()
+        excel_parser = ParserRunner.apply_rules(
+            excel_parser=ParserRunner.filter_rows(
+                excel_parser=excel_parser, sheet_plan=sheet_plan
+            ),
+            sheet_plan=sheet_plan,
+        )
+        rules_seconds = time.perf_counter() - start
+        results_bytes = int(excel_parser.data().memory_usage(deep=True).sum())
+
+        start = time.perf_counter()
+        output_bytes = len(excel_parser.to_bytes())
+        write_seconds = time.perf_counter() - start
+
+        #   A workbook with no rows, to separate the fixed part of the output from the part that grows.
+        empty_bytes = len(
+            ExcelParser.from_dataframe(
+                df=excel_parser.data().iloc[:0], sheet_name=sheet_plan.name
+            ).to_bytes()
+        )
+
+        #   openpyxl holds every cell as a Python object until the workbook is saved.
+        tracemalloc.start()
+
+        try:
+            excel_parser.to_bytes()
+            _, write_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        rules = [
+            dict(rule, seconds=rule["seconds"] * scale)
+            for rule in diagnostics.rules()
+            #   Just the rule as a whole, not each of its alternative patterns.
+            if rule["alternative"] in (None, "all")
+        ]
+        estimate = {
+            "sheet": sheet_plan.name,
+            "rows": rows,
+            "sample_rows": len(df),
+            "read_seconds": read_seconds,
+            "rules_seconds": rules_seconds * scale,
+            "write_seconds": write_seconds * scale,
+            "peak_memory_bytes": int(
+                (input_bytes + results_bytes + write_bytes) * scale
+            ),
+            "output_bytes": int(
+                empty_bytes + max(output_bytes - empty_bytes, 0) * scale
+            ),
+            "rules": self.__dominant_rules(rules=rules),
+            "seconds": read_seconds + rules_seconds * scale + write_seconds * scale,
+        }
+        return estimate
@@ -1,50 +1,191 @@
 """
 Moodule: contains class ExcelParser.
 """
+import io
 import os
-from typing import Union
+import time
+from typing import BinaryIO, Callable, Union
 
+import numpy
 import openpyxl
+import openpyxl.styles
+import openpyxl.utils
+import openpyxl.worksheet.worksheet
 import pandas
 
+from excelpostprocessor.column_store import ColumnStore
+from excelpostprocessor.diagnostics import MatchDiagnostics
+from excelpostprocessor.input_engine import STRING_STORAGES, InputEngine
+from excelpostprocessor.shared_columns import SharedColumns, read_rows
+
+#   Excel's rules for worksheet names.
+INVALID_TITLE_CHARACTERS = "[]:*?/\\"
+MAX_TITLE_LENGTH = 31
+
+#   Output column widths (in characters) fit most of a column's values, from a sample of its rows,
+#   within these bounds: a few very long values (like the reports) don't make a column huge.
+WIDTH_SAMPLE_ROWS = 1000
+WIDTH_QUANTILE = 0.9
+MIN_COLUMN_WIDTH = 8
+MAX_COLUMN_WIDTH = 60
+HEADER_STYLE_NAME = "Results header"
+
 
 class ExcelParser:
     """
     Reads existing Excel spreadsheet, parses desired targets & adds columns.
     """
 
+    #   Set by __setup, however the parser is made.
+    __df: pandas.DataFrame
+    __df_orig: pandas.DataFrame
+    __new_columns: dict
+    __order: Union[list, None]
+    __other_rows: Union[pandas.DataFrame, None]
+
     def __init__(
-        self, excel_filename: str, sheet_name: Union[str, None] = None
+        self,
+        excel_filename: str,
+        sheet_name: Union[str, None] = None,
+        engine: Union[str, None] = None,
+        dtype: Union[dict, None] = None,
+        string_storage: Union[str, None] = None,
+        diagnostics: Union[MatchDiagnostics, None] = None,
+        chunk_rows: Union[int, None] = None,
+        column_store: Union[ColumnStore, None] = None,
+        data: Union[bytes, None] = None,
     ) -> None:
         """Reads in one sheet of the Excel file.
 
         Parameters
         ----------
-        excel_filename : str        Name of existing Excel file
-        sheet_name : Optional str   If not specified, reads first sheet.
+        excel_filename : str        Name of existing Excel (.xlsx, .xlsm, .xlsb, .xls, .ods) or .csv file
+        sheet_name : Optional str   If not specified, reads the active sheet.
+        engine : Optional str       Reader to use, like 'calamine'. If not specified, picks the fastest installed.
+        dtype : Optional dict       Maps column names to dtypes, skipping type inference for those columns.
+        string_storage : Optional str   'pyarrow' or 'python': holds text columns as pandas.StringDtype
+                                        with this storage. If not specified, leaves them as read.
+        diagnostics : Optional MatchDiagnostics     Tallies each rule's matches & time as it runs.
+        chunk_rows : Optional int   Run rules on blocks of this many rows, so the temporary copies
+                                        pandas makes stay that size rather than the sheet's.
+        column_store : Optional ColumnStore     Holds the large text columns in memory-mapped files
+                                                    instead of on the heap. Call close() when done.
+        data : Optional bytes       The file's contents, already in memory (see from_bytes).
+                                        Then excel_filename need not exist: it just gives the format.
         """
         if not isinstance(excel_filename, str):
             raise TypeError("Argument 'excel_filename' is not the expected str.")
 
-        if not os.path.isfile(excel_filename):
+        if data is None and not os.path.isfile(excel_filename):
             raise FileNotFoundError(f"Unable to find file '{excel_filename}'.")
 
-        self.__excel_filename = excel_filename
+        if dtype is not None and not isinstance(dtype, dict):
+            raise TypeError("Argument 'dtype' is not the expected dict.")
+
+        input_engine = InputEngine(filename=excel_filename, engine=engine, data=data)
 
         if not isinstance(sheet_name, str):
             #   Look up active sheet name.
-            wb = openpyxl.load_workbook(self.__excel_filename)
-            sheet_name = wb.active.title
-            wb.close()
+            sheet_name = input_engine.active_sheet_name()
 
-        self.__sheet_name = sheet_name
-        self.__df: pandas.DataFrame = pandas.read_excel(
-            self.__excel_filename, sheet_name=sheet_name
+        self.__setup(
+            df=input_engine.read(sheet_name=sheet_name, dtype=dtype),
+            excel_filename=excel_filename,
+            sheet_name=sheet_name,
+            input_engine=input_engine,
+            string_storage=string_storage,
+            diagnostics=diagnostics,
+            chunk_rows=chunk_rows,
+            column_store=column_store,
         )
-        self.__df_orig: pandas.DataFrame = self.__df.copy()
 
-        if not isinstance(self.__df, pandas.DataFrame):  # pragma: no cover
-            raise RuntimeError(f"Unable to read file '{self.__excel_filename}'.")
+    def __getstate__(self) -> dict:
+        #   Memory-mapped columns travel to worker processes as filenames, not copies.
+        self.__assemble()
+        state = self.__dict__.copy()
+
+        if self.__column_store is not None:
+            for key in ("_ExcelParser__df", "_ExcelParser__df_orig"):
+                state[key] = self.__column_store.dehydrate(state[key])
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        column_store = state["_ExcelParser__column_store"]
+
+        if column_store is not None:
+            for key in ("_ExcelParser__df", "_ExcelParser__df_orig"):
+                state[key] = column_store.rehydrate(state[key])
+
+        self.__dict__.update(state)
+
+    def __assemble(self) -> None:
+        """Builds the DataFrame, in one go, from the columns added or replaced since it was last built."""
+        if self.__order is None:
+            return
+
+        index = self.__df.index
+        columns = {name: self.__column(column_name=name) for name in self.__order}
+
+        for name, column in columns.items():
+            if not column.index.equals(index):
+                raise ValueError(
+                    f"Column '{name}' isn't indexed like the sheet's rows."
+                )
+
+        #   Every column is indexed like the frame, so hand over the arrays as they are:
+        #   aligning the Series would copy them, & lose track of memory-mapped ones.
+        self.__df = pandas.DataFrame(
+            {name: column.array for name, column in columns.items()},
+            index=index,
+            copy=False,
+        )
+        self.__new_columns = {}
+        self.__order = None
+
+    @classmethod
+    def attach(
+        cls,
+        shared_columns: dict,
+        start: int,
+        stop: int,
+        sheet_name: str,
+        chunk_rows: Union[int, None] = None,
+    ) -> "ExcelParser":
+        """Builds a parser over some rows of columns another process published with publish(),
+        for running rules in a worker process without the whole sheet being pickled to it.
+
+        Parameters
+        ----------
+        shared_columns : dict   Column name -> SharedColumn, from SharedColumns.handles().
+        start : int             First row.
+        stop : int              One past the last row.
+        sheet_name : str
+        chunk_rows : Optional int
+
+        Returns
+        -------
+        excel_parser : ExcelParser  Holding just those rows of just those columns.
+        """
+        if not isinstance(shared_columns, dict):
+            raise TypeError("Argument 'shared_columns' is not the expected dict.")
+
+        excel_parser: ExcelParser = cls.__new__(cls)
+        excel_parser.__setup(
+            df=pandas.DataFrame(
+                {
+                    column_name: read_rows(
+                        shared_column=shared_column, start=start, stop=stop
+                    )
+                    for column_name, shared_column in shared_columns.items()
+                }
+            ),
+            excel_filename=sheet_name,
+            sheet_name=sheet_name,
+            input_engine=None,
+            chunk_rows=chunk_rows,
+        )
+        return excel_parser
 
     def clean_column(self, column_name: str, pattern: str, replace: str) -> None:
         """Use a regex to fix strings.
@@ -56,13 +197,186 @@ class ExcelParser:
         replace : str
         """
 
-        if column_name not in self.__df:
+        if not self.__has_column(column_name=column_name):
             raise AttributeError(f"Unable to find column '{column_name}' in DataFrame.")
 
-        revised_series = self.__df[column_name].str.replace(
-            pattern, replace, regex=True
-        )
-        self.__df[column_name] = revised_series
+        column = self.__column(column_name=column_name)
+        start = time.perf_counter()
+        changed = 0
+
+        def clean_block(block: pandas.Series) -> pandas.Series:
+            nonlocal changed
+            revised = self.__replace_block(
+                block=block, pattern=pattern, replace=replace
+            )
+
+            if self.__diagnostics is not None:
+                #   Counted block by block as the rule runs, rather than in another pass over the column.
+                changed += self.__changed_rows(before=block, after=revised)
+
+            return revised
+
+        revised_series = self.__by_chunks(source=column, function=clean_block)
+
+        if self.__diagnostics is not None:
+            self.__diagnostics.record_cleaning(
+                column_name=column_name,
+                pattern=pattern,
+                changed=changed,
+                seconds=time.perf_counter() - start,
+            )
+
+        self.__set_column(column_name=column_name, column=self.__map(revised_series))
+
+    def __by_chunks(
+        self,
+        source: pandas.Series,
+        function: Callable[[pandas.Series], Union[pandas.Series, pandas.DataFrame]],
+    ) -> Union[pandas.Series, pandas.DataFrame]:
+        """Applies a function to the whole column or, with chunk_rows set, to one block of rows
+        at a time, converting each block's result to the first block's types as it's produced.
+
+        Parameters
+        ----------
+        source : pandas.Series
+        function : callable    Takes a block of source rows, returns a Series or DataFrame with as many rows.
+
+        Returns
+        -------
+        result : pandas.Series or pandas.DataFrame  Indexed like the source.
+        """
+        if self.__chunk_rows is None or len(source) <= self.__chunk_rows:
+            return function(source)
+
+        blocks = []
+
+        for start in range(0, len(source), self.__chunk_rows):
+            end = start + self.__chunk_rows
+            block_result = function(source.iloc[start:end])
+
+            if blocks:
+                #   Typed per block, so there's never a full-length column of Python objects.
+                block_result = block_result.astype(
+                    blocks[0].dtypes.to_dict()
+                    if isinstance(block_result, pandas.DataFrame)
+                    else blocks[0].dtype
+                )
+
+            blocks.append(block_result)
+
+        result = pandas.concat(blocks)
+        result.index = source.index
+
+        if isinstance(result, pandas.Series):
+            result.name = source.name
+
+        return result
+
+    @staticmethod
+    def __changed_rows(before: pandas.Series, after: pandas.Series) -> int:
+        """Counts the rows a cleaning rule changed, comparing the values as they're typed.
+
+        Parameters
+        ----------
+        before : pandas.Series
+        after : pandas.Series   Indexed like before.
+
+        Returns
+        -------
+        changed : int
+        """
+        #   A missing value compares unequal (or as missing) to anything, even another missing value.
+        both_missing = before.isna().to_numpy() & after.isna().to_numpy()
+        differs = before.ne(after).to_numpy(dtype=bool, na_value=True)
+        return int((differs & ~both_missing).sum())
+
+    def chunk_rows(self) -> Union[int, None]:
+        """Allows read access to the number of rows the rules run on at a time, if they're chunked.
+
+        Returns
+        -------
+        chunk_rows : int or None
+        """
+        return self.__chunk_rows
+
+    def __column(self, column_name: str) -> pandas.Series:
+        """Gets a column's current values, whether or not the frame has been built with them yet.
+
+        Parameters
+        ----------
+        column_name : str
+
+        Returns
+        -------
+        column : pandas.Series
+        """
+        if column_name in self.__new_columns:
+            column: pandas.Series = self.__new_columns[column_name]
+            return column
+
+        return self.__df[column_name]
+
+    @staticmethod
+    def __column_names(new_column: Union[str, list, dict]) -> list:
+        """Lists the new column names, making sure they're the expected types.
+
+        Parameters
+        ----------
+        new_column : str, list of str or dict
+
+        Returns
+        -------
+        names : list of str
+        """
+        if isinstance(new_column, list):
+            names = new_column
+        elif isinstance(new_column, dict):
+            names = list(new_column.values())
+        else:
+            names = [new_column]
+
+        if not names or not all(isinstance(name, str) for name in names):
+            raise TypeError(
+                "Argument 'new_column' is not the expected str, list of str or dict."
+            )
+
+        return names
+
+    def close(self) -> None:
+        """Removes the files holding memory-mapped columns, if any. Call once the results are written."""
+        if self.__column_store is not None:
+            self.__column_store.close()
+
+    def __column_order(self) -> list:
+        """Gets the order the columns will be in when the frame is next built, to change in place.
+
+        Returns
+        -------
+        order : list
+        """
+        if self.__order is None:
+            self.__order = list(self.__df.columns)
+
+        return self.__order
+
+    def __convert_text_columns(self, string_storage: str) -> None:
+        """Converts the columns holding only text to pandas.StringDtype with the requested storage.
+        Columns mixing text with numbers or dates are left alone.
+
+        Parameters
+        ----------
+        string_storage : str    'pyarrow' or 'python'
+        """
+        string_dtype = pandas.StringDtype(storage=string_storage)
+
+        for column_name in self.__df.columns:
+            column = self.__df[column_name]
+
+            if column.dtype == string_dtype:
+                continue
+
+            if pandas.api.types.infer_dtype(column, skipna=True) == "string":
+                self.__df[column_name] = column.astype(string_dtype)
 
     def data(self) -> pandas.DataFrame:
         """Allows read access to self.__df.
@@ -71,8 +385,18 @@ class ExcelParser:
         -------
         df : pandas.DataFrame
         """
+        self.__assemble()
         return self.__df
 
+    def diagnostics(self) -> Union[MatchDiagnostics, None]:
+        """Allows read access to the match diagnostics, if they're being collected.
+
+        Returns
+        -------
+        diagnostics : MatchDiagnostics or None
+        """
+        return self.__diagnostics
+
     def extract(self, column_name: str, pattern: Union[str, list]) -> list:
         """Use a regex to extract data from a given column into a list.
 
@@ -83,21 +407,31 @@ class ExcelParser:
 
         Returns
         -------
-        extracted_data : list of str
+        extracted_data : list of str, or of tuples of str if the pattern has several groups
         """
         if not isinstance(column_name, str):
             raise TypeError("Argument 'column_name' is not the expected str.")
 
-        if column_name not in self.__df:
+        if not self.__has_column(column_name=column_name):
             raise AttributeError(f"Unable to find column '{column_name}' in DataFrame.")
 
         if not isinstance(pattern, str) and not isinstance(pattern, list):
             raise TypeError("Argument 'pattern' is neither the expected str nor list.")
 
         extracted_data = self.__extract(column_name=column_name, pattern=pattern)
-        return extracted_data.tolist()
 
-    def __extract(self, column_name: str, pattern: Union[str, list]) -> pandas.Series:
+        if len(extracted_data.columns) == 1:
+            extracted_list: list = extracted_data.iloc[:, 0].tolist()
+            return extracted_list
+
+        return list(extracted_data.itertuples(index=False, name=None))
+
+    def __extract(
+        self,
+        column_name: str,
+        pattern: Union[str, list],
+        new_column: Union[str, list, dict, None] = None,
+    ) -> pandas.DataFrame:
         """Handles the extraction of data for either extract or extract_into_new_column methods.
         Assumes the calling methods have screened inputs for proper type.
 
@@ -105,67 +439,260 @@ class ExcelParser:
         ----------
         column_name : str
         pattern : str or list of str
+        new_column : Optional str, list or dict     Names the groups' columns (see extract_into_new_column).
+                                                        If not specified, keeps pandas' names.
 
         Returns
         -------
-        extracted_data : pandas.Series
+        extracted_data : pandas.DataFrame   One column per group.
         """
-        if isinstance(pattern, list):
-            #   Try each pattern & use the values for the rows when it matches.
-            extracted_data = pandas.Series(dtype="float64")
+        start = time.perf_counter()
+        patterns = pattern if isinstance(pattern, list) else [pattern]
 
-            for this_pattern in pattern:
-                this_extracted_data = self.__extract_series(
-                    column_name=column_name, pattern=this_pattern
+        #   (pattern, matches, seconds) for each pattern, if collecting diagnostics.
+        alternatives = []
+
+        #   Try each pattern & use the values for the rows when it matches.
+        extracted_data: Union[pandas.DataFrame, None] = None
+
+        for this_pattern in patterns:
+            pattern_start = time.perf_counter()
+            this_extracted_data = self.__extract_frame(
+                column_name=column_name, pattern=this_pattern
+            )
+
+            if new_column is not None:
+                this_extracted_data = self.__name_groups(
+                    extracted_data=this_extracted_data,
+                    pattern=this_pattern,
+                    new_column=new_column,
                 )
 
-                if extracted_data.empty:
-                    extracted_data = this_extracted_data
-                else:
-                    extracted_data.update(this_extracted_data)
-        else:
-            extracted_data = self.__extract_series(
-                column_name=column_name, pattern=pattern
+            if self.__diagnostics is not None:
+                alternatives.append(
+                    (
+                        this_pattern,
+                        int(this_extracted_data.notna().any(axis=1).sum()),
+                        time.perf_counter() - pattern_start,
+                    )
+                )
+
+            if extracted_data is None:
+                extracted_data = this_extracted_data
+            else:
+                extracted_data.update(this_extracted_data)
+
+        #   There's always a pattern, so always a frame by now.
+        if self.__diagnostics is not None and extracted_data is not None:
+            self.__diagnostics.record_extract(
+                source=self.__column(column_name=column_name),
+                new_column=", ".join(str(name) for name in extracted_data.columns),
+                extracted=extracted_data,
+                alternatives=alternatives,
+                seconds=time.perf_counter() - start,
             )
 
         return extracted_data
 
+    def extract_all(
+        self,
+        column_name: str,
+        pattern: Union[str, list],
+        new_column: Union[str, list, dict],
+        max_matches: Union[int, None] = None,
+    ) -> None:
+        """Use a regex to extract every match, not just the first, from a given column.
+        With max_matches, the first that many matches go into numbered new columns ('Stenosis 1',
+        'Stenosis 2', ...). Otherwise they go, one row per match, to a side sheet named after
+        the (first) new column & written out with the results.
+
+        Parameters
+        ----------
+        column_name : str
+        pattern : str or list of str    Matches of each pattern are listed in turn.
+        new_column : str, list of str or dict   As for extract_into_new_column.
+        max_matches : Optional int
+        """
+        if not isinstance(column_name, str):
+            raise TypeError("Argument 'column_name' is not the expected str.")
+
+        if not self.__has_column(column_name=column_name):
+            raise AttributeError(f"Unable to find column '{column_name}' in DataFrame.")
+
+        if not isinstance(pattern, str) and not isinstance(pattern, list):
+            raise TypeError("Argument 'pattern' is neither the expected str nor list.")
+
+        names = self.__column_names(new_column=new_column)
+
+        if max_matches is not None and (
+            not isinstance(max_matches, int) or max_matches < 1
+        ):
+            raise TypeError("Argument 'max_matches' is not the expected positive int.")
+
+        start = time.perf_counter()
+        source = self.__column(column_name=column_name)
+        alternatives = []
+        frames = []
+
+        for this_pattern in pattern if isinstance(pattern, list) else [pattern]:
+            pattern_start = time.perf_counter()
+            extracted_data = self.__name_groups(
+                extracted_data=self.__extractall_frame(
+                    column_name=column_name, pattern=this_pattern
+                ),
+                pattern=this_pattern,
+                new_column=new_column,
+            )
+            frames.append(extracted_data)
+            alternatives.append(
+                (
+                    this_pattern,
+                    int(extracted_data.index.get_level_values(0).nunique()),
+                    time.perf_counter() - pattern_start,
+                )
+            )
+
+        #   One row per match, in source row order, then pattern order, then match order,
+        #   renumbered from 0 within each source row.
+        matches = pandas.concat(frames, keys=range(len(frames)), names=["pattern"])
+        order = numpy.lexsort(
+            (
+                matches.index.get_level_values(2),
+                matches.index.get_level_values(0),
+                source.index.get_indexer(matches.index.get_level_values(1)),
+            )
+        )
+        matches = matches.iloc[order].droplevel(0)
+        rows = matches.index.get_level_values(0)
+        match_numbers = matches.groupby(level=0, sort=False).cumcount().to_numpy()
+        matches.index = pandas.MultiIndex.from_arrays([rows, match_numbers])
+
+        if self.__diagnostics is not None:
+            self.__diagnostics.record_extract(
+                source=source,
+                new_column=", ".join(names),
+                extracted=matches.groupby(level=0).size().reindex(source.index),
+                alternatives=alternatives,
+                seconds=time.perf_counter() - start,
+            )
+
+        if max_matches is None:
+            #   Spreadsheet row numbers (counting the header row) tie each match to its source row.
+            long_data = matches.reset_index(drop=True)
+            long_data.insert(0, "Row", self.__row_index.get_indexer(rows) + 2)
+            long_data.insert(1, "Match", match_numbers + 1)
+            self.__side_sheets[names[0]] = long_data
+            return
+
+        for match in range(max_matches):
+            this_match = matches[match_numbers == match].droplevel(1)
+
+            for name in names:
+                self.__set_column(
+                    column_name=f"{name} {match + 1}",
+                    column=self.__map(this_match[name].reindex(self.__df.index)),
+                )
+
+        self.__move_to_end(column_name=column_name)
+
     def extract_into_new_column(
-        self, column_name: str, pattern: Union[str, list], new_column: str
+        self,
+        column_name: str,
+        pattern: Union[str, list],
+        new_column: Union[str, list, dict],
     ) -> None:
-        """Use a regex to extract data from a given column into a new column.
+        """Use a regex to extract data from a given column into one or more new columns.
 
         Parameters
         ----------
         column_name : str
         pattern : str or list of str
-        new_column : str
+        new_column : str, list of str or dict   A str takes the first group.
+                                                A list names every group, in order.
+                                                A dict maps group names (or numbers, from 1) to column names.
         """
         if not isinstance(column_name, str):
             raise TypeError("Argument 'column_name' is not the expected str.")
 
-        if column_name not in self.__df:
+        if not self.__has_column(column_name=column_name):
             raise AttributeError(f"Unable to find column '{column_name}' in DataFrame.")
 
         if not isinstance(pattern, str) and not isinstance(pattern, list):
             raise TypeError("Argument 'pattern' is neither the expected str nor list.")
 
-        if not isinstance(new_column, str):
-            raise TypeError("Argument 'new_column' is not the expected str.")
+        self.__column_names(new_column=new_column)
+        extracted_data = self.__extract(
+            column_name=column_name, pattern=pattern, new_column=new_column
+        )
 
-        extracted_data = self.__extract(column_name=column_name, pattern=pattern)
-        self.__df[new_column] = extracted_data
+        for name in extracted_data.columns:
+            self.__set_column(column_name=name, column=self.__map(extracted_data[name]))
 
-        #   The source column is almost always a long string, and it's more convenient if
-        #   it stays the last column (so the long text doesn't overwrite the new extracted column).
-        #   So rearrange the dataframe columns to put the source column last.
-        cols = list(self.__df.columns.values)
-        rearranged_cols = [c for c in cols if c != column_name]
-        rearranged_cols.append(column_name)
-        self.__df = self.__df[rearranged_cols]
-
-    def __extract_series(self, column_name: str, pattern: str) -> pandas.Series:
-        """Extracts column to Series using regex.
+        self.__move_to_end(column_name=column_name)
+
+    @staticmethod
+    def __extract_block(block: pandas.Series, pattern: str) -> pandas.DataFrame:
+        """Extracts the pattern's groups from a block of rows.
+
+        Parameters
+        ----------
+        block : pandas.Series
+        pattern : str
+
+        Returns
+        -------
+        extracted : pandas.DataFrame    One column per group.
+        """
+        try:
+            extracted: pandas.DataFrame = block.str.extract(pattern)
+        except ValueError:
+            #   As in clean_column, retry patterns RE2 can't handle using Python's re.
+            if not isinstance(block.dtype, pandas.StringDtype):
+                raise
+
+            extracted = block.astype(object).str.extract(pattern)
+            extracted = extracted.astype(block.dtype)
+
+        return extracted
+
+    def __extractall_frame(self, column_name: str, pattern: str) -> pandas.DataFrame:
+        """Extracts every match in a column, a block of rows at a time if chunk_rows is set.
+
+        Parameters
+        ----------
+        column_name : str
+        pattern : str
+
+        Returns
+        -------
+        extracted : pandas.DataFrame    One row per match, indexed by (source row, match number),
+                                            with one column per group.
+        """
+        source = self.__column(column_name=column_name)
+        chunk_rows = self.__chunk_rows or max(len(source), 1)
+        frames = []
+
+        for start in range(0, max(len(source), 1), chunk_rows):
+            end = start + chunk_rows
+            block = source.iloc[start:end]
+
+            try:
+                frames.append(block.str.extractall(pattern))
+            except ValueError:
+                #   As in clean_column, retry patterns RE2 can't handle using Python's re.
+                if not isinstance(block.dtype, pandas.StringDtype):
+                    raise
+
+                frames.append(
+                    block.astype(object).str.extractall(pattern).astype(block.dtype)
+                )
+
+        extracted: pandas.DataFrame = pandas.concat(frames)
+        return extracted
+
+    def __extract_frame(self, column_name: str, pattern: str) -> pandas.DataFrame:
+        """Extracts column to DataFrame using regex. Always a DataFrame, never squeezed,
+        so a one-row sheet or a pattern with several groups is handled like any other.
         Assumes the calling methods have screened inputs for proper type.
 
         Parameters
@@ -175,10 +702,447 @@ class ExcelParser:
 
         Returns
         -------
-        column : Series
+        extracted : pandas.DataFrame    One column per group.
+        """
+        source = self.__column(column_name=column_name)
+        extracted: pandas.DataFrame = self.__by_chunks(
+            source=source,
+            function=lambda block: self.__extract_block(block=block, pattern=pattern),
+        )
+        return extracted
+
+    def filter_rows(
+        self,
+        column_name: str,
+        equals: Union[str, None] = None,
+        values: Union[list, tuple, None] = None,
+        pattern: Union[str, None] = None,
+        keep_others: bool = False,
+    ) -> int:
+        """Narrows the rows the rules run on to those meeting a condition on a column,
+        so the regex work (& the output) scales with the matching rows only.
+        Give exactly one of equals, values & pattern. Values are compared as text, so '7' matches 7.
+
+        Parameters
+        ----------
+        column_name : str
+        equals : Optional str           Keep rows whose value is this.
+        values : Optional list of str   Keep rows whose value is one of these.
+        pattern : Optional str          Keep rows whose value matches this regex.
+        keep_others : bool              Set the other rows aside & put them back, untouched,
+                                            with rejoin_rows(). Otherwise they're dropped.
+
+        Returns
+        -------
+        rows : int  Rows left to run the rules on.
+        """
+        if not isinstance(column_name, str):
+            raise TypeError("Argument 'column_name' is not the expected str.")
+
+        self.__assemble()
+
+        if not self.__has_column(column_name=column_name):
+            raise AttributeError(f"Unable to find column '{column_name}' in DataFrame.")
+
+        if [equals, values, pattern].count(None) != 2:
+            raise TypeError("Give exactly one of 'equals', 'values' or 'pattern'.")
+
+        if values is not None and not isinstance(values, (list, tuple)):
+            raise TypeError("Argument 'values' is not the expected list.")
+
+        if keep_others and not self.__df.index.is_unique:
+            raise ValueError("Rows can only be set aside if the index is unique.")
+
+        text = self.__df[column_name].astype("string")
+
+        if equals is not None:
+            mask = text == str(equals)
+        elif values is not None:
+            mask = text.isin([str(value) for value in values])
+        else:
+            mask = text.str.contains(str(pattern), regex=True)
+
+        mask = mask.fillna(False).astype(bool)
+
+        if keep_others:
+            self.__other_rows = pandas.concat(
+                [
+                    frame
+                    for frame in (self.__other_rows, self.__df_orig[~mask])
+                    if frame is not None
+                ]
+            )
+
+        self.__df = self.__df[mask]
+        self.__df_orig = self.__df_orig[mask]
+        return len(self.__df)
+
+    def __fill_workbook(self, wb_obj: openpyxl.Workbook) -> None:
+        """Puts the results (& any side sheets) into a new workbook.
+
+        Parameters
+        ----------
+        wb_obj : openpyxl.Workbook
+        """
+        self.__assemble()
+        sheet = wb_obj.active
+        sheet.title = self.__sheet_name
+        start_col = 1
+        start_row = 1
+        col_idx = start_col
+
+        # insert values
+        for label, content in self.__df.items():
+            sheet.cell(row=start_row, column=col_idx, value=label)
+
+            if isinstance(content.dtype, pandas.StringDtype):
+                #   Back to Python objects for openpyxl, which can't write pandas.NA.
+                content = content.astype(object).where(content.notna(), None)
+
+            for row_idx, value_ in enumerate(content):
+                sheet.cell(row=start_row + row_idx + 1, column=col_idx, value=value_)
+
+            col_idx += 1
+
+        for title, side_data in self.__side_sheets.items():
+            side_sheet = wb_obj.create_sheet(title=self.__sheet_title(title))
+            side_sheet.append([str(label) for label in side_data.columns])
+
+            for row in side_data.astype(object).itertuples(index=False, name=None):
+                side_sheet.append(
+                    [None if pandas.isna(value) else value for value in row]
+                )
+
+            self.__format_sheet(sheet=side_sheet, df=side_data)
+
+        self.__format_sheet(sheet=sheet, df=self.__df)
+
+    @staticmethod
+    def __format_sheet(
+        sheet: openpyxl.worksheet.worksheet.Worksheet, df: pandas.DataFrame
+    ) -> None:
+        """Styles the header row, freezes it & filters on it, & sizes the columns to their contents.
+        Everything is set once per column (or sheet), never cell by cell.
+
+        Parameters
+        ----------
+        sheet : openpyxl.worksheet.worksheet.Worksheet  Already holding the DataFrame, with a header row.
+        df : pandas.DataFrame
+        """
+        if len(df.columns) == 0:
+            return
+
+        workbook = sheet.parent
+
+        #   One named style, added once per workbook, shared by every header cell.
+        if HEADER_STYLE_NAME not in workbook.named_styles:
+            header_style = openpyxl.styles.NamedStyle(name=HEADER_STYLE_NAME)
+            header_style.font = openpyxl.styles.Font(bold=True)
+            header_style.fill = openpyxl.styles.PatternFill(
+                fill_type="solid", start_color="DDEBF7"
+            )
+            header_style.border = openpyxl.styles.Border(
+                bottom=openpyxl.styles.Side(style="thin")
+            )
+            workbook.add_named_style(header_style)
+
+        for cell in sheet[1]:
+            cell.style = HEADER_STYLE_NAME
+
+        #   Evenly spaced rows, so the sample covers the whole sheet.
+        step = max(len(df) // WIDTH_SAMPLE_ROWS, 1)
+        sample = df.iloc[::step]
+        last_column = openpyxl.utils.get_column_letter(len(df.columns))
+
+        for number, (label, content) in enumerate(sample.items()):
+            lengths = content.dropna().astype(str).str.len()
+            width = max(
+                len(str(label)),
+                lengths.quantile(WIDTH_QUANTILE) if len(lengths) else 0,
+            )
+            sheet.column_dimensions[
+                openpyxl.utils.get_column_letter(number + 1)
+            ].width = min(max(width + 2, MIN_COLUMN_WIDTH), MAX_COLUMN_WIDTH)
+
+        sheet.freeze_panes = "A2"
+        sheet.auto_filter.ref = f"A1:{last_column}{len(df) + 1}"
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: Union[bytes, BinaryIO],
+        filename: str = "workbook.xlsx",
+        sheet_name: Union[str, None] = None,
+        engine: Union[str, None] = None,
+        dtype: Union[dict, None] = None,
+        string_storage: Union[str, None] = None,
+        diagnostics: Union[MatchDiagnostics, None] = None,
+        chunk_rows: Union[int, None] = None,
+        column_store: Union[ColumnStore, None] = None,
+    ) -> "ExcelParser":
+        """Reads one sheet of a workbook that's already in memory, like one just downloaded,
+        without writing it to disk first.
+
+        Parameters
+        ----------
+        data : bytes or binary file-like object     The workbook's contents.
+        filename : str          Gives the format by its extension (& the sheet name of a .csv file).
+        sheet_name, engine, dtype, string_storage, diagnostics, chunk_rows, column_store
+                                As for ExcelParser().
+
+        Returns
+        -------
+        excel_parser : ExcelParser
+        """
+        if hasattr(data, "read"):
+            data = data.read()
+
+        if not isinstance(data, bytes):
+            raise TypeError(
+                "Argument 'data' is not the expected bytes or binary file-like object."
+            )
+
+        return cls(
+            excel_filename=filename,
+            sheet_name=sheet_name,
+            engine=engine,
+            dtype=dtype,
+            string_storage=string_storage,
+            diagnostics=diagnostics,
+            chunk_rows=chunk_rows,
+            column_store=column_store,
+            data=data,
+        )
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: pandas.DataFrame,
+        sheet_name: str = "Sheet1",
+        string_storage: Union[str, None] = None,
+        diagnostics: Union[MatchDiagnostics, None] = None,
+        chunk_rows: Union[int, None] = None,
+        column_store: Union[ColumnStore, None] = None,
+    ) -> "ExcelParser":
+        """Works on a DataFrame already in memory instead of reading a workbook.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame       Copied, so rules don't change the caller's DataFrame.
+        sheet_name : str            Title of the sheet if the results are written out.
+        string_storage : Optional str
+        diagnostics : Optional MatchDiagnostics
+        chunk_rows : Optional int
+        column_store : Optional ColumnStore     As for ExcelParser().
+
+        Returns
+        -------
+        excel_parser : ExcelParser
+        """
+        if not isinstance(df, pandas.DataFrame):
+            raise TypeError("Argument 'df' is not the expected pandas.DataFrame.")
+
+        if not isinstance(sheet_name, str):
+            raise TypeError("Argument 'sheet_name' is not the expected str.")
+
+        excel_parser: ExcelParser = cls.__new__(cls)
+        excel_parser.__setup(
+            df=df.copy(),
+            excel_filename=sheet_name + ".xlsx",
+            sheet_name=sheet_name,
+            input_engine=InputEngine(filename=sheet_name + ".xlsx"),
+            string_storage=string_storage,
+            diagnostics=diagnostics,
+            chunk_rows=chunk_rows,
+            column_store=column_store,
+        )
+        return excel_parser
+
+    def __has_column(self, column_name: str) -> bool:
+        """Checks for a column, whether or not the frame has been built with it yet.
+
+        Parameters
+        ----------
+        column_name : str
+
+        Returns
+        -------
+        found : bool
+        """
+        return column_name in self.__new_columns or column_name in self.__df
+
+    def __map(self, column: pandas.Series) -> pandas.Series:
+        """Moves a large new column into the column store, if there is one.
+
+        Parameters
+        ----------
+        column : pandas.Series
+
+        Returns
+        -------
+        column : pandas.Series
+        """
+        if self.__column_store is None:
+            return column
+
+        return self.__column_store.map(column)
+
+    def merge_results(
+        self, column_name: str, new_data: pandas.DataFrame, side_sheets: dict
+    ) -> None:
+        """Adds results worked out elsewhere (like in worker processes, from attach()) for all rows.
+
+        Parameters
+        ----------
+        column_name : str               Source column, kept last.
+        new_data : pandas.DataFrame     New columns, indexed like this parser's rows.
+        side_sheets : dict              Sheet name -> pandas.DataFrame, as from side_sheets().
+        """
+        if not self.__has_column(column_name=column_name):
+            raise AttributeError(f"Unable to find column '{column_name}' in DataFrame.")
+
+        for name in new_data.columns:
+            self.__set_column(
+                column_name=name,
+                column=self.__map(new_data[name].reindex(self.__df.index)),
+            )
+
+        if len(new_data.columns) > 0:
+            self.__move_to_end(column_name=column_name)
+
+        self.__side_sheets.update(side_sheets)
+
+    def __move_to_end(self, column_name: str) -> None:
+        """Puts a column last.
+
+        Parameters
+        ----------
+        column_name : str
+        """
+        #   The source column is almost always a long string, and it's more convenient if
+        #   it stays the last column (so the long text doesn't overwrite the new extracted column).
+        #   So rearrange the dataframe columns to put the source column last
+        #   (in the order the frame is next built in, see __assemble).
+        order = self.__column_order()
+        order.remove(column_name)
+        order.append(column_name)
+
+    @staticmethod
+    def __name_groups(
+        extracted_data: pandas.DataFrame,
+        pattern: str,
+        new_column: Union[str, list, dict],
+    ) -> pandas.DataFrame:
+        """Picks the groups wanted & names their columns.
+
+        Parameters
+        ----------
+        extracted_data : pandas.DataFrame   One column per group, as from __extract_frame.
+        pattern : str
+        new_column : str, list of str or dict
+
+        Returns
+        -------
+        named_data : pandas.DataFrame   One column per new column.
+        """
+        if isinstance(new_column, str):
+            named_data = extracted_data.iloc[:, [0]]
+            named_data.columns = [new_column]
+            return named_data
+
+        if isinstance(new_column, list):
+            if len(new_column) != len(extracted_data.columns):
+                raise ValueError(
+                    f"Pattern '{pattern}' has {len(extracted_data.columns)} group(s) "
+                    f"but {len(new_column)} new columns were named."
+                )
+
+            named_data = extracted_data.copy()
+            named_data.columns = new_column
+            return named_data
+
+        columns = {}
+
+        for group, name in new_column.items():
+            if isinstance(group, int) and 1 <= group <= len(extracted_data.columns):
+                columns[name] = extracted_data.iloc[:, group - 1]
+            elif isinstance(group, str) and group in extracted_data.columns:
+                columns[name] = extracted_data[group]
+            else:
+                raise ValueError(f"Pattern '{pattern}' has no group '{group}'.")
+
+        return pandas.DataFrame(columns, index=extracted_data.index)
+
+    def publish(self, column_names: list) -> SharedColumns:
+        """Copies columns into shared memory, for worker processes to attach() to.
+
+        Parameters
+        ----------
+        column_names : list of str
+
+        Returns
+        -------
+        shared_columns : SharedColumns  Close it once the workers are done.
+        """
+        self.__assemble()
+
+        for column_name in column_names:
+            if column_name not in self.__df:
+                raise AttributeError(
+                    f"Unable to find column '{column_name}' in DataFrame."
+                )
+
+        return SharedColumns(df=self.__df, column_names=column_names)
+
+    @staticmethod
+    def __replace_block(
+        block: pandas.Series, pattern: str, replace: str
+    ) -> pandas.Series:
+        """Runs a cleaning rule on a block of rows.
+
+        Parameters
+        ----------
+        block : pandas.Series
+        pattern : str
+        replace : str
+
+        Returns
+        -------
+        revised : pandas.Series
         """
-        column: pandas.Series = self.__df[column_name].str.extract(pattern).squeeze()
-        return column
+        try:
+            revised: pandas.Series = block.str.replace(pattern, replace, regex=True)
+        except ValueError:
+            #   Arrow-backed strings use the RE2 engine, which rejects some Python regex syntax
+            #   (like '\(' in a replacement). Fall back on Python's re for this rule.
+            if not isinstance(block.dtype, pandas.StringDtype):
+                raise
+
+            revised = (
+                block.astype(object)
+                .str.replace(pattern, replace, regex=True)
+                .astype(block.dtype)
+            )
+
+        return revised
+
+    def rejoin_rows(self) -> None:
+        """Puts back the rows filter_rows() set aside, in their original places.
+        Their new columns are left empty."""
+        self.__assemble()
+
+        if self.__other_rows is None:
+            return
+
+        combined = pandas.concat([self.__df, self.__other_rows])
+        order = numpy.argsort(
+            self.__row_index.get_indexer(combined.index), kind="stable"
+        )
+        self.__df = combined.iloc[order]
+        self.__df_orig = pandas.concat([self.__df_orig, self.__other_rows]).loc[
+            self.__df.index
+        ]
+        self.__other_rows = None
 
     def restore_original_column(self, column_name: str) -> None:
         """Restores the original (uncleaned) column in preparation for writing out results.
@@ -192,7 +1156,7 @@ class ExcelParser:
         if not isinstance(column_name, str):
             raise TypeError("Argument 'column_name' is not the expected str.")
 
-        if column_name not in self.__df:
+        if not self.__has_column(column_name=column_name):
             raise AttributeError(
                 f"Unable to find column '{column_name}' in modified DataFrame."
             )
@@ -204,7 +1168,137 @@ class ExcelParser:
                 f"Unable to find column '{column_name}' in original DataFrame."
             )
 
-        self.__df[column_name] = self.__df_orig[column_name]
+        self.__set_column(column_name=column_name, column=self.__df_orig[column_name])
+
+    def __set_column(self, column_name: str, column: pandas.Series) -> None:
+        """Adds or replaces a column in the frame when it's next built. A replaced column
+        keeps its place & a new one goes last.
+
+        Parameters
+        ----------
+        column_name : str
+        column : pandas.Series  Indexed like the frame.
+        """
+        order = self.__column_order()
+
+        if column_name not in self.__new_columns and column_name not in self.__df:
+            order.append(column_name)
+
+        self.__new_columns[column_name] = column
+
+    def __setup(
+        self,
+        df: pandas.DataFrame,
+        excel_filename: str,
+        sheet_name: str,
+        input_engine: Union[InputEngine, None],
+        string_storage: Union[str, None] = None,
+        diagnostics: Union[MatchDiagnostics, None] = None,
+        chunk_rows: Union[int, None] = None,
+        column_store: Union[ColumnStore, None] = None,
+    ) -> None:
+        """Checks the options & takes charge of a sheet's DataFrame, however it was obtained.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+        excel_filename : str
+        sheet_name : str
+        input_engine : InputEngine or None
+        string_storage : Optional str
+        diagnostics : Optional MatchDiagnostics
+        chunk_rows : Optional int
+        column_store : Optional ColumnStore
+        """
+        if string_storage is not None and string_storage not in STRING_STORAGES:
+            raise ValueError(
+                f"Argument 'string_storage' must be one of {', '.join(STRING_STORAGES)}."
+            )
+
+        if diagnostics is not None and not isinstance(diagnostics, MatchDiagnostics):
+            raise TypeError(
+                "Argument 'diagnostics' is not the expected MatchDiagnostics."
+            )
+
+        if chunk_rows is not None and (
+            not isinstance(chunk_rows, int) or chunk_rows < 1
+        ):
+            raise TypeError("Argument 'chunk_rows' is not the expected positive int.")
+
+        if column_store is not None and not isinstance(column_store, ColumnStore):
+            raise TypeError("Argument 'column_store' is not the expected ColumnStore.")
+
+        if not isinstance(df, pandas.DataFrame):  # pragma: no cover
+            raise RuntimeError(f"Unable to read file '{excel_filename}'.")
+
+        self.__excel_filename = excel_filename
+        self.__column_store = column_store
+        self.__diagnostics = diagnostics
+        self.__chunk_rows = chunk_rows
+
+        #   Extra sheets to write alongside the results, like the long-format output of extract_all.
+        self.__side_sheets: dict = {}
+        self.__input_engine = input_engine
+        self.__sheet_name = sheet_name
+        self.__df = df
+
+        #   Columns added or replaced since the frame was last built & the order of all its columns
+        #   (None while there are none). Building the frame once, rather than assigning each column
+        #   as it's made, saves pandas copying the whole frame over & over. See __assemble.
+        self.__new_columns = {}
+        self.__order = None
+
+        #   Every row as loaded, to number rows by their place in the sheet once some are filtered out.
+        self.__row_index = df.index
+
+        #   Rows filtered out but to be passed through to the results, see filter_rows().
+        self.__other_rows = None
+
+        if string_storage is not None:
+            self.__convert_text_columns(string_storage=string_storage)
+
+        if column_store is not None:
+            self.__df = column_store.map_frame(self.__df)
+
+        #   Mapped columns are immutable Arrow data, so this copy shares them rather than duplicating them.
+        self.__df_orig = self.__df.copy()
+
+    @staticmethod
+    def __sheet_title(name: str) -> str:
+        """Makes a name safe to use as a worksheet title.
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        title : str
+        """
+        title = "".join("_" if c in INVALID_TITLE_CHARACTERS else c for c in name)
+        return title[:MAX_TITLE_LENGTH]
+
+    def side_sheets(self) -> dict:
+        """Allows read access to the extra sheets written out with the results.
+
+        Returns
+        -------
+        side_sheets : dict  Sheet name -> pandas.DataFrame
+        """
+        return self.__side_sheets
+
+    def to_bytes(self) -> bytes:
+        """Writes out the dataframe we've been building into an in-memory .xlsx workbook.
+
+        Returns
+        -------
+        data : bytes    The workbook's contents, as write_to_excel would save them.
+        """
+        wb_obj = openpyxl.Workbook()
+        self.__fill_workbook(wb_obj=wb_obj)
+        buffer = io.BytesIO()
+        wb_obj.save(buffer)
+        return buffer.getvalue()
 
     def write_to_excel(self, new_file_name: Union[str, None] = None) -> str:
         """Write out the dataframe we've been building.
@@ -218,28 +1312,20 @@ class ExcelParser:
         new_file_name : str
         """
         if not new_file_name:
-            name, extension = os.path.splitext(os.path.basename(self.__excel_filename))
+            name = os.path.splitext(os.path.basename(self.__excel_filename))[0]
+            extension = (
+                ".xlsx"
+                if self.__input_engine is None
+                else self.__input_engine.output_extension()
+            )
             new_file_name = os.path.join(
-                os.path.dirname(self.__excel_filename), name + "_revised" + extension
+                os.path.dirname(self.__excel_filename),
+                name + "_revised" + extension,
             )
 
         # https: // stackoverflow.com / a / 72446796 / 18749636
         wb_obj = openpyxl.Workbook()
         wb_obj.save(new_file_name)
-        sheet = wb_obj.active
-        sheet.title = self.__sheet_name
-        start_col = 1
-        start_row = 1
-        col_idx = start_col
-
-        # insert values
-        for label, content in self.__df.items():
-            sheet.cell(row=start_row, column=col_idx, value=label)
-
-            for row_idx, value_ in enumerate(content):
-                sheet.cell(row=start_row + row_idx + 1, column=col_idx, value=value_)
-
-            col_idx += 1
-
+        self.__fill_workbook(wb_obj=wb_obj)
         wb_obj.save(new_file_name)
         return new_file_name
@@ -0,0 +1,564 @@
+"""
+Module: contains class InputEngine.
+"""
+import csv
+import importlib.util
+import io
+import os
+import posixpath
+import re
+import struct
+import zipfile
+from typing import TYPE_CHECKING, Union
+from xml.etree import ElementTree
+
+if TYPE_CHECKING:
+    import pandas
+
+CSV_FORMATS = (".csv",)
+EXCEL_FORMATS = (".xlsx", ".xlsm", ".xlsb", ".xls", ".ods")
+
+#   Readers that can be requested by name.
+CSV_ENGINES = ("pyarrow", "c", "python")
+EXCEL_ENGINES = ("calamine", "openpyxl", "pyxlsb", "xlrd", "odf")
+
+#   Formats that openpyxl can write back out under the same extension.
+#   Everything else gets written as .xlsx.
+WRITABLE_FORMATS = (".xlsx", ".xlsm")
+
+#   Readers pandas.read_excel uses for each format when calamine isn't available.
+FALLBACK_ENGINES = {
+    ".xlsx": "openpyxl",
+    ".xlsm": "openpyxl",
+    ".xlsb": "pyxlsb",
+    ".xls": "xlrd",
+    ".ods": "odf",
+}
+
+#   Backing stores for pandas.StringDtype: 'pyarrow' keeps each column in one contiguous Arrow buffer.
+STRING_STORAGES = ("pyarrow", "python")
+
+#   Binary record types in an .xlsb 'xl/workbook.bin' part (see [MS-XLSB] 2.3.2).
+XLSB_BOOK_VIEW = 0x0087
+XLSB_BUNDLE_SHEET = 0x009C
+
+RELATIONSHIPS_NAMESPACE = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+)
+
+
+def _module_available(module_name: str) -> bool:
+    return importlib.util.find_spec(module_name) is not None
+
+
+def _calamine_available() -> bool:
+    import pandas
+
+    #   pandas learned about the calamine engine in 2.2.
+    pandas_version = tuple(
+        int(part) for part in pandas.__version__.split(".")[:2] if part.isdigit()
+    )
+    return pandas_version >= (2, 2) and _module_available("python_calamine")
+
+
+class InputEngine:
+    """
+    Picks the fastest available reader for an input file based on its format & finds its active sheet.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        engine: Union[str, None] = None,
+        data: Union[bytes, None] = None,
+    ) -> None:
+        """Looks at the file extension to decide how the file will be read.
+
+        Parameters
+        ----------
+        filename : str          Name of existing .xlsx, .xlsm, .xlsb, .xls, .ods or .csv file
+        engine : Optional str   Reader to use, like 'calamine' or 'openpyxl'. If not specified,
+                                    the fastest one installed is chosen.
+        data : Optional bytes   The file's contents, already in memory. Then filename just gives the format
+                                    (& the sheet name of a .csv file) and nothing is read from disk.
+        """
+        if not isinstance(filename, str):
+            raise TypeError("Argument 'filename' is not the expected str.")
+
+        if data is not None and not isinstance(data, bytes):
+            raise TypeError("Argument 'data' is not the expected bytes.")
+
+        self.__filename = filename
+        self.__data = data
+        self.__extension = os.path.splitext(filename)[1].lower()
+
+        if engine is None:
+            self.__engine = self.__choose_engine()
+            return
+
+        if not isinstance(engine, str):
+            raise TypeError("Argument 'engine' is not the expected str.")
+
+        allowed_engines = (
+            CSV_ENGINES if self.__extension in CSV_FORMATS else EXCEL_ENGINES
+        )
+
+        if engine not in allowed_engines:
+            raise ValueError(
+                f"Engine '{engine}' can't read file '{filename}'; "
+                f"choose one of {', '.join(allowed_engines)}."
+            )
+
+        self.__engine = engine
+
+    def active_sheet_name(self) -> str:
+        """Finds the sheet that was active when the workbook was last saved,
+        without loading the whole workbook.
+
+        Returns
+        -------
+        sheet_name : str
+        """
+        if self.__extension in CSV_FORMATS:
+            #   A .csv file is a single sheet; name it after the file.
+            return os.path.splitext(os.path.basename(self.__filename))[0]
+
+        try:
+            if self.__extension in (".xlsx", ".xlsm"):
+                return self.__active_sheet_xlsx()
+
+            if self.__extension == ".xlsb":
+                return self.__active_sheet_xlsb()
+
+            if self.__extension == ".ods":
+                return self.__active_sheet_ods()
+        except (KeyError, IndexError, ElementTree.ParseError, struct.error):
+            #   Unusual file layout; let pandas list the sheets instead.
+            pass
+
+        #   The .xls format keeps its active tab deep inside a BIFF stream,
+        #   so settle for the first sheet, as pandas.read_excel would.
+        import pandas
+
+        with pandas.ExcelFile(self.__source(), engine=self.__engine) as workbook:
+            sheet_names: list = workbook.sheet_names
+
+        return str(sheet_names[0])
+
+    def __active_sheet_ods(self) -> str:
+        """Reads the 'ActiveTable' setting from an OpenDocument spreadsheet.
+
+        Returns
+        -------
+        sheet_name : str
+        """
+        with zipfile.ZipFile(self.__source()) as archive:
+            if "settings.xml" in archive.namelist():
+                settings = ElementTree.fromstring(archive.read("settings.xml"))
+
+                for element in settings.iter():
+                    if (
+                        element.tag.endswith("}config-item")
+                        and element.get(
+                            "{urn:oasis:names:tc:opendocument:xmlns:config:1.0}name"
+                        )
+                        == "ActiveTable"
+                        and isinstance(element.text, str)
+                    ):
+                        return element.text
+
+            #   No saved setting, so use the first table. Stop parsing as soon as we see it.
+            with archive.open("content.xml") as content:
+                for _, element in ElementTree.iterparse(content, events=("start",)):
+                    if element.tag.endswith("}table"):
+                        for key, value in element.attrib.items():
+                            if key.endswith("}name"):
+                                table_name: str = value
+                                return table_name
+
+        raise KeyError("No table found in 'content.xml'.")
+
+    def __active_sheet_xlsb(self) -> str:
+        """Reads the active tab index & sheet names from the binary workbook part of an .xlsb file.
+
+        Returns
+        -------
+        sheet_name : str
+        """
+        with zipfile.ZipFile(self.__source()) as archive:
+            data = archive.read("xl/workbook.bin")
+
+        active_tab = 0
+        sheet_names = []
+        position = 0
+
+        while position < len(data):
+            #   Record type & size are both variable-length, 7 bits per byte.
+            record_type = data[position] & 0x7F
+
+            if data[position] & 0x80:
+                position += 1
+                record_type |= (data[position] & 0x7F) << 7
+
+            position += 1
+            record_size = 0
+
+            for shift in range(0, 28, 7):
+                record_size |= (data[position] & 0x7F) << shift
+                position += 1
+
+                if not data[position - 1] & 0x80:
+                    break
+
+            record_end = position + record_size
+            record = data[position:record_end]
+            position = record_end
+
+            if record_type == XLSB_BOOK_VIEW:
+                #   xWn, yWn, dxWn, dyWn, iTabRatio, itabFirst, then itabCur.
+                active_tab = struct.unpack_from("<I", record, 24)[0]
+            elif record_type == XLSB_BUNDLE_SHEET:
+                #   hsState, iTabID, then the nullable relationship ID & the sheet name.
+                offset = 8
+                rel_id_length = struct.unpack_from("<I", record, offset)[0]
+                offset += 4
+
+                if rel_id_length != 0xFFFFFFFF:
+                    offset += 2 * rel_id_length
+
+                name_length = struct.unpack_from("<I", record, offset)[0]
+                offset += 4
+                name_end = offset + 2 * name_length
+                sheet_names.append(record[offset:name_end].decode("utf-16-le"))
+
+        return sheet_names[active_tab]
+
+    def __active_sheet_xlsx(self) -> str:
+        """Reads the 'activeTab' attribute & sheet names from the workbook part of an .xlsx file.
+
+        Returns
+        -------
+        sheet_name : str
+        """
+        with zipfile.ZipFile(self.__source()) as archive:
+            workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+
+        active_tab = 0
+        sheet_names = []
+
+        for element in workbook.iter():
+            if element.tag.endswith("}workbookView"):
+                active_tab = int(element.get("activeTab", "0"))
+            elif element.tag.endswith("}sheet"):
+                sheet_names.append(element.get("name"))
+
+        return str(sheet_names[active_tab])
+
+    def __choose_engine(self) -> Union[str, None]:
+        """Picks the fastest installed reader for this file format.
+
+        Returns
+        -------
+        engine : str or None    None lets pandas decide.
+        """
+        if self.__extension in CSV_FORMATS:
+            return "pyarrow" if _module_available("pyarrow") else "c"
+
+        if self.__extension in EXCEL_FORMATS and _calamine_available():
+            return "calamine"
+
+        return FALLBACK_ENGINES.get(self.__extension)
+
+    @staticmethod
+    def __column_number(letters: str) -> int:
+        """Turns a column's letters into its number, counting from 1: 'A' is 1, 'AA' is 27.
+
+        Parameters
+        ----------
+        letters : str
+
+        Returns
+        -------
+        number : int
+        """
+        number = 0
+
+        for letter in letters:
+            number = number * 26 + ord(letter) - ord("A") + 1
+
+        return number
+
+    def engine(self) -> Union[str, None]:
+        """Allows read access to the name of the reader that will be used.
+
+        Returns
+        -------
+        engine : str or None
+        """
+        return self.__engine
+
+    def output_extension(self) -> str:
+        """Extension to use for the workbooks written from this input.
+        Output is always written by openpyxl, so formats it can't write become .xlsx.
+
+        Returns
+        -------
+        extension : str
+        """
+        if self.__extension in WRITABLE_FORMATS:
+            return os.path.splitext(self.__filename)[1]
+
+        return ".xlsx"
+
+    def read(
+        self,
+        sheet_name: str,
+        dtype: Union[dict, None] = None,
+        rows: Union[set, None] = None,
+    ) -> "pandas.DataFrame":
+        """Reads one sheet into a DataFrame.
+
+        Parameters
+        ----------
+        sheet_name : str        Ignored for .csv files, which hold only one sheet.
+        dtype : Optional dict   Maps column names to dtypes (like 'string') so those columns
+                                    skip type inference. Other columns are inferred as usual.
+        rows : Optional set of int  Keep only these rows (counting from 0 below the header),
+                                        skipping the others as they're read. An .xlsx or .xlsm sheet
+                                        is then streamed, & reading stops after the last row kept.
+
+        Returns
+        -------
+        df : pandas.DataFrame
+        """
+        import pandas
+
+        if rows is not None and self.__extension in (".xlsx", ".xlsm"):
+            return self.__read_rows_xlsx(sheet_name=sheet_name, dtype=dtype, rows=rows)
+
+        options: dict = {"dtype": dtype}
+
+        if rows is not None:
+            options["skiprows"] = lambda row: row > 0 and row - 1 not in rows
+
+        if self.__extension in CSV_FORMATS:
+            #   The pyarrow reader can't skip rows as it goes.
+            engine = "c" if rows is not None and self.__engine == "pyarrow" else None
+            return pandas.read_csv(
+                self.__source(), engine=engine or self.__engine, **options
+            )
+
+        return pandas.read_excel(
+            self.__source(), sheet_name=sheet_name, engine=self.__engine, **options
+        )
+
+    def __read_rows_xlsx(
+        self, sheet_name: str, dtype: Union[dict, None], rows: set
+    ) -> "pandas.DataFrame":
+        """Streams an .xlsx sheet's rows with openpyxl's read-only mode, keeping only the ones asked for,
+        without building the rest into a DataFrame & without reading past the last of them.
+
+        Parameters
+        ----------
+        sheet_name : str
+        dtype : dict or None    As for read().
+        rows : set of int       As for read().
+
+        Returns
+        -------
+        df : pandas.DataFrame
+        """
+        import openpyxl
+        import pandas
+
+        wb_obj = openpyxl.load_workbook(self.__source(), read_only=True, data_only=True)
+
+        try:
+            if sheet_name not in wb_obj.sheetnames:
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+            sheet_rows = wb_obj[sheet_name].iter_rows(values_only=True)
+            header = list(next(sheet_rows, ()))
+
+            #   Like pandas, drop empty columns on the right & name the other unnamed ones by position.
+            while header and header[-1] is None:
+                header.pop()
+
+            columns = [
+                f"Unnamed: {number}" if name is None else name
+                for number, name in enumerate(header)
+            ]
+            kept = []
+            last_row = max(rows, default=-1)
+
+            for row_number, values in enumerate(sheet_rows):
+                if row_number > last_row:
+                    break
+
+                if row_number in rows:
+                    values = list(values[: len(columns)])
+                    kept.append(values + [None] * (len(columns) - len(values)))
+        finally:
+            wb_obj.close()
+
+        df = pandas.DataFrame(kept, columns=columns)
+        return df if dtype is None else df.astype(dtype)
+
+    def row_count(self, sheet_name: str) -> Union[int, None]:
+        """Counts a sheet's rows below the header without reading them into a DataFrame.
+        See sheet_size().
+
+        Parameters
+        ----------
+        sheet_name : str
+
+        Returns
+        -------
+        rows : int or None  None if it can't be counted cheaply; read the sheet instead.
+        """
+        size = self.sheet_size(sheet_name=sheet_name)
+        return None if size is None else size["rows"]
+
+    def sheet_size(self, sheet_name: str) -> Union[dict, None]:
+        """Sizes up a sheet without reading it into a DataFrame: from the dimension an .xlsx file
+        records for the sheet & the sizes of its parts, or from a .csv file's lines & header.
+        Blank rows & line breaks inside quoted text make this approximate.
+
+        Parameters
+        ----------
+        sheet_name : str
+
+        Returns
+        -------
+        size : dict or None     'rows' (below the header), 'columns' & 'text_bytes' (about how much
+                                    text the sheet holds: for .xlsx, the workbook's shared strings,
+                                    which other sheets may share). None if it can't be sized cheaply.
+        """
+        try:
+            if self.__extension in CSV_FORMATS:
+                return self.__sheet_size_csv()
+
+            if self.__extension in (".xlsx", ".xlsm"):
+                return self.__sheet_size_xlsx(sheet_name=sheet_name)
+        except (KeyError, ElementTree.ParseError, zipfile.BadZipFile):
+            pass
+
+        return None
+
+    def __sheet_size_csv(self) -> dict:
+        """Counts the lines of a .csv file, less the header, & the header's columns.
+
+        Returns
+        -------
+        size : dict     As for sheet_size().
+        """
+        lines = 0
+        text_bytes = 0
+        header = b""
+        last_block = b""
+        source = self.__source()
+
+        with open(source, "rb") if isinstance(source, str) else source as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                if lines == 0:
+                    header += block.split(b"\n", 1)[0]
+
+                lines += block.count(b"\n")
+                text_bytes += len(block)
+                last_block = block
+
+        if last_block and not last_block.endswith(b"\n"):
+            lines += 1
+
+        header_text = header.decode("utf-8", errors="replace").strip()
+        return {
+            "rows": max(lines - 1, 0),
+            "columns": len(next(csv.reader([header_text]), [])) if header_text else 0,
+            "text_bytes": text_bytes,
+        }
+
+    def __sheet_size_xlsx(self, sheet_name: str) -> Union[dict, None]:
+        """Reads a sheet's <dimension> from the start of its part of an .xlsx file.
+
+        Parameters
+        ----------
+        sheet_name : str
+
+        Returns
+        -------
+        size : dict or None     As for sheet_size().
+        """
+        with zipfile.ZipFile(self.__source()) as archive:
+            workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+            relationships = ElementTree.fromstring(
+                archive.read("xl/_rels/workbook.xml.rels")
+            )
+            relationship_id = None
+
+            for element in workbook.iter():
+                if element.tag.endswith("}sheet") and element.get("name") == sheet_name:
+                    relationship_id = element.get(f"{{{RELATIONSHIPS_NAMESPACE}}}id")
+
+            targets = [
+                element.get("Target")
+                for element in relationships.iter()
+                if element.get("Id") == relationship_id
+            ]
+            target = targets[0] if relationship_id is not None and targets else None
+
+            if target is None:
+                #   No (or a broken) relationship to the sheet's part: size unknown.
+                return None
+
+            if target.startswith("/"):
+                part = target.lstrip("/")
+            else:
+                part = posixpath.normpath(posixpath.join("xl", target))
+
+            ref = None
+
+            with archive.open(part) as stream:
+                for _, element in ElementTree.iterparse(stream, events=("start",)):
+                    if element.tag.endswith("}dimension"):
+                        ref = element.get("ref", "")
+                        break
+
+                    if element.tag.endswith("}sheetData"):
+                        #   No dimension recorded; don't read on through the cells.
+                        break
+
+            #   Like 'A1:K5000', or just 'A1' for a sheet with one cell.
+            corners = re.fullmatch(
+                r"\$?([A-Z]+)\$?(\d+)(?::\$?([A-Z]+)\$?(\d+))?", ref or ""
+            )
+
+            if corners is None:
+                return None
+
+            first_column, first_row, last_column, last_row = corners.groups()
+            shared_strings = [
+                info.file_size
+                for info in archive.infolist()
+                if info.filename == "xl/sharedStrings.xml"
+            ]
+            return {
+                "rows": max(int(last_row or first_row) - 1, 0),
+                "columns": self.__column_number(last_column or first_column)
+                - self.__column_number(first_column)
+                + 1,
+                "text_bytes": shared_strings[0]
+                if shared_strings
+                else archive.getinfo(part).file_size,
+            }
+
+    def __source(self) -> Union[str, io.BytesIO]:
+        """What to read: the file, or a fresh stream over its contents if they're in memory.
+
+        Returns
+        -------
+        source : str or io.BytesIO
+        """
+        if self.__data is None:
+            return self.__filename
+
+        return io.BytesIO(self.__data)
@@ -0,0 +1,283 @@
+"""
+Module: contains class MemoryPlanner, which sizes up each sheet from the workbook's metadata before it's read
+& picks how to process it (all in memory, in chunks, or streamed through memory-mapped files) to stay
+within a memory budget, and parse_size, which reads budgets like '8G'.
+"""
+import re
+from typing import Union
+
+from excelpostprocessor.input_engine import InputEngine, _module_available
+from excelpostprocessor.plan import SheetPlan, WorkbookPlan
+
+#   Processing modes, from fastest (& hungriest) to leanest.
+MODES = ("in_memory", "chunked", "streaming")
+
+#   Rough costs, in bytes, of holding a sheet in pandas: each cell's Python object & pointer, beyond its text,
+#   & each cell once its text is memory-mapped (Arrow offsets & the pointers to them).
+BYTES_PER_CELL = 64
+BYTES_PER_MAPPED_CELL = 16
+
+#   Text loaded into Python strings takes about twice its size in the file (object headers, wider characters).
+TEXT_LOAD_FACTOR = 2
+
+#   The rules make temporary copies of the rows they're working on: about this many at once.
+RULE_COPIES = 3
+
+#   Fewer rows per chunk than this & the per-chunk overhead outweighs the memory saved.
+MIN_CHUNK_ROWS = 1000
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(text: str) -> int:
+    """Reads a size in bytes, optionally with a unit, like '8G', '512 MB' or '1000000'.
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    size : int  Bytes.
+
+    Raises
+    ------
+    ValueError  If the text isn't a positive size.
+    """
+    match = re.fullmatch(
+        r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*", str(text), flags=re.IGNORECASE
+    )
+
+    if match is None:
+        raise ValueError(f"Unable to read '{text}' as a size, like '8G' or '512MB'.")
+
+    size = int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+    if size < 1:
+        raise ValueError(f"Size '{text}' must be positive.")
+
+    return size
+
+
+class MemoryPlanner:
+    """
+    Before each sheet is read, works out from the dimension the workbook records for it (& the size of its text)
+    about how much memory processing it will take, & picks the fastest way to process it within the budget:
+
+        in_memory   The whole sheet at once, as usual.
+        chunked     The rules run on blocks of rows, so their temporary copies stay small.
+        streaming   Text columns are memory-mapped (as with <spill>) & the rules run in chunks.
+                    The sheet is still read whole first, so reading it must fit in the budget.
+
+    Chunking & spilling the config asks for are kept. A sheet that doesn't fit even streamed is marked so,
+    to be skipped rather than run out of memory. The estimates are rough & cover reading the sheet
+    & running the rules; writing the results takes the same memory whatever the mode.
+    """
+
+    def __init__(self, budget_bytes: int) -> None:
+        """Sets up the planner.
+
+        Parameters
+        ----------
+        budget_bytes : int  Memory a sheet may use.
+        """
+        if not isinstance(budget_bytes, int) or budget_bytes < 1:
+            raise TypeError("Argument 'budget_bytes' is not the expected positive int.")
+
+        self.__budget_bytes = budget_bytes
+
+    def __chunk_rows(self, held_bytes: int, rule_bytes: int, rows: int) -> int:
+        """Finds the largest chunk whose rule copies fit in the budget alongside the sheet.
+
+        Parameters
+        ----------
+        held_bytes : int    Memory taken by the sheet itself.
+        rule_bytes : int    Memory the rules take on the whole sheet at once.
+        rows : int
+
+        Returns
+        -------
+        chunk_rows : int    At least MIN_CHUNK_ROWS, even if that doesn't fit.
+        """
+        spare_bytes = self.__budget_bytes - held_bytes
+
+        if rule_bytes <= 0 or spare_bytes <= 0:
+            return MIN_CHUNK_ROWS
+
+        return max(int(rows * spare_bytes / rule_bytes), MIN_CHUNK_ROWS)
+
+    @staticmethod
+    def __decide(
+        plan: WorkbookPlan,
+        decision: dict,
+        mode: str,
+        estimated_bytes: Union[float, None],
+        chunk_rows: Union[int, None],
+        reason: str,
+        fits: Union[bool, None] = True,
+    ) -> tuple:
+        """Sets up the plan for the mode picked & records why.
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        decision : dict                 Added to.
+        mode : str                      One of MODES.
+        estimated_bytes : float or None
+        chunk_rows : int or None        Rows per chunk for the mode; a smaller chunk the config asks for is kept.
+        reason : str
+        fits : bool or None             Is the estimate within the budget? None if there's no estimate.
+
+        Returns
+        -------
+        plan : WorkbookPlan
+        decision : dict
+        """
+        if chunk_rows is None or (
+            plan.chunk_rows is not None and plan.chunk_rows < chunk_rows
+        ):
+            chunk_rows = plan.chunk_rows
+
+        spill = plan.spill or mode == "streaming"
+        decision.update(
+            {
+                "mode": mode,
+                "reason": reason,
+                "estimated_bytes": None
+                if estimated_bytes is None
+                else int(estimated_bytes),
+                "chunk_rows": chunk_rows,
+                "spill": spill,
+                "fits": fits,
+            }
+        )
+        return plan._replace(chunk_rows=chunk_rows, spill=spill), decision
+
+    def plan_sheet(
+        self, plan: WorkbookPlan, sheet_plan: SheetPlan, source_file: str
+    ) -> tuple:
+        """Picks how to process one sheet.
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        sheet_plan : SheetPlan
+        source_file : str
+
+        Returns
+        -------
+        plan : WorkbookPlan     To read & process the sheet with: the one given, with chunk_rows & spill set
+                                    for the mode picked.
+        decision : dict         'mode', 'reason', 'budget_bytes', 'estimated_bytes' (None if the sheet
+                                    couldn't be sized), 'read_bytes' (of that, reading the sheet, which
+                                    every mode does whole), 'rows', 'columns', 'chunk_rows', 'spill'
+                                    & 'fits' (False if even the leanest mode goes over the budget:
+                                    don't process the sheet; None if the sheet couldn't be sized).
+        """
+        size = None
+
+        try:
+            size = InputEngine(filename=source_file, engine=plan.engine).sheet_size(
+                sheet_name=sheet_plan.name
+            )
+        except (OSError, ValueError):
+            pass
+
+        decision = {
+            "budget_bytes": self.__budget_bytes,
+            "read_bytes": None,
+            "rows": None if size is None else size["rows"],
+            "columns": None if size is None else size["columns"],
+        }
+
+        if size is None:
+            #   Like an .xls file, or an .xlsx file without a dimension: nothing to go on.
+            return self.__decide(
+                plan=plan,
+                decision=decision,
+                mode="in_memory",
+                estimated_bytes=None,
+                chunk_rows=None,
+                reason="The sheet's size isn't recorded in the workbook; processing it as configured.",
+                fits=None,
+            )
+
+        rows = max(size["rows"], 1)
+        cells = rows * max(size["columns"], 1)
+        text_bytes = size["text_bytes"] * TEXT_LOAD_FACTOR
+        held_bytes = cells * BYTES_PER_CELL + text_bytes
+        rule_bytes = text_bytes * RULE_COPIES
+        in_memory_bytes = held_bytes + rule_bytes
+        decision["read_bytes"] = int(held_bytes)
+
+        if in_memory_bytes <= self.__budget_bytes and not plan.spill:
+            return self.__decide(
+                plan=plan,
+                decision=decision,
+                mode="in_memory",
+                estimated_bytes=in_memory_bytes,
+                chunk_rows=None,
+                reason="The whole sheet fits in the budget.",
+            )
+
+        chunk_rows = self.__chunk_rows(
+            held_bytes=held_bytes, rule_bytes=rule_bytes, rows=rows
+        )
+        chunked_bytes = held_bytes + rule_bytes * min(chunk_rows / rows, 1)
+
+        if chunked_bytes <= self.__budget_bytes and not plan.spill:
+            return self.__decide(
+                plan=plan,
+                decision=decision,
+                mode="chunked",
+                estimated_bytes=chunked_bytes,
+                chunk_rows=chunk_rows,
+                reason=f"The whole sheet needs about {in_memory_bytes} bytes, over the budget, "
+                f"but the sheet fits when the rules run on {chunk_rows} rows at a time.",
+            )
+
+        if not _module_available("pyarrow"):
+            return self.__decide(
+                plan=plan,
+                decision=decision,
+                mode="chunked",
+                estimated_bytes=chunked_bytes,
+                chunk_rows=chunk_rows,
+                reason=f"In chunks the sheet needs about {chunked_bytes:.0f} bytes, over the budget, "
+                "& streaming it needs pyarrow.",
+                fits=False,
+            )
+
+        #   The sheet is still read whole before its text is mapped out, so the read is the floor.
+        mapped_bytes = cells * BYTES_PER_MAPPED_CELL
+        chunk_rows = self.__chunk_rows(
+            held_bytes=mapped_bytes, rule_bytes=rule_bytes, rows=rows
+        )
+        streaming_bytes = max(
+            held_bytes, mapped_bytes + rule_bytes * min(chunk_rows / rows, 1)
+        )
+
+        if streaming_bytes > self.__budget_bytes:
+            reason = (
+                f"Even streamed the sheet needs about {streaming_bytes:.0f} bytes, "
+                f"over the budget, not least about {held_bytes} bytes to read it."
+            )
+        elif plan.spill:
+            reason = (
+                "The config asks for spilling, so the sheet's text is memory-mapped."
+            )
+        else:
+            reason = (
+                f"Even in chunks the sheet needs about {chunked_bytes:.0f} bytes, over the budget, "
+                "but it fits with its text memory-mapped once read."
+            )
+
+        return self.__decide(
+            plan=plan,
+            decision=decision,
+            mode="streaming",
+            estimated_bytes=streaming_bytes,
+            chunk_rows=chunk_rows,
+            reason=reason,
+            fits=streaming_bytes <= self.__budget_bytes,
+        )
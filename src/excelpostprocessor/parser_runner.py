@@ -1,11 +1,55 @@
 """
 Module: contains class ParserRunner.
 """
+import concurrent.futures
 import os
-from typing import Union
-import xmltodict
-
-from excelpostprocessor.excel_postprocessor import ExcelParser
+import re
+import sys
+import time
+from typing import TYPE_CHECKING, BinaryIO, Tuple, Union
+
+#   Only the standard library is imported up front, so validating a config file
+#   stays fast; pandas & friends are loaded when a workbook is actually processed.
+from excelpostprocessor.checkpoint import (
+    CheckpointJournal,
+    file_hash,
+    journal_filename,
+)
+from excelpostprocessor.config_cache import PlanCache
+from excelpostprocessor.config_loader import parse_config
+from excelpostprocessor.input_engine import (
+    CSV_ENGINES,
+    EXCEL_ENGINES,
+    STRING_STORAGES,
+    InputEngine,
+)
+from excelpostprocessor.memory_planner import MemoryPlanner
+from excelpostprocessor.plan import (
+    CleaningRule,
+    ExtractRule,
+    RowFilter,
+    SheetPlan,
+    WorkbookPlan,
+)
+from excelpostprocessor.profiler import (
+    DEFAULT_SLOWEST_ROWS,
+    PROFILE_VERSION,
+    RuleProfiler,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas
+
+    from excelpostprocessor.excel_postprocessor import ExcelParser
+
+#   <extract mode="..."> values.
+EXTRACT_MODES = ("first", "all")
+
+#   Rows read from each sheet by estimate().
+ESTIMATE_SAMPLE_ROWS = 1000
+
+#   <workers> above 1 shares the rows through multiprocessing.shared_memory, new in Python 3.8.
+SHARED_MEMORY_AVAILABLE = sys.version_info >= (3, 8)
 
 
 class ParserRunner:
@@ -13,183 +57,399 @@ class ParserRunner:
     Handles the reading/parsing of config .xml file & creates/invokes ExcelParser objects to do the worksheet parsing.
     """
 
-    def __init__(self, config_filename: str) -> None:
+    #   Compiled configs, shared by every runner in this process & keyed by config file path.
+    #   Each entry remembers the file's modification time & size so edits are picked up.
+    __plan_cache: dict = {}
+
+    def __init__(
+        self,
+        config_filename: str,
+        write_workers: int = 0,
+        max_pending_writes: int = 2,
+        cache_directory: Union[str, None] = None,
+        memory_budget: Union[int, None] = None,
+    ) -> None:
+        """Sets up the runner; call process() to process the workbook.
+
+        Parameters
+        ----------
+        config_filename : str
+        write_workers : int         Processes writing output workbooks in the background, while the next
+                                        sheet is processed. With 0, each workbook is written before moving on.
+        max_pending_writes : int    Sheets allowed to wait to be written, which bounds memory use:
+                                        once this many are waiting, processing waits for the oldest.
+        cache_directory : Optional str  Keep compiled configs here, so other processes running the same config
+                                            skip parsing & validating it. Must be a directory you trust.
+        memory_budget : Optional int    Bytes each sheet may use: each is processed in memory, in chunks
+                                            or streamed to stay within it, as a MemoryPlanner picks from
+                                            the size the workbook records for it. See report().
+        """
         if not isinstance(config_filename, str):
             raise TypeError("Argument 'config_filename' is not the expected string.")
 
+        if not isinstance(write_workers, int) or write_workers < 0:
+            raise TypeError("Argument 'write_workers' is not the expected int >= 0.")
+
+        if not isinstance(max_pending_writes, int) or max_pending_writes < 1:
+            raise TypeError(
+                "Argument 'max_pending_writes' is not the expected positive int."
+            )
+
+        if memory_budget is not None and (
+            not isinstance(memory_budget, int) or memory_budget < 1
+        ):
+            raise TypeError(
+                "Argument 'memory_budget' is not the expected positive int."
+            )
+
         #   Parse config .xml file.
         if not os.path.exists(config_filename):
             raise FileExistsError(f"Unable to find file '{config_filename}'.")
 
         self.__config_filename = config_filename
-
-    def __column_name(self, column_config: dict, sheet_name: str) -> str:
-        """Extracts the column name from the dict created from the .xml file.
-        Assumes calling methods have screened inputs to be proper type.
+        self.__cache_directory = cache_directory
+        self.__memory_planner = (
+            None if memory_budget is None else MemoryPlanner(budget_bytes=memory_budget)
+        )
+        self.__report: dict = {}
+        self.__write_workers = write_workers
+        self.__max_pending_writes = max_pending_writes
+        self.__write_executor: Union[concurrent.futures.Executor, None] = None
+        self.__journal: Union[CheckpointJournal, None] = None
+
+        #   (future, ExcelParser, sheet stats, report, journal, fingerprint, start time)
+        #   for each background write.
+        self.__pending_writes: list = []
+
+        #   Sheet stats of the background writes finished since the last flush().
+        self.__finished_writes: list = []
+
+    @staticmethod
+    def apply_rules(
+        excel_parser: "ExcelParser",
+        sheet_plan: SheetPlan,
+        executor: Union[concurrent.futures.Executor, None] = None,
+        workers: int = 1,
+    ) -> "ExcelParser":
+        """Runs a sheet's cleaning & extract rules. This is the CPU-bound step, kept free of
+        any runner state so it can be shipped to a worker process.
 
         Parameters
         ----------
-        column_config : dict
-        sheet_name : str
+        excel_parser : ExcelParser  As returned by load_sheet.
+        sheet_plan : SheetPlan
+        executor : Optional concurrent.futures.Executor     Worker processes to split the rows between.
+                                                                The source column goes to them through
+                                                                shared memory, not pickled.
+        workers : int               How many blocks of rows to split the sheet into.
 
         Returns
         -------
-        column_name : str
+        excel_parser : ExcelParser  The same object, ready to be written out.
         """
-        if "name" not in column_config:
-            raise SyntaxError(
-                f"Unable to find 'name' for this source column in sheet '{sheet_name}' "
-                f"in file '{self.__config_filename}'."
+        if (
+            executor is not None
+            and workers > 1
+            and sheet_plan.extracts
+            and excel_parser.diagnostics() is None
+            and len(excel_parser.data()) > 1
+            and ParserRunner.__rows_in_place(excel_parser=excel_parser)
+        ):
+            ParserRunner.__apply_rules_shared(
+                excel_parser=excel_parser,
+                sheet_plan=sheet_plan,
+                executor=executor,
+                workers=workers,
+            )
+            excel_parser.rejoin_rows()
+            return excel_parser
+
+        for cleaning_rule in sheet_plan.cleaning:
+            excel_parser.clean_column(
+                column_name=sheet_plan.column_name,
+                pattern=cleaning_rule.pattern,
+                replace=cleaning_rule.replace,
             )
 
-        column_name: str = column_config["name"]
-        return column_name
+        for extract_rule in sheet_plan.extracts:
+            if extract_rule.mode == "all":
+                excel_parser.extract_all(
+                    column_name=sheet_plan.column_name,
+                    pattern=extract_rule.pattern,
+                    new_column=extract_rule.new_column,
+                    max_matches=extract_rule.max_matches,
+                )
+                continue
 
-    def __extract_sheets_from_workbook(self, workbook_config: dict) -> list:
-        """Pulls a list of sheet configuration dictionaries from the overall workbook config dict.
+            excel_parser.extract_into_new_column(
+                column_name=sheet_plan.column_name,
+                pattern=extract_rule.pattern,
+                new_column=extract_rule.new_column,
+            )
+
+        if sheet_plan.cleaning:
+            #   Show the original text, not the cleaned version, in the results.
+            excel_parser.restore_original_column(column_name=sheet_plan.column_name)
+
+        #   Put back any rows a filter set aside, untouched.
+        excel_parser.rejoin_rows()
+        return excel_parser
+
+    @staticmethod
+    def __apply_rules_shared(
+        excel_parser: "ExcelParser",
+        sheet_plan: SheetPlan,
+        executor: concurrent.futures.Executor,
+        workers: int,
+    ) -> "ExcelParser":
+        """Runs a sheet's rules on blocks of rows in worker processes, which read the source column
+        from shared memory & send back only the new columns.
 
         Parameters
         ----------
-        workbook_config : dict
+        excel_parser : ExcelParser
+        sheet_plan : SheetPlan
+        executor : concurrent.futures.Executor
+        workers : int
 
         Returns
         -------
-        sheets_config : list of dict
+        excel_parser : ExcelParser
         """
-        #   Can't exercise this type checking because it's already tested in the previous method.
-        #   But leave this type check here in case modules get rearranged in the future.
-        if not isinstance(workbook_config, dict):  # pragma: no cover
-            raise TypeError("Argument 'workbook_config' is not the expected dict.")
+        import pandas
+
+        rows = len(excel_parser.data())
+        block_rows = -(-rows // workers)
+
+        with excel_parser.publish(column_names=[sheet_plan.column_name]) as shared:
+            futures = [
+                executor.submit(
+                    ParserRunner.apply_rules_to_rows,
+                    shared.handles(),
+                    sheet_plan,
+                    start,
+                    min(start + block_rows, rows),
+                    excel_parser.chunk_rows(),
+                )
+                for start in range(0, rows, block_rows)
+            ]
+            results = [future.result() for future in futures]
+
+        side_sheets: dict = {}
+
+        for _, block_side_sheets in results:
+            for name, side_sheet in block_side_sheets.items():
+                side_sheets.setdefault(name, []).append(side_sheet)
+
+        excel_parser.merge_results(
+            column_name=sheet_plan.column_name,
+            new_data=pandas.concat([new_data for new_data, _ in results]),
+            side_sheets={
+                name: pandas.concat(side_sheet, ignore_index=True)
+                for name, side_sheet in side_sheets.items()
+            },
+        )
+        return excel_parser
+
+    @staticmethod
+    def apply_rules_to_rows(
+        shared_columns: dict,
+        sheet_plan: SheetPlan,
+        start: int,
+        stop: int,
+        chunk_rows: Union[int, None] = None,
+    ) -> tuple:
+        """Runs a sheet's rules on some rows of its published source column. Runs in a worker process.
 
-        if "sheet" not in workbook_config:
-            raise SyntaxError(
-                f"Unable to find 'workbook/sheet' in file '{self.__config_filename}'."
-            )
+        Parameters
+        ----------
+        shared_columns : dict   From SharedColumns.handles().
+        sheet_plan : SheetPlan
+        start : int             First row.
+        stop : int              One past the last row.
+        chunk_rows : Optional int   Run the rules on blocks of this many rows, as the whole sheet would be.
 
-        raw_sheets_config: Union[dict, list] = workbook_config["sheet"]
-        sheets_config: list
+        Returns
+        -------
+        new_data : pandas.DataFrame     The new columns for these rows.
+        side_sheets : dict              Side sheets for these rows, with their 'Row' numbers
+                                            counting from the top of the whole sheet.
+        """
+        from excelpostprocessor.excel_postprocessor import ExcelParser
+
+        excel_parser = ParserRunner.apply_rules(
+            excel_parser=ExcelParser.attach(
+                shared_columns=shared_columns,
+                start=start,
+                stop=stop,
+                sheet_name=sheet_plan.name,
+                chunk_rows=chunk_rows,
+            ),
+            sheet_plan=sheet_plan,
+        )
+        side_sheets = {}
 
-        #   If there's only one sheet, sheets_config will be a dict.
-        #   Let's turn it into a single-element list.
-        if isinstance(raw_sheets_config, dict):
-            sheets_config = [raw_sheets_config]
-        else:
-            sheets_config = raw_sheets_config
+        for name, side_sheet in excel_parser.side_sheets().items():
+            side_sheet = side_sheet.copy()
+            side_sheet["Row"] += start
+            side_sheets[name] = side_sheet
 
-        return sheets_config
+        return (
+            excel_parser.data().drop(columns=[sheet_plan.column_name]),
+            side_sheets,
+        )
 
-    def __extract_workbook_name(self, config: dict) -> str:
-        """Gets the Excel workbook name from the config dictionary.
+    def __check_pattern(self, pattern: str, sheet_name: str) -> None:
+        """Makes sure a regex compiles, so a typo is reported before any work is done.
 
         Parameters
         ----------
-        config : dict
-
-        Returns
-        -------
-        workbook_name : str
+        pattern : str
+        sheet_name : str
         """
-        if not isinstance(config, dict):
-            raise TypeError("Argument 'config' is not the expected dict.")
-
-        if "name" not in config:
+        if not isinstance(pattern, str):
             raise SyntaxError(
-                f"Unable to find 'workbook/name' in file '{self.__config_filename}'."
+                f"Empty 'pattern' in sheet '{sheet_name}' in file '{self.__config_filename}'."
             )
 
-        workbook_name = config["name"]
-
-        if not isinstance(workbook_name, str) or not os.path.exists(workbook_name):
-            raise FileExistsError(f"Unable to find file '{workbook_name}'.")
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise SyntaxError(
+                f"Unable to compile pattern '{pattern}' in sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}': {e}."
+            ) from e
 
-        return workbook_name
+    @staticmethod
+    def __check_source(source_filename: Union[str, None]) -> str:
+        """Makes sure the workbook to be processed exists.
 
-    def process(self) -> bool:
-        """Processes the job, reading the config file, setting up and running an ExcelParser object.
+        Parameters
+        ----------
+        source_filename : str or None
 
         Returns
         -------
-        success : bool   Did anything happen?
+        source_filename : str
         """
+        if not isinstance(source_filename, str) or not os.path.exists(source_filename):
+            raise FileExistsError(f"Unable to find file '{source_filename}'.")
 
-        workbook_config = self.__read_config()
-        source_filename = self.__extract_workbook_name(config=workbook_config)
-        sheets_config = self.__extract_sheets_from_workbook(
-            workbook_config=workbook_config
-        )
-        success: bool = self.__process_sheets(
-            sheets_config=sheets_config, source_file=source_filename
-        )
-        return success
+        return source_filename
 
-    def __process_column(
-        self, parser: ExcelParser, column_config: dict, sheet_name: str
-    ) -> bool:
-        """Extracts the information for this column's processing & calls the ExcelParser object
-        to parse & generate the new column.
+    def __column_dtype(self, column_config: dict, sheet_name: str) -> Union[dict, None]:
+        """Builds the dtype override for the sheet's source column, if the config has a 'dtype' entry.
+        Lets the report text be read straight in as a string without type inference.
 
         Parameters
         ----------
-        column_config : dict    Defines the column name, regex and the name of the column to be created.
+        column_config : dict
+        sheet_name : str
 
         Returns
         -------
-        need_to_restore_column : bool   Lets calling method know we'll need to restore this column to its original value before writing out results.
+        dtype : dict or None
         """
-        if not isinstance(column_config, dict):
-            raise TypeError("Argument 'column_config' is not the expected dict.")
+        if "dtype" not in column_config:
+            return None
 
-        source_column_name = self.__column_name(
-            column_config=column_config, sheet_name=sheet_name
-        )
+        column_name = column_config.get("name")
+        dtype = column_config["dtype"]
 
-        if not isinstance(source_column_name, str):
-            raise TypeError("Argument 'source_column_name' is not the expected str.")
+        if not isinstance(column_name, str) or not isinstance(dtype, str):
+            raise SyntaxError(
+                f"Unable to read 'dtype' for source column in sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}'."
+            )
 
-        need_to_restore_column = False
+        return {column_name: dtype}
 
-        if "cleaning" in column_config:
-            cleaning_config = column_config["cleaning"]
+    def __column_name(self, column_config: dict, sheet_name: str) -> str:
+        """Extracts the column name from the dict created from the .xml file.
+        Assumes calling methods have screened inputs to be proper type.
 
-            if isinstance(cleaning_config, dict):
-                cleaning_config = [cleaning_config]
+        Parameters
+        ----------
+        column_config : dict
+        sheet_name : str
 
-            self.__process_column_cleaning(
-                parser=parser,
-                cleaning_rules=cleaning_config,
-                sheet_name=sheet_name,
-                column_name=source_column_name,
+        Returns
+        -------
+        column_name : str
+        """
+        if "name" not in column_config:
+            raise SyntaxError(
+                f"Unable to find 'name' for this source column in sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}'."
             )
 
-            need_to_restore_column = True
+        column_name: str = column_config["name"]
+        return column_name
+
+    def __compile(self, check_source: bool) -> WorkbookPlan:
+        """Reads the config file & validates everything in it, without reading the workbook.
+
+        Parameters
+        ----------
+        check_source : bool     Also make sure the workbook named in the config exists.
+
+        Returns
+        -------
+        plan : WorkbookPlan
+        """
+        workbook_config = self.__read_config()
+
+        if not isinstance(workbook_config, dict):
+            raise TypeError("Argument 'config' is not the expected dict.")
 
-        if "extract" not in column_config:
+        if "name" not in workbook_config:
             raise SyntaxError(
-                f"Unable to find 'extract' for column '{source_column_name}' in sheet '{sheet_name}' "
-                f"in file '{self.__config_filename}'."
+                f"Unable to find 'workbook/name' in file '{self.__config_filename}'."
             )
 
-        extracts_config = column_config["extract"]
+        if check_source:
+            self.__check_source(source_filename=workbook_config["name"])
 
-        if isinstance(extracts_config, dict):
-            extracts_config = [extracts_config]
-
-        self.__process_column_extract(
-            parser=parser,
-            extracts=extracts_config,
-            sheet_name=sheet_name,
-            column_name=source_column_name,
+        sheets_config = self.__extract_sheets_from_workbook(
+            workbook_config=workbook_config
+        )
+        rule_sets = self.__compile_rule_sets(workbook_config=workbook_config)
+        return WorkbookPlan(
+            source_filename=workbook_config["name"],
+            engine=self.__extract_engine(config=workbook_config),
+            string_storage=self.__extract_string_storage(config=workbook_config),
+            diagnostics=self.__extract_switch(
+                config=workbook_config, key="diagnostics"
+            ),
+            spill=self.__extract_switch(config=workbook_config, key="spill"),
+            spill_directory=self.__extract_spill_directory(config=workbook_config),
+            chunk_rows=self.__extract_positive_int(
+                config=workbook_config, key="chunk_rows"
+            ),
+            sheets=tuple(
+                self.__compile_sheet(sheet_config=sheet_config, rule_sets=rule_sets)
+                for sheet_config in sheets_config
+            ),
+            workers=self.__extract_workers(config=workbook_config),
         )
 
-        return need_to_restore_column
+    def __compile_cleaning(
+        self, cleaning_rules: list, sheet_name: str, column_name: str
+    ) -> tuple:
+        """Validates the <cleaning> statements for one column.
+
+        Parameters
+        ----------
+        cleaning_rules : list of dict
+        sheet_name : str
+        column_name : str
+
+        Returns
+        -------
+        cleaning : tuple of CleaningRule
+        """
+        compiled_rules = []
 
-    def __process_column_cleaning(
-        self,
-        parser: ExcelParser,
-        cleaning_rules: list,
-        sheet_name: str,
-        column_name: str,
-    ) -> None:
         for this_cleaning_rule in cleaning_rules:
             if "pattern" not in this_cleaning_rule:
                 raise SyntaxError(
@@ -203,15 +463,35 @@ class ParserRunner:
                     f"in file '{self.__config_filename}'."
                 )
 
-            parser.clean_column(
-                column_name=column_name,
-                pattern=this_cleaning_rule["pattern"],
-                replace=this_cleaning_rule["replace"],
+            self.__check_pattern(
+                pattern=this_cleaning_rule["pattern"], sheet_name=sheet_name
+            )
+            compiled_rules.append(
+                CleaningRule(
+                    pattern=this_cleaning_rule["pattern"],
+                    replace=this_cleaning_rule["replace"],
+                )
             )
 
-    def __process_column_extract(
-        self, parser: ExcelParser, extracts: list, sheet_name: str, column_name: str
-    ) -> None:
+        return tuple(compiled_rules)
+
+    def __compile_extract(
+        self, extracts: list, sheet_name: str, column_name: str
+    ) -> tuple:
+        """Validates the <extract> statements for one column.
+
+        Parameters
+        ----------
+        extracts : list of dict
+        sheet_name : str
+        column_name : str
+
+        Returns
+        -------
+        extracts : tuple of ExtractRule
+        """
+        compiled_rules = []
+
         for this_extract in extracts:
             if "pattern" not in this_extract:
                 raise SyntaxError(
@@ -225,104 +505,1478 @@ class ParserRunner:
                     f"in file '{self.__config_filename}'."
                 )
 
-            parser.extract_into_new_column(
-                column_name=column_name,
-                pattern=this_extract["pattern"],
-                new_column=this_extract["new_column"],
+            patterns = this_extract["pattern"]
+
+            for pattern in patterns if isinstance(patterns, list) else [patterns]:
+                self.__check_pattern(pattern=pattern, sheet_name=sheet_name)
+
+            new_column = self.__compile_new_column(
+                new_column_config=this_extract["new_column"],
+                patterns=patterns if isinstance(patterns, list) else [patterns],
+                sheet_name=sheet_name,
             )
+            mode = this_extract.get("@mode", "first")
 
-    def __process_sheets(self, sheets_config: list, source_file: str) -> bool:
-        """For each sheet, build the ExcelParser object aimed at that sheet & process all its columns.
+            if mode not in EXTRACT_MODES:
+                raise SyntaxError(
+                    f"Unknown extract mode '{mode}' in sheet '{sheet_name}' "
+                    f"in file '{self.__config_filename}'."
+                )
+
+            compiled_rules.append(
+                ExtractRule(
+                    pattern=patterns,
+                    new_column=new_column,
+                    mode=mode,
+                    max_matches=self.__compile_max_matches(
+                        extract_config=this_extract, mode=mode, sheet_name=sheet_name
+                    ),
+                )
+            )
+
+        return tuple(compiled_rules)
+
+    def __compile_filters(self, sheet_config: dict, sheet_name: str) -> tuple:
+        """Validates a sheet's <filter> statements, which pick the rows the rules run on.
 
         Parameters
         ----------
-        sheets_config : list of dict objects, one per worksheet
-        source_file : Excel workbook being processed
+        sheet_config : dict
+        sheet_name : str
 
         Returns
         -------
-        success : bool  Did it work?
+        filters : tuple of RowFilter
         """
-        success_per_sheet = []
+        filters = []
 
-        name, extension = os.path.splitext(os.path.basename(source_file))
+        for filter_config in self.__listify(sheet_config.get("filter", [])):
+            if not isinstance(filter_config, dict) or not isinstance(
+                filter_config.get("column"), str
+            ):
+                raise SyntaxError(
+                    f"Unable to find 'column' for a filter in sheet '{sheet_name}' "
+                    f"in file '{self.__config_filename}'."
+                )
+
+            conditions = [
+                key for key in ("equals", "isin", "pattern") if key in filter_config
+            ]
 
-        for this_sheet in sheets_config:
-            if "name" not in this_sheet:
+            if len(conditions) != 1:
                 raise SyntaxError(
-                    f"Unable to find 'name' for this sheet in file '{self.__config_filename}'."
+                    f"Filter on column '{filter_config['column']}' in sheet '{sheet_name}' "
+                    f"needs exactly one of 'equals', 'isin' or 'pattern' "
+                    f"in file '{self.__config_filename}'."
                 )
 
-            #   We'll write out a new Excel workbook for every sheet, marked with the sheet name.
-            sheet_name = this_sheet["name"]
+            others = filter_config.get("@others", "drop")
 
-            #   In case it's None.
-            if not isinstance(sheet_name, str):
-                raise TypeError("Argument 'sheet_name' is not the expected str.")
+            if others not in ("drop", "keep"):
+                raise SyntaxError(
+                    f"Unknown filter option others='{others}' in sheet '{sheet_name}' "
+                    f"in file '{self.__config_filename}'."
+                )
 
-            output_filename = os.path.join(
-                os.path.dirname(source_file), name + "_" + sheet_name + extension
-            )
+            values = None
 
-            #   Try to instantiate an ExcelParser object for this sheet name,
-            #   but there's no guarantee the sheet exists in the Excel file,
-            #   so we'll trap the error & skip the sheet.
-            try:
-                excel_parser = ExcelParser(
-                    excel_filename=source_file, sheet_name=sheet_name
+            if "isin" in filter_config:
+                values = (
+                    filter_config["isin"].get("value")
+                    if isinstance(filter_config["isin"], dict)
+                    else None
                 )
-            except ValueError:
-                print(f"Worksheet {sheet_name} not found; skipping.")
-                success_per_sheet.append(False)
-                continue
 
-            if "source_column" not in this_sheet:
-                raise SyntaxError(
-                    f"Unable to find 'source_column' for sheet '{sheet_name}' "
-                    f"in file '{self.__config_filename}'."
+                if values is None:
+                    raise SyntaxError(
+                        f"Unable to find 'value' for a filter in sheet '{sheet_name}' "
+                        f"in file '{self.__config_filename}'."
+                    )
+
+                #   An empty <value/> matches empty text.
+                values = tuple(
+                    "" if value is None else value for value in self.__listify(values)
                 )
 
-            column_config = this_sheet["source_column"]
-            need_to_restore_column = self.__process_column(
-                parser=excel_parser, column_config=column_config, sheet_name=sheet_name
-            )
+            if "pattern" in filter_config:
+                self.__check_pattern(
+                    pattern=filter_config["pattern"], sheet_name=sheet_name
+                )
 
-            if need_to_restore_column:
-                source_column_name = self.__column_name(
-                    column_config=column_config, sheet_name=sheet_name
+            filters.append(
+                RowFilter(
+                    column_name=filter_config["column"],
+                    equals=(
+                        filter_config["equals"] or ""
+                        if "equals" in filter_config
+                        else None
+                    ),
+                    values=values,
+                    pattern=filter_config.get("pattern"),
+                    keep_others=others == "keep",
                 )
-                excel_parser.restore_original_column(column_name=source_column_name)
+            )
+
+        return tuple(filters)
+
+    def __compile_max_matches(
+        self, extract_config: dict, mode: str, sheet_name: str
+    ) -> Union[int, None]:
+        """Gets an <extract mode="all">'s optional <max_matches>: how many numbered columns to fill.
+
+        Parameters
+        ----------
+        extract_config : dict
+        mode : str
+        sheet_name : str
+
+        Returns
+        -------
+        max_matches : int or None   None means list every match in a side sheet.
+        """
+        if "max_matches" not in extract_config:
+            return None
 
-            #   Write out results for this worksheet.
-            filename_created = excel_parser.write_to_excel(
-                new_file_name=output_filename
+        if mode != "all":
+            raise SyntaxError(
+                f"'max_matches' needs <extract mode=\"all\"> in sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}'."
             )
-            print(f"Created file '{filename_created}'.")
-            success_per_sheet.append(True)
 
-        return all(success_per_sheet)
+        try:
+            max_matches = int(extract_config["max_matches"])
+        except (TypeError, ValueError):
+            max_matches = 0
 
-    def __read_config(self) -> dict:
-        """Reads/parses the configuration .xml file.
+        if max_matches < 1:
+            raise SyntaxError(
+                f"Expected a positive number for 'max_matches' in sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}'."
+            )
+
+        return max_matches
+
+    def __compile_group_columns(
+        self, new_column_config: list, patterns: list, sheet_name: str
+    ) -> dict:
+        """Validates <new_column> statements that name their pattern group in a 'group' attribute.
+
+        Parameters
+        ----------
+        new_column_config : list of dict
+        patterns : list of str
+        sheet_name : str
 
         Returns
         -------
-        config : dict       Describes how the workbook is to be parsed.
+        mapping : dict  Group number or name -> column name.
         """
-        with open(self.__config_filename, "r", encoding="utf-8") as file:
-            my_xml = file.read()
+        mapping: dict = {}
 
-            try:
-                config = xmltodict.parse(my_xml)
-            except Exception as e:
+        for config in new_column_config:
+            group = config.get("@group")
+            name = config.get("#text")
+
+            if not isinstance(group, str) or not isinstance(name, str):
                 raise SyntaxError(
-                    f"Unable to read/parse file '{self.__config_filename}'."
-                ) from e
+                    f"Expected <new_column group=\"...\">name</new_column> in sheet '{sheet_name}' "
+                    f"in file '{self.__config_filename}'."
+                )
 
-        if "workbook" not in config:
+            group_key: Union[str, int] = int(group) if group.isdigit() else group
+
+            for pattern in patterns:
+                compiled = re.compile(pattern)
+
+                if (
+                    isinstance(group_key, int) and not 1 <= group_key <= compiled.groups
+                ) or (
+                    isinstance(group_key, str) and group_key not in compiled.groupindex
+                ):
+                    raise SyntaxError(
+                        f"Pattern '{pattern}' in sheet '{sheet_name}' has no group '{group}' "
+                        f"in file '{self.__config_filename}'."
+                    )
+
+            mapping[group_key] = name
+
+        return mapping
+
+    def __compile_listed_columns(
+        self, new_column_config: list, patterns: list, sheet_name: str
+    ) -> Union[str, list]:
+        """Validates plain <new_column> statements, which take the patterns' groups in order.
+
+        Parameters
+        ----------
+        new_column_config : list of str
+        patterns : list of str
+        sheet_name : str
+
+        Returns
+        -------
+        new_column : str or list of str    Column name if only one, else names in group order.
+        """
+        if not all(isinstance(name, str) for name in new_column_config):
             raise SyntaxError(
-                f"Unable to find 'workbook' in file '{self.__config_filename}'."
+                f"Empty 'new_column' in sheet '{sheet_name}' in file '{self.__config_filename}'."
             )
 
-        workbook_config: dict = config["workbook"]
-        return workbook_config
+        if len(new_column_config) == 1:
+            name: str = new_column_config[0]
+            return name
+
+        for pattern in patterns:
+            if re.compile(pattern).groups != len(new_column_config):
+                raise SyntaxError(
+                    f"Pattern '{pattern}' in sheet '{sheet_name}' needs one group for each of "
+                    f"its {len(new_column_config)} 'new_column' in file '{self.__config_filename}'."
+                )
+
+        return list(new_column_config)
+
+    def __compile_new_column(
+        self, new_column_config: Union[str, list, dict], patterns: list, sheet_name: str
+    ) -> Union[str, list, dict]:
+        """Validates an extract's <new_column> statements against its patterns' groups.
+        One <new_column> takes the first group; several take the groups in order,
+        or the groups named in their 'group' attributes.
+
+        Parameters
+        ----------
+        new_column_config : str, list or dict   Text of one or more <new_column> statements,
+                                                    as dicts if they have attributes.
+        patterns : list of str
+        sheet_name : str
+
+        Returns
+        -------
+        new_column : str, list of str or dict   Column name, names in group order or group -> name.
+        """
+        if not isinstance(new_column_config, list):
+            new_column_config = [new_column_config]
+
+        grouped = [isinstance(config, dict) for config in new_column_config]
+
+        if any(grouped) and not all(grouped):
+            raise SyntaxError(
+                f"Either every 'new_column' or none should name a 'group' in sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}'."
+            )
+
+        if not any(grouped):
+            return self.__compile_listed_columns(
+                new_column_config, patterns, sheet_name
+            )
+
+        return self.__compile_group_columns(new_column_config, patterns, sheet_name)
+
+    def __compile_rule_sets(self, workbook_config: dict) -> dict:
+        """Validates the <rule_set> statements: named groups of <cleaning> & <extract> rules
+        that sheets can share. Each is compiled once, however many sheets use it.
+
+        Parameters
+        ----------
+        workbook_config : dict
+
+        Returns
+        -------
+        rule_sets : dict    Name -> (cleaning tuple of CleaningRule, extracts tuple of ExtractRule)
+        """
+        rule_sets_config = workbook_config.get("rule_set", [])
+
+        if isinstance(rule_sets_config, dict):
+            rule_sets_config = [rule_sets_config]
+
+        rule_sets: dict = {}
+
+        for rule_set_config in rule_sets_config:
+            name = (
+                rule_set_config.get("name")
+                if isinstance(rule_set_config, dict)
+                else None
+            )
+
+            if not isinstance(name, str):
+                raise SyntaxError(
+                    f"Unable to find 'name' for a rule set in file '{self.__config_filename}'."
+                )
+
+            if name in rule_sets:
+                raise SyntaxError(
+                    f"Rule set '{name}' is defined twice in file '{self.__config_filename}'."
+                )
+
+            rule_sets[name] = (
+                self.__compile_cleaning(
+                    cleaning_rules=self.__listify(rule_set_config.get("cleaning", [])),
+                    sheet_name=f"rule set {name}",
+                    column_name=name,
+                ),
+                self.__compile_extract(
+                    extracts=self.__listify(rule_set_config.get("extract", [])),
+                    sheet_name=f"rule set {name}",
+                    column_name=name,
+                ),
+            )
+
+        return rule_sets
+
+    def __compile_sheet(self, sheet_config: dict, rule_sets: dict) -> SheetPlan:
+        """Validates the config for one worksheet & its source column.
+
+        Parameters
+        ----------
+        sheet_config : dict
+        rule_sets : dict    Compiled rule sets the source column can use, from __compile_rule_sets.
+
+        Returns
+        -------
+        sheet_plan : SheetPlan
+        """
+        if "name" not in sheet_config:
+            raise SyntaxError(
+                f"Unable to find 'name' for this sheet in file '{self.__config_filename}'."
+            )
+
+        sheet_name = sheet_config["name"]
+
+        #   In case it's None.
+        if not isinstance(sheet_name, str):
+            raise TypeError("Argument 'sheet_name' is not the expected str.")
+
+        if "source_column" not in sheet_config:
+            raise SyntaxError(
+                f"Unable to find 'source_column' for sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}'."
+            )
+
+        column_config = sheet_config["source_column"]
+
+        if not isinstance(column_config, dict):
+            raise TypeError("Argument 'column_config' is not the expected dict.")
+
+        source_column_name = self.__column_name(
+            column_config=column_config, sheet_name=sheet_name
+        )
+
+        if not isinstance(source_column_name, str):
+            raise TypeError("Argument 'source_column_name' is not the expected str.")
+
+        #   Rules from the named rule sets come first, then the column's own.
+        cleaning: tuple = ()
+        extracts: tuple = ()
+
+        for rule_set_name in self.__listify(column_config.get("rule_set", [])):
+            if rule_set_name not in rule_sets:
+                raise SyntaxError(
+                    f"Unknown rule set '{rule_set_name}' for column '{source_column_name}' "
+                    f"in sheet '{sheet_name}' in file '{self.__config_filename}'."
+                )
+
+            cleaning += rule_sets[rule_set_name][0]
+            extracts += rule_sets[rule_set_name][1]
+
+        if "extract" not in column_config and not extracts:
+            raise SyntaxError(
+                f"Unable to find 'extract' for column '{source_column_name}' in sheet '{sheet_name}' "
+                f"in file '{self.__config_filename}'."
+            )
+
+        return SheetPlan(
+            name=sheet_name,
+            column_name=source_column_name,
+            dtype=self.__column_dtype(
+                column_config=column_config, sheet_name=sheet_name
+            ),
+            cleaning=cleaning
+            + self.__compile_cleaning(
+                cleaning_rules=self.__listify(column_config.get("cleaning", [])),
+                sheet_name=sheet_name,
+                column_name=source_column_name,
+            ),
+            extracts=extracts
+            + self.__compile_extract(
+                extracts=self.__listify(column_config.get("extract", [])),
+                sheet_name=sheet_name,
+                column_name=source_column_name,
+            ),
+            filters=self.__compile_filters(
+                sheet_config=sheet_config, sheet_name=sheet_name
+            ),
+        )
+
+    def estimate(
+        self,
+        source_filename: Union[str, None] = None,
+        sample_rows: int = ESTIMATE_SAMPLE_ROWS,
+        seed: Union[int, None] = None,
+    ) -> dict:
+        """Estimates how long processing the workbook will take, how much memory it'll need
+        & how large the outputs will be, from a random sample of each sheet's rows,
+        without writing anything. See RunEstimator.
+
+        Parameters
+        ----------
+        source_filename : Optional str  Workbook to estimate for instead of the one named in the config file.
+        sample_rows : int               Rows read from each sheet.
+        seed : Optional int             Makes the sample repeatable.
+
+        Returns
+        -------
+        estimate : dict     'config', 'source', 'sheets' (one estimate per sheet, see RunEstimator.estimate_sheet),
+                                & the run's total 'seconds' & 'output_bytes' & largest 'peak_memory_bytes'.
+        """
+        from excelpostprocessor.estimator import RunEstimator
+
+        plan, source_filename = self.prepare(source_filename=source_filename)
+        estimator = RunEstimator(sample_rows=sample_rows, seed=seed)
+        sheets = []
+
+        for sheet_plan in plan.sheets:
+            try:
+                sheets.append(
+                    estimator.estimate_sheet(
+                        plan=plan, sheet_plan=sheet_plan, source_file=source_filename
+                    )
+                )
+            except ValueError:
+                print(f"Worksheet {sheet_plan.name} not found; skipping.")
+                sheets.append({"sheet": sheet_plan.name, "skipped": True})
+
+        estimated = [sheet for sheet in sheets if not sheet.get("skipped")]
+        return {
+            "config": self.__config_filename,
+            "source": source_filename,
+            "sheets": sheets,
+            "seconds": sum(sheet["seconds"] for sheet in estimated),
+            "peak_memory_bytes": max(
+                [sheet["peak_memory_bytes"] for sheet in estimated], default=0
+            ),
+            "output_bytes": sum(sheet["output_bytes"] for sheet in estimated),
+        }
+
+    def __extract_switch(self, config: dict, key: str) -> bool:
+        """Gets an optional 'true' or 'false' setting, like <diagnostics>, from the config dictionary.
+
+        Parameters
+        ----------
+        config : dict
+        key : str
+
+        Returns
+        -------
+        switch : bool   False if not specified.
+        """
+        switch = str(config.get(key, "false")).strip().lower()
+
+        if switch not in ("true", "false"):
+            raise SyntaxError(
+                f"Expected 'true' or 'false' for 'workbook/{key}' "
+                f"in file '{self.__config_filename}'."
+            )
+
+        return switch == "true"
+
+    def __extract_engine(self, config: dict) -> Union[str, None]:
+        """Gets the optional name of the reader to use from the config dictionary.
+
+        Parameters
+        ----------
+        config : dict
+
+        Returns
+        -------
+        engine : str or None
+        """
+        if "engine" not in config:
+            return None
+
+        engine = config["engine"]
+
+        if engine not in CSV_ENGINES + EXCEL_ENGINES:
+            raise SyntaxError(
+                f"Unknown 'workbook/engine' '{engine}' in file '{self.__config_filename}'."
+            )
+
+        engine_name: str = engine
+        return engine_name
+
+    def __extract_spill_directory(self, config: dict) -> Union[str, None]:
+        """Gets the optional directory for memory-mapped column files from the config dictionary.
+
+        Parameters
+        ----------
+        config : dict
+
+        Returns
+        -------
+        spill_directory : str or None
+        """
+        if "spill_directory" not in config:
+            return None
+
+        spill_directory = config["spill_directory"]
+
+        if not isinstance(spill_directory, str):
+            raise SyntaxError(
+                f"Empty 'workbook/spill_directory' in file '{self.__config_filename}'."
+            )
+
+        return spill_directory
+
+    def __extract_positive_int(self, config: dict, key: str) -> Union[int, None]:
+        """Gets an optional positive number, like <chunk_rows>, from the config dictionary.
+
+        Parameters
+        ----------
+        config : dict
+        key : str
+
+        Returns
+        -------
+        number : int or None
+        """
+        if key not in config:
+            return None
+
+        try:
+            number = int(config[key])
+        except (TypeError, ValueError):
+            number = 0
+
+        if number < 1:
+            raise SyntaxError(
+                f"Expected a positive number for 'workbook/{key}' "
+                f"in file '{self.__config_filename}'."
+            )
+
+        return number
+
+    def __extract_sheets_from_workbook(self, workbook_config: dict) -> list:
+        """Pulls a list of sheet configuration dictionaries from the overall workbook config dict.
+
+        Parameters
+        ----------
+        workbook_config : dict
+
+        Returns
+        -------
+        sheets_config : list of dict
+        """
+        #   Can't exercise this type checking because it's already tested in the previous method.
+        #   But leave this type check here in case modules get rearranged in the future.
+        if not isinstance(workbook_config, dict):  # pragma: no cover
+            raise TypeError("Argument 'workbook_config' is not the expected dict.")
+
+        if "sheet" not in workbook_config:
+            raise SyntaxError(
+                f"Unable to find 'workbook/sheet' in file '{self.__config_filename}'."
+            )
+
+        raw_sheets_config: Union[dict, list] = workbook_config["sheet"]
+        sheets_config: list
+
+        #   If there's only one sheet, sheets_config will be a dict.
+        #   Let's turn it into a single-element list.
+        if isinstance(raw_sheets_config, dict):
+            sheets_config = [raw_sheets_config]
+        else:
+            sheets_config = raw_sheets_config
+
+        return sheets_config
+
+    def __extract_string_storage(self, config: dict) -> Union[str, None]:
+        """Gets the optional storage for text columns ('pyarrow' or 'python') from the config dictionary.
+
+        Parameters
+        ----------
+        config : dict
+
+        Returns
+        -------
+        string_storage : str or None
+        """
+        if "string_storage" not in config:
+            return None
+
+        string_storage = config["string_storage"]
+
+        if string_storage not in STRING_STORAGES:
+            raise SyntaxError(
+                f"Unknown 'workbook/string_storage' '{string_storage}' "
+                f"in file '{self.__config_filename}'."
+            )
+
+        storage_name: str = string_storage
+        return storage_name
+
+    def __extract_workers(self, config: dict) -> int:
+        """Gets the optional <workers> setting from the config dictionary.
+
+        Parameters
+        ----------
+        config : dict
+
+        Returns
+        -------
+        workers : int   1 if not set.
+        """
+        workers = self.__extract_positive_int(config=config, key="workers") or 1
+
+        if workers > 1 and not SHARED_MEMORY_AVAILABLE:
+            raise SyntaxError(
+                f"'workbook/workers' above 1 in file '{self.__config_filename}' "
+                "needs Python 3.8 or later."
+            )
+
+        return workers
+
+    @staticmethod
+    def filter_rows(
+        excel_parser: "ExcelParser", sheet_plan: SheetPlan
+    ) -> "ExcelParser":
+        """Applies a sheet's <filter> statements, right after it's loaded, so the rules
+        only run on the rows that pass them all.
+
+        Parameters
+        ----------
+        excel_parser : ExcelParser
+        sheet_plan : SheetPlan
+
+        Returns
+        -------
+        excel_parser : ExcelParser  The same object.
+        """
+        for row_filter in sheet_plan.filters:
+            excel_parser.filter_rows(
+                column_name=row_filter.column_name,
+                equals=row_filter.equals,
+                values=row_filter.values,
+                pattern=row_filter.pattern,
+                keep_others=row_filter.keep_others,
+            )
+
+        return excel_parser
+
+    def __finish_write(self, pending_write: tuple) -> None:
+        """Waits for one background write & records how it went.
+
+        Parameters
+        ----------
+        pending_write : tuple   As kept in self.__pending_writes.
+        """
+        (
+            future,
+            excel_parser,
+            sheet_stats,
+            report,
+            journal,
+            fingerprint,
+            start,
+        ) = pending_write
+
+        try:
+            filename_created, diagnostics_filename = future.result()
+        except Exception as e:
+            sheet_stats["output"] = None
+            sheet_stats["error"] = f"{type(e).__name__}: {e}"
+        else:
+            self.__record_write(
+                sheet_stats=sheet_stats,
+                report=report,
+                journal=journal,
+                fingerprint=fingerprint,
+                filename_created=filename_created,
+                diagnostics_filename=diagnostics_filename,
+            )
+        finally:
+            excel_parser.close()
+
+        sheet_stats["seconds"] = time.perf_counter() - start
+        self.__finished_writes.append(sheet_stats)
+
+    def flush(self) -> list:
+        """Waits for the background writes still going & stops the writer processes.
+
+        Returns
+        -------
+        sheets : list of dict   Stats of each sheet written in the background since the last flush(),
+                                    with an 'error' instead of an 'output' if its write failed.
+        """
+        while self.__pending_writes:
+            self.__finish_write(pending_write=self.__pending_writes.pop(0))
+
+        if self.__write_executor is not None:
+            self.__write_executor.shutdown()
+            self.__write_executor = None
+
+        finished_writes = self.__finished_writes
+        self.__finished_writes = []
+        return finished_writes
+
+    @staticmethod
+    def __listify(config: Union[dict, list, str, None]) -> list:
+        """Turns a config entry that may appear once or several times into a list:
+        xmltodict gives a single statement as it is, & several as a list.
+
+        Parameters
+        ----------
+        config : dict, list, str or None
+
+        Returns
+        -------
+        config : list
+        """
+        if config is None:
+            return []
+
+        if isinstance(config, list):
+            return config
+
+        return [config]
+
+    @staticmethod
+    def load_sheet(
+        plan: WorkbookPlan, sheet_plan: SheetPlan, source_file: str
+    ) -> Union["ExcelParser", None]:
+        """Reads one sheet into an ExcelParser object.
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        sheet_plan : SheetPlan
+        source_file : str
+
+        Returns
+        -------
+        excel_parser : ExcelParser or None      None if the sheet isn't in the workbook.
+        """
+        from excelpostprocessor.column_store import ColumnStore
+        from excelpostprocessor.diagnostics import MatchDiagnostics
+        from excelpostprocessor.excel_postprocessor import ExcelParser
+
+        #   Try to instantiate an ExcelParser object for this sheet name,
+        #   but there's no guarantee the sheet exists in the Excel file,
+        #   so we'll trap the error & skip the sheet.
+        try:
+            excel_parser = ExcelParser(
+                excel_filename=source_file,
+                sheet_name=sheet_plan.name,
+                engine=plan.engine,
+                dtype=sheet_plan.dtype,
+                string_storage=plan.string_storage,
+                diagnostics=MatchDiagnostics() if plan.diagnostics else None,
+                column_store=(
+                    ColumnStore(directory=plan.spill_directory) if plan.spill else None
+                ),
+                chunk_rows=plan.chunk_rows,
+            )
+        except ValueError:
+            print(f"Worksheet {sheet_plan.name} not found; skipping.")
+            return None
+
+        return ParserRunner.filter_rows(
+            excel_parser=excel_parser, sheet_plan=sheet_plan
+        )
+
+    @staticmethod
+    def output_filename(source_file: str, sheet_name: str) -> str:
+        """Names the workbook written for one sheet: the source name marked with the sheet name.
+
+        Parameters
+        ----------
+        source_file : str
+        sheet_name : str
+
+        Returns
+        -------
+        output_filename : str
+        """
+        name = os.path.splitext(os.path.basename(source_file))[0]
+        extension = InputEngine(filename=source_file).output_extension()
+        return os.path.join(
+            os.path.dirname(source_file), name + "_" + sheet_name + extension
+        )
+
+    def plan(self, check_source: bool = True) -> WorkbookPlan:
+        """Gets the validated config, compiling it only if this process hasn't already
+        seen this version of the config file (& it's not in the cache directory, if there is one).
+
+        Parameters
+        ----------
+        check_source : bool     Also make sure the workbook named in the config exists.
+                                    Skip this when another workbook will be processed instead.
+
+        Returns
+        -------
+        plan : WorkbookPlan
+        """
+        key = os.path.abspath(self.__config_filename)
+        stat = os.stat(self.__config_filename)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = ParserRunner.__plan_cache.get(key)
+
+        if cached is not None and cached[0] == stamp:
+            plan: WorkbookPlan = cached[1]
+            return plan
+
+        if self.__cache_directory is None:
+            plan = self.__compile(check_source=check_source)
+            ParserRunner.__plan_cache[key] = (stamp, plan)
+            return plan
+
+        plan_cache = PlanCache(directory=self.__cache_directory)
+        content_hash = file_hash(self.__config_filename)
+        cached_plan = plan_cache.load(
+            config_filename=self.__config_filename, content_hash=content_hash
+        )
+
+        if cached_plan is None:
+            plan = self.__compile(check_source=check_source)
+            plan_cache.save(
+                config_filename=self.__config_filename,
+                content_hash=content_hash,
+                plan=plan,
+            )
+        else:
+            plan = cached_plan
+
+            if check_source:
+                self.__check_source(source_filename=plan.source_filename)
+
+        ParserRunner.__plan_cache[key] = (stamp, plan)
+        return plan
+
+    def prepare(self, source_filename: Union[str, None] = None) -> tuple:
+        """Gets the plan & checks the workbook is there & readable with the configured engine.
+
+        Parameters
+        ----------
+        source_filename : Optional str  Workbook to process instead of the one named in the config file.
+
+        Returns
+        -------
+        plan : WorkbookPlan
+        source_filename : str
+        """
+        plan = self.plan(check_source=source_filename is None)
+
+        if source_filename is None:
+            source_filename = plan.source_filename
+
+        source_filename = self.__check_source(source_filename=source_filename)
+
+        try:
+            InputEngine(filename=source_filename, engine=plan.engine)
+        except ValueError as e:
+            raise SyntaxError(
+                f"Unsuitable 'workbook/engine' in file '{self.__config_filename}'."
+            ) from e
+
+        return plan, source_filename
+
+    def process(
+        self,
+        source_filename: Union[str, None] = None,
+        resume: bool = False,
+        checkpoint: bool = False,
+    ) -> bool:
+        """Processes the job, reading the config file, setting up and running an ExcelParser object.
+        With write_workers, the last workbooks may still be being written on return: call flush().
+
+        Parameters
+        ----------
+        source_filename : Optional str  Workbook to process instead of the one named in the config file.
+        resume : bool                   Skip the sheets an earlier run finished, as recorded in its
+                                            checkpoint journal, if their rules, source & output are unchanged.
+                                            Implies checkpoint.
+        checkpoint : bool               Note each sheet finished in the checkpoint journal, for a later resume.
+
+        Returns
+        -------
+        success : bool   Did anything happen?
+        """
+        start = time.perf_counter()
+        plan, source_filename = self.prepare(source_filename=source_filename)
+
+        self.__report = {
+            "config": self.__config_filename,
+            "source": source_filename,
+            "outputs": [],
+            "sheets": [],
+        }
+        self.__journal = (
+            CheckpointJournal(
+                filename=journal_filename(source_file=source_filename), resume=resume
+            )
+            if resume or checkpoint
+            else None
+        )
+
+        if plan.workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=plan.workers
+            ) as executor:
+                success: bool = self.__process_sheets(
+                    plan=plan, source_file=source_filename, executor=executor
+                )
+        else:
+            success = self.__process_sheets(plan=plan, source_file=source_filename)
+
+        self.__report["seconds"] = time.perf_counter() - start
+        return success
+
+    def process_data(
+        self,
+        data: Union["pandas.DataFrame", dict, bytes, BinaryIO],
+        filename: Union[str, None] = None,
+        as_bytes: bool = False,
+    ) -> dict:
+        """Processes a workbook that's already in memory, returning the results in memory too,
+        so nothing is read from or written to disk. Diagnostics & spilling aren't used.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame, dict, bytes or binary file-like object
+                                    A DataFrame to use as every sheet in the config,
+                                    a dict of sheet name -> DataFrame, or a workbook's contents.
+        filename : Optional str     For a workbook's contents: gives its format by the extension.
+                                        Defaults to the workbook named in the config file.
+        as_bytes : bool             Return each sheet's results as an .xlsx workbook's contents
+                                        instead of a DataFrame.
+
+        Returns
+        -------
+        results : dict  Sheet name -> pandas.DataFrame, or bytes. Sheets not in the data are left out.
+        """
+        import pandas
+
+        from excelpostprocessor.excel_postprocessor import ExcelParser
+
+        start = time.perf_counter()
+        plan = self.plan(check_source=False)
+
+        if filename is None:
+            filename = plan.source_filename or "workbook.xlsx"
+
+        if hasattr(data, "read"):
+            #   Read a stream once, as each sheet needs it from the start.
+            data = data.read()
+
+        if not isinstance(data, (pandas.DataFrame, dict, bytes)):
+            raise TypeError(
+                "Argument 'data' is not the expected DataFrame, dict, bytes or binary file-like object."
+            )
+
+        self.__report = {
+            "config": self.__config_filename,
+            "source": None,
+            "outputs": [],
+            "sheets": [],
+        }
+        results = {}
+
+        for sheet_plan in plan.sheets:
+            sheet_start = time.perf_counter()
+
+            if isinstance(data, bytes):
+                try:
+                    excel_parser = ExcelParser.from_bytes(
+                        data=data,
+                        filename=filename,
+                        sheet_name=sheet_plan.name,
+                        engine=plan.engine,
+                        dtype=sheet_plan.dtype,
+                        string_storage=plan.string_storage,
+                        chunk_rows=plan.chunk_rows,
+                    )
+                except ValueError:
+                    excel_parser = None
+            else:
+                df = data.get(sheet_plan.name) if isinstance(data, dict) else data
+                excel_parser = (
+                    None
+                    if df is None
+                    else ExcelParser.from_dataframe(
+                        df=df,
+                        sheet_name=sheet_plan.name,
+                        string_storage=plan.string_storage,
+                        chunk_rows=plan.chunk_rows,
+                    )
+                )
+
+            if excel_parser is None:
+                print(f"Worksheet {sheet_plan.name} not found; skipping.")
+                self.__report["sheets"].append(
+                    {"sheet": sheet_plan.name, "output": None, "skipped": True}
+                )
+                continue
+
+            excel_parser = self.apply_rules(
+                excel_parser=self.filter_rows(
+                    excel_parser=excel_parser, sheet_plan=sheet_plan
+                ),
+                sheet_plan=sheet_plan,
+            )
+            results[sheet_plan.name] = (
+                excel_parser.to_bytes() if as_bytes else excel_parser.data()
+            )
+            self.__report["sheets"].append(
+                {
+                    "sheet": sheet_plan.name,
+                    "output": None,
+                    "rows": len(excel_parser.data()),
+                    "seconds": time.perf_counter() - sheet_start,
+                }
+            )
+
+        self.__report["seconds"] = time.perf_counter() - start
+        return results
+
+    def __process_sheet(
+        self,
+        plan: WorkbookPlan,
+        sheet_plan: SheetPlan,
+        source_file: str,
+        executor: Union[concurrent.futures.Executor, None] = None,
+        load_plan: Union[WorkbookPlan, None] = None,
+        memory_decision: Union[dict, None] = None,
+    ) -> Union[str, None]:
+        """Builds the ExcelParser object aimed at one sheet, runs its rules & writes out the results
+        (or hands them to the background writers).
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        sheet_plan : SheetPlan
+        source_file : str
+        executor : Optional concurrent.futures.Executor     Worker processes sharing the rows.
+        load_plan : Optional WorkbookPlan   The plan to read & process the sheet with, if not plan
+                                                (as set up for the memory budget).
+        memory_decision : Optional dict     From MemoryPlanner.plan_sheet(), for the report.
+
+        Returns
+        -------
+        output_filename : str or None      None if the sheet isn't in the workbook.
+        """
+        start = time.perf_counter()
+
+        #   Chunking & spilling change how, not what, so the sheet's fingerprint uses the plan as configured.
+        excel_parser = self.load_sheet(
+            plan=plan if load_plan is None else load_plan,
+            sheet_plan=sheet_plan,
+            source_file=source_file,
+        )
+
+        if excel_parser is None:
+            return None
+
+        try:
+            excel_parser = self.apply_rules(
+                excel_parser=excel_parser,
+                sheet_plan=sheet_plan,
+                executor=executor,
+                workers=plan.workers,
+            )
+        except Exception:
+            excel_parser.close()
+            raise
+
+        output_filename = self.output_filename(
+            source_file=source_file, sheet_name=sheet_plan.name
+        )
+        sheet_stats = {
+            "sheet": sheet_plan.name,
+            "output": output_filename,
+            "rows": len(excel_parser.data()),
+        }
+
+        if memory_decision is not None:
+            sheet_stats["memory"] = memory_decision
+
+        self.__report["sheets"].append(sheet_stats)
+
+        fingerprint = CheckpointJournal.fingerprint(
+            plan=plan, sheet_plan=sheet_plan, source_file=source_file
+        )
+
+        if self.__write_workers > 0:
+            self.__submit_write(
+                excel_parser=excel_parser,
+                sheet_stats=sheet_stats,
+                fingerprint=fingerprint,
+                start=start,
+            )
+            return output_filename
+
+        try:
+            filename_created, diagnostics_filename = self.write_sheet(
+                excel_parser=excel_parser, output_filename=output_filename
+            )
+        finally:
+            excel_parser.close()
+
+        self.__record_write(
+            sheet_stats=sheet_stats,
+            report=self.__report,
+            journal=self.__journal,
+            fingerprint=fingerprint,
+            filename_created=filename_created,
+            diagnostics_filename=diagnostics_filename,
+        )
+        sheet_stats["seconds"] = time.perf_counter() - start
+        return filename_created
+
+    def __process_sheets(
+        self,
+        plan: WorkbookPlan,
+        source_file: str,
+        executor: Union[concurrent.futures.Executor, None] = None,
+    ) -> bool:
+        """For each sheet, build the ExcelParser object aimed at that sheet & process all its columns.
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        source_file : Excel workbook being processed
+        executor : Optional concurrent.futures.Executor     Worker processes sharing the rows.
+
+        Returns
+        -------
+        success : bool  Did it work?
+        """
+        success_per_sheet = []
+
+        for sheet_plan in plan.sheets:
+            if self.__resume_sheet(
+                plan=plan, sheet_plan=sheet_plan, source_file=source_file
+            ):
+                success_per_sheet.append(True)
+                continue
+
+            load_plan = None
+            memory_decision = None
+
+            if self.__memory_planner is not None:
+                load_plan, memory_decision = self.__memory_planner.plan_sheet(
+                    plan=plan, sheet_plan=sheet_plan, source_file=source_file
+                )
+                print(
+                    f"Worksheet {sheet_plan.name}: "
+                    f"{memory_decision['mode'].replace('_', ' ')}. {memory_decision['reason']}"
+                )
+
+            if memory_decision is not None and memory_decision["fits"] is False:
+                #   Better to skip the sheet than to run the machine out of memory.
+                print(
+                    f"Worksheet {sheet_plan.name} is over the memory budget; skipping."
+                )
+                filename_created = None
+            else:
+                filename_created = self.__process_sheet(
+                    plan=plan,
+                    sheet_plan=sheet_plan,
+                    source_file=source_file,
+                    executor=executor,
+                    load_plan=load_plan,
+                    memory_decision=memory_decision,
+                )
+
+            if filename_created is None:
+                sheet_stats = {
+                    "sheet": sheet_plan.name,
+                    "output": None,
+                    "skipped": True,
+                }
+
+                if memory_decision is not None:
+                    sheet_stats["memory"] = memory_decision
+
+                self.__report["sheets"].append(sheet_stats)
+                success_per_sheet.append(False)
+                continue
+
+            success_per_sheet.append(True)
+
+        return all(success_per_sheet)
+
+    def profile(
+        self,
+        source_filename: Union[str, None] = None,
+        slowest_rows: int = DEFAULT_SLOWEST_ROWS,
+    ) -> dict:
+        """Times each pattern on each row of each sheet, without writing anything, to find
+        the slow patterns, the rows they're slow on & the constructs in them that backtrack.
+        See RuleProfiler.
+
+        Parameters
+        ----------
+        source_filename : Optional str  Workbook to profile instead of the one named in the config file.
+        slowest_rows : int              Rows listed for each pattern & sheet.
+
+        Returns
+        -------
+        profile : dict  'version', 'config', 'source', 'seconds', 'sheets' (see RuleProfiler.profile_sheet)
+                            & 'slowest_patterns' (every sheet's patterns, slowest first, with their 'sheet').
+                            Plain lists, dicts, strings & numbers, ready to save as JSON.
+        """
+        plan, source_filename = self.prepare(source_filename=source_filename)
+        profiler = RuleProfiler(slowest_rows=slowest_rows)
+        sheets = []
+
+        for sheet_plan in plan.sheets:
+            excel_parser = self.load_sheet(
+                plan=plan, sheet_plan=sheet_plan, source_file=source_filename
+            )
+
+            if excel_parser is None:
+                sheets.append({"sheet": sheet_plan.name, "skipped": True})
+                continue
+
+            try:
+                sheets.append(
+                    profiler.profile_sheet(
+                        source=excel_parser.data()[sheet_plan.column_name],
+                        sheet_plan=sheet_plan,
+                    )
+                )
+            finally:
+                excel_parser.close()
+
+        profiled = [sheet for sheet in sheets if not sheet.get("skipped")]
+        return {
+            "version": PROFILE_VERSION,
+            "config": self.__config_filename,
+            "source": source_filename,
+            "seconds": sum(sheet["seconds"] for sheet in profiled),
+            "sheets": sheets,
+            "slowest_patterns": sorted(
+                (
+                    dict(pattern, sheet=sheet["sheet"])
+                    for sheet in profiled
+                    for pattern in sheet["patterns"]
+                ),
+                key=lambda pattern: pattern["seconds"],
+                reverse=True,
+            ),
+        }
+
+    def __submit_write(
+        self,
+        excel_parser: "ExcelParser",
+        sheet_stats: dict,
+        fingerprint: str,
+        start: float,
+    ) -> None:
+        """Hands a finished sheet to the background writers, first waiting for the oldest write
+        if too many are already waiting.
+
+        Parameters
+        ----------
+        excel_parser : ExcelParser  Closed once it's written.
+        sheet_stats : dict
+        fingerprint : str           For the checkpoint journal.
+        start : float               When work on the sheet began.
+        """
+        while len(self.__pending_writes) >= self.__max_pending_writes:
+            self.__finish_write(pending_write=self.__pending_writes.pop(0))
+
+        if self.__write_executor is None:
+            self.__write_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.__write_workers
+            )
+
+        future = self.__write_executor.submit(
+            ParserRunner.write_sheet, excel_parser, sheet_stats["output"]
+        )
+        self.__pending_writes.append(
+            (
+                future,
+                excel_parser,
+                sheet_stats,
+                self.__report,
+                self.__journal,
+                fingerprint,
+                start,
+            )
+        )
+
+    @staticmethod
+    def write_diagnostics(
+        excel_parser: "ExcelParser", output_filename: str
+    ) -> Union[str, None]:
+        """Writes the match diagnostics side report next to a sheet's output, if they were collected.
+
+        Parameters
+        ----------
+        excel_parser : ExcelParser
+        output_filename : str   The sheet's output workbook.
+
+        Returns
+        -------
+        diagnostics_filename : str or None
+        """
+        from excelpostprocessor.diagnostics import DIAGNOSTICS_SUFFIX
+
+        diagnostics = excel_parser.diagnostics()
+
+        if diagnostics is None:
+            return None
+
+        return diagnostics.write(
+            filename=os.path.splitext(output_filename)[0] + DIAGNOSTICS_SUFFIX + ".xlsx"
+        )
+
+    @staticmethod
+    def write_sheet(
+        excel_parser: "ExcelParser", output_filename: str
+    ) -> Tuple[str, Union[str, None]]:
+        """Writes a sheet's results & diagnostics. Kept free of any runner state so it can be
+        shipped to a writer process.
+
+        Parameters
+        ----------
+        excel_parser : ExcelParser
+        output_filename : str
+
+        Returns
+        -------
+        filename_created : str
+        diagnostics_filename : str or None
+        """
+        filename_created = excel_parser.write_to_excel(new_file_name=output_filename)
+        diagnostics_filename = ParserRunner.write_diagnostics(
+            excel_parser=excel_parser, output_filename=filename_created
+        )
+        return filename_created, diagnostics_filename
+
+    def __read_config(self) -> dict:
+        """Reads/parses the configuration .xml file.
+
+        Returns
+        -------
+        config : dict       Describes how the workbook is to be parsed.
+        """
+        try:
+            config = parse_config(filename=self.__config_filename)
+        except Exception as e:
+            raise SyntaxError(
+                f"Unable to read/parse file '{self.__config_filename}'."
+            ) from e
+
+        if "workbook" not in config:
+            raise SyntaxError(
+                f"Unable to find 'workbook' in file '{self.__config_filename}'."
+            )
+
+        workbook_config: dict = config["workbook"]
+        return workbook_config
+
+    @staticmethod
+    def __record_write(
+        sheet_stats: dict,
+        report: dict,
+        journal: Union[CheckpointJournal, None],
+        fingerprint: str,
+        filename_created: str,
+        diagnostics_filename: Union[str, None],
+    ) -> None:
+        """Notes a sheet's output workbook (& diagnostics) in its stats, the run's report
+        & the checkpoint journal.
+
+        Parameters
+        ----------
+        sheet_stats : dict
+        report : dict                   Report of the run the sheet belongs to.
+        journal : CheckpointJournal or None     Journal of the run the sheet belongs to.
+        fingerprint : str
+        filename_created : str
+        diagnostics_filename : str or None
+        """
+        sheet_stats["output"] = filename_created
+
+        if diagnostics_filename is not None:
+            sheet_stats["diagnostics"] = diagnostics_filename
+
+        if journal is not None:
+            journal.record(
+                sheet_name=sheet_stats["sheet"],
+                fingerprint=fingerprint,
+                output=filename_created,
+                rows=sheet_stats["rows"],
+                diagnostics=diagnostics_filename,
+            )
+        print(f"Created file '{filename_created}'.")
+        report["outputs"].append(filename_created)
+
+    def report(self) -> dict:
+        """Describes the last run: the files created & per-sheet row counts and timings
+        (& with a memory budget, how each sheet was processed & why).
+
+        Returns
+        -------
+        report : dict
+        """
+        return dict(self.__report)
+
+    def __resume_sheet(
+        self, plan: WorkbookPlan, sheet_plan: SheetPlan, source_file: str
+    ) -> bool:
+        """Keeps a sheet's output from an earlier run, if the checkpoint journal vouches for it.
+
+        Parameters
+        ----------
+        plan : WorkbookPlan
+        sheet_plan : SheetPlan
+        source_file : str
+
+        Returns
+        -------
+        resumed : bool  False if the sheet has to be processed.
+        """
+        if self.__journal is None:
+            return False
+
+        entry = self.__journal.completed(
+            sheet_name=sheet_plan.name,
+            fingerprint=CheckpointJournal.fingerprint(
+                plan=plan, sheet_plan=sheet_plan, source_file=source_file
+            ),
+        )
+
+        if entry is None:
+            return False
+
+        sheet_stats = {
+            "sheet": sheet_plan.name,
+            "output": entry["output"],
+            "rows": entry.get("rows"),
+            "resumed": True,
+        }
+
+        if entry.get("diagnostics") is not None:
+            sheet_stats["diagnostics"] = entry["diagnostics"]
+
+        print(f"Kept file '{entry['output']}' from an earlier run.")
+        self.__report["sheets"].append(sheet_stats)
+        self.__report["outputs"].append(entry["output"])
+        return True
+
+    @staticmethod
+    def __rows_in_place(excel_parser: "ExcelParser") -> bool:
+        """Checks that a sheet's rows are all there, in order, as blocks of them
+        are handed to worker processes by position.
+
+        Parameters
+        ----------
+        excel_parser : ExcelParser
+
+        Returns
+        -------
+        in_place : bool
+        """
+        import pandas
+
+        index = excel_parser.data().index
+        return bool(index.equals(pandas.RangeIndex(len(index))))
@@ -0,0 +1,342 @@
+"""
+Module: contains class PipelineRunner, which overlaps the reading, rule-running & writing
+of many workbooks.
+"""
+import asyncio
+import concurrent.futures
+import os
+import time
+from typing import Union
+
+from excelpostprocessor.parser_runner import ParserRunner
+
+#   Tells a stage there's no more work coming.
+_DONE = None
+
+
+class PipelineRunner:
+    """
+    Runs (config, workbook) jobs through three stages connected by bounded queues:
+    reading (threads, mostly zip inflate & disk), rules (processes, regex work that holds the GIL)
+    & writing (threads, mostly disk). While one sheet's rules run, the next is being read
+    & the previous one written.
+    """
+
+    def __init__(
+        self,
+        read_workers: int = 2,
+        compute_workers: Union[int, None] = None,
+        write_workers: int = 2,
+        queue_size: int = 2,
+        use_processes: bool = True,
+    ) -> None:
+        """Sets up the stages; call run() to process jobs.
+
+        Parameters
+        ----------
+        read_workers : int              Sheets read at once.
+        compute_workers : Optional int  Sheets having their rules run at once. Defaults to the CPU count.
+        write_workers : int             Sheets written at once.
+        queue_size : int                Sheets allowed to wait between stages, which bounds memory use:
+                                            a slow stage holds back the ones feeding it.
+        use_processes : bool            Run the rules in worker processes instead of threads.
+        """
+        if compute_workers is None:
+            compute_workers = os.cpu_count() or 1
+
+        for name, value in (
+            ("read_workers", read_workers),
+            ("compute_workers", compute_workers),
+            ("write_workers", write_workers),
+            ("queue_size", queue_size),
+        ):
+            if not isinstance(value, int) or value < 1:
+                raise TypeError(f"Argument '{name}' is not the expected positive int.")
+
+        self.__read_workers = read_workers
+        self.__compute_workers = compute_workers
+        self.__write_workers = write_workers
+        self.__queue_size = queue_size
+        self.__use_processes = use_processes
+
+    async def __compute_stage(
+        self,
+        compute_queue: asyncio.Queue,
+        write_queue: asyncio.Queue,
+        executor: concurrent.futures.Executor,
+        results: list,
+    ) -> None:
+        """Runs each sheet's rules, passing it on to be written.
+
+        Parameters
+        ----------
+        compute_queue : asyncio.Queue   Sheets read.
+        write_queue : asyncio.Queue     Sheets ready to write.
+        executor : concurrent.futures.Executor
+        results : list of dict
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await compute_queue.get()
+
+            if item is _DONE:
+                return
+
+            index, sheet_plan, source_file, excel_parser, sheet_stats = item
+
+            try:
+                start = time.perf_counter()
+                excel_parser = await loop.run_in_executor(
+                    executor, ParserRunner.apply_rules, excel_parser, sheet_plan
+                )
+                sheet_stats["compute_seconds"] = time.perf_counter() - start
+            except Exception as e:
+                #   Never reaches the writer, so remove its spill files here.
+                excel_parser.close()
+                self.__fail(results[index], e)
+                continue
+
+            await write_queue.put(
+                (index, sheet_plan, source_file, excel_parser, sheet_stats)
+            )
+
+    @staticmethod
+    def __fail(result: dict, e: Exception) -> None:
+        """Records a job's error, keeping the first one.
+
+        Parameters
+        ----------
+        result : dict
+        e : Exception
+        """
+        result["success"] = False
+        result["finish"] = time.perf_counter()
+
+        if "error" not in result:
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    async def __read_stage(
+        self,
+        job_queue: asyncio.Queue,
+        compute_queue: asyncio.Queue,
+        executor: concurrent.futures.Executor,
+        results: list,
+    ) -> None:
+        """Compiles each job's config & reads its sheets, passing them on to have their rules run.
+
+        Parameters
+        ----------
+        job_queue : asyncio.Queue       (index, config filename, workbook filename) tuples.
+        compute_queue : asyncio.Queue   Sheets read.
+        executor : concurrent.futures.Executor
+        results : list of dict
+        """
+        loop = asyncio.get_running_loop()
+
+        while not job_queue.empty():
+            index, config_filename, source_filename = job_queue.get_nowait()
+            result = results[index]
+            result["start"] = time.perf_counter()
+
+            try:
+                runner = ParserRunner(config_filename=config_filename)
+                plan, source_file = await loop.run_in_executor(
+                    executor, runner.prepare, source_filename
+                )
+                result["source"] = source_file
+            except Exception as e:
+                self.__fail(result, e)
+                continue
+
+            for sheet_plan in plan.sheets:
+                try:
+                    start = time.perf_counter()
+                    excel_parser = await loop.run_in_executor(
+                        executor,
+                        ParserRunner.load_sheet,
+                        plan,
+                        sheet_plan,
+                        source_file,
+                    )
+                except Exception as e:
+                    self.__fail(result, e)
+                    continue
+
+                if excel_parser is None:
+                    result["sheets"].append(
+                        {"sheet": sheet_plan.name, "output": None, "skipped": True}
+                    )
+                    result["success"] = False
+                    continue
+
+                sheet_stats = {
+                    "sheet": sheet_plan.name,
+                    "rows": len(excel_parser.data()),
+                    "read_seconds": time.perf_counter() - start,
+                }
+
+                #   Waits here when the rules can't keep up.
+                await compute_queue.put(
+                    (index, sheet_plan, source_file, excel_parser, sheet_stats)
+                )
+
+    def run(self, jobs: list) -> list:
+        """Processes the jobs, overlapping their stages.
+
+        Parameters
+        ----------
+        jobs : list of (str, str or None)   (config filename, workbook filename) pairs. A workbook of None
+                                                means the one named in the config file.
+
+        Returns
+        -------
+        results : list of dict  One per job, in the same order, with 'success', 'outputs',
+                                    per-sheet 'sheets' stats, 'seconds' & any 'error'.
+        """
+        if not isinstance(jobs, list):
+            raise TypeError("Argument 'jobs' is not the expected list.")
+
+        return asyncio.run(self.run_async(jobs=jobs))
+
+    async def run_async(self, jobs: list) -> list:
+        """Same as run(), for callers already inside an event loop.
+
+        Parameters
+        ----------
+        jobs : list of (str, str or None)
+
+        Returns
+        -------
+        results : list of dict
+        """
+        results = [
+            {
+                "config": config_filename,
+                "source": source_filename,
+                "success": True,
+                "outputs": [],
+                "sheets": [],
+            }
+            for config_filename, source_filename in jobs
+        ]
+        job_queue: asyncio.Queue = asyncio.Queue()
+
+        for index, (config_filename, source_filename) in enumerate(jobs):
+            job_queue.put_nowait((index, config_filename, source_filename))
+
+        compute_queue: asyncio.Queue = asyncio.Queue(maxsize=self.__queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.__queue_size)
+        compute_executor: concurrent.futures.Executor
+
+        if self.__use_processes:
+            compute_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.__compute_workers
+            )
+        else:
+            compute_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.__compute_workers
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.__read_workers
+        ) as read_executor, compute_executor, concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.__write_workers
+        ) as write_executor:
+            readers = [
+                asyncio.create_task(
+                    self.__read_stage(job_queue, compute_queue, read_executor, results)
+                )
+                for _ in range(self.__read_workers)
+            ]
+            computers = [
+                asyncio.create_task(
+                    self.__compute_stage(
+                        compute_queue, write_queue, compute_executor, results
+                    )
+                )
+                for _ in range(self.__compute_workers)
+            ]
+            writers = [
+                asyncio.create_task(
+                    self.__write_stage(write_queue, write_executor, results)
+                )
+                for _ in range(self.__write_workers)
+            ]
+
+            #   Shut the stages down in order, once the one feeding each has finished.
+            await asyncio.gather(*readers)
+
+            for _ in computers:
+                await compute_queue.put(_DONE)
+
+            await asyncio.gather(*computers)
+
+            for _ in writers:
+                await write_queue.put(_DONE)
+
+            await asyncio.gather(*writers)
+
+        for result in results:
+            start = result.pop("start", None)
+            finish = result.pop("finish", start)
+            result["seconds"] = finish - start if start is not None else 0.0
+
+        return results
+
+    async def __write_stage(
+        self,
+        write_queue: asyncio.Queue,
+        executor: concurrent.futures.Executor,
+        results: list,
+    ) -> None:
+        """Writes each sheet's results to its own workbook.
+
+        Parameters
+        ----------
+        write_queue : asyncio.Queue     Sheets ready to write.
+        executor : concurrent.futures.Executor
+        results : list of dict
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await write_queue.get()
+
+            if item is _DONE:
+                return
+
+            index, sheet_plan, source_file, excel_parser, sheet_stats = item
+            result = results[index]
+
+            try:
+                start = time.perf_counter()
+                filename_created = await loop.run_in_executor(
+                    executor,
+                    excel_parser.write_to_excel,
+                    ParserRunner.output_filename(
+                        source_file=source_file, sheet_name=sheet_plan.name
+                    ),
+                )
+                diagnostics_filename = await loop.run_in_executor(
+                    executor,
+                    ParserRunner.write_diagnostics,
+                    excel_parser,
+                    filename_created,
+                )
+                sheet_stats["write_seconds"] = time.perf_counter() - start
+            except Exception as e:
+                self.__fail(result, e)
+                continue
+            finally:
+                excel_parser.close()
+
+            print(f"Created file '{filename_created}'.")
+            sheet_stats["output"] = filename_created
+
+            if diagnostics_filename is not None:
+                sheet_stats["diagnostics"] = diagnostics_filename
+
+            result["sheets"].append(sheet_stats)
+            result["outputs"].append(filename_created)
+            result["finish"] = time.perf_counter()
@@ -0,0 +1,76 @@
+"""
+Module: contains the WorkbookPlan, SheetPlan, RowFilter, CleaningRule & ExtractRule classes,
+which hold a validated config file ready to be run.
+"""
+from typing import NamedTuple, Union
+
+
+class CleaningRule(NamedTuple):
+    """
+    One <cleaning> statement: a regex & its replacement.
+    """
+
+    pattern: str
+    replace: str
+
+
+class ExtractRule(NamedTuple):
+    """
+    One <extract> statement: one or more regex patterns feeding one new column,
+    or one new column per group.
+    """
+
+    pattern: Union[str, list]
+    new_column: Union[str, list, dict]
+
+    #   'first' match only, or 'all' of them (into max_matches numbered columns, or a side sheet).
+    mode: str = "first"
+    max_matches: Union[int, None] = None
+
+
+class RowFilter(NamedTuple):
+    """
+    One <filter> statement: which rows of a sheet the rules run on.
+    Exactly one of equals, values & pattern is set.
+    """
+
+    column_name: str
+    equals: Union[str, None] = None
+    values: Union[tuple, None] = None
+    pattern: Union[str, None] = None
+
+    #   Pass the other rows through to the output, untouched, instead of dropping them.
+    keep_others: bool = False
+
+
+class SheetPlan(NamedTuple):
+    """
+    Everything to be done to one worksheet.
+    """
+
+    name: str
+    column_name: str
+    dtype: Union[dict, None]
+    cleaning: tuple
+    extracts: tuple
+
+    #   RowFilter statements, all of which a row must pass.
+    filters: tuple = ()
+
+
+class WorkbookPlan(NamedTuple):
+    """
+    A whole config file, validated & ready to run.
+    """
+
+    source_filename: Union[str, None]
+    engine: Union[str, None]
+    string_storage: Union[str, None]
+    diagnostics: bool
+    spill: bool
+    spill_directory: Union[str, None]
+    chunk_rows: Union[int, None]
+    sheets: tuple
+
+    #   Worker processes sharing each sheet's rows.
+    workers: int = 1
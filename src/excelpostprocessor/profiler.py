@@ -0,0 +1,449 @@
+"""
+Module: contains class RuleProfiler, which times each of a sheet's patterns row by row to find
+the slow patterns & the rows they're slow on, and pattern_hotspots, which points out the
+constructs in a pattern that make the regex engine backtrack.
+"""
+import importlib
+import re
+import time
+from typing import TYPE_CHECKING, Any, Callable, Union
+
+try:
+    sre_constants = importlib.import_module("re._constants")
+    sre_parse = importlib.import_module("re._parser")
+except ImportError:  # pragma: no cover
+    #   Before Python 3.11.
+    sre_constants = importlib.import_module("sre_constants")
+    sre_parse = importlib.import_module("sre_parse")
+
+from excelpostprocessor.plan import CleaningRule, ExtractRule, SheetPlan
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas
+
+DEFAULT_SLOWEST_ROWS = 10
+
+#   Bumped whenever the report's layout changes, for tools comparing reports from run to run.
+PROFILE_VERSION = 1
+
+#   Upper bounds, in seconds, of the per-row latency histogram's buckets.
+#   Rows slower than the last go in a final bucket with no upper bound.
+LATENCY_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1)
+
+REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+#   Possessive quantifiers & atomic groups arrived in Python 3.11; before that, no item has these opcodes.
+POSSESSIVE_REPEAT = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+
+def _children(op: Any, av: Any) -> list:
+    """The subpatterns directly inside one parsed item.
+
+    Parameters
+    ----------
+    op : sre opcode
+    av : its arguments
+
+    Returns
+    -------
+    children : list of SubPattern
+    """
+    if op in REPEATS or (POSSESSIVE_REPEAT is not None and op == POSSESSIVE_REPEAT):
+        return [av[2]]
+
+    if op == sre_constants.SUBPATTERN:
+        return [av[3]]
+
+    if op == sre_constants.BRANCH:
+        return list(av[1])
+
+    if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return [av[1]]
+
+    if ATOMIC_GROUP is not None and op == ATOMIC_GROUP:
+        return [av]
+
+    if op == sre_constants.GROUPREF_EXISTS:
+        return [child for child in av[1:] if child is not None]
+
+    return []
+
+
+def _contains(subpattern: Any, test: Callable[[Any, Any], bool]) -> bool:
+    """Looks for an item meeting a test anywhere inside a parsed pattern.
+
+    Parameters
+    ----------
+    subpattern : SubPattern
+    test : callable     Called with (op, av).
+
+    Returns
+    -------
+    found : bool
+    """
+    for op, av in subpattern:
+        if test(op, av):
+            return True
+
+        if any(_contains(child, test) for child in _children(op, av)):
+            return True
+
+    return False
+
+
+def _repeats_many(op: Any, av: Any) -> bool:
+    """Is this item a backtracking quantifier that can repeat more than once?"""
+    return op in REPEATS and av[1] > 1
+
+
+def _varies(op: Any, av: Any) -> bool:
+    """Is this item a backtracking quantifier that can match text of different lengths?"""
+    return _repeats_many(op, av) and av[0] != av[1] and av[2].getwidth()[1] > 0
+
+
+def _unbounded_any(op: Any, av: Any) -> bool:
+    """Is this item '.*' or '.+'?"""
+    return (
+        op in REPEATS
+        and av[1] == sre_constants.MAXREPEAT
+        and list(av[2]) == [(sre_constants.ANY, None)]
+    )
+
+
+def _find_hotspots(subpattern: Any, hotspots: set) -> None:
+    """Walks a parsed pattern, noting the constructs that make the regex engine backtrack.
+
+    Parameters
+    ----------
+    subpattern : SubPattern
+    hotspots : set of str   Added to.
+    """
+    previous = None
+
+    for op, av in subpattern:
+        if _repeats_many(op, av):
+            if _contains(av[2], _varies):
+                hotspots.add("nested_quantifier")
+
+            if _contains(av[2], lambda op, av: op == sre_constants.BRANCH):
+                hotspots.add("quantified_alternation")
+
+        if _varies(op, av):
+            if previous is not None and (
+                list(previous[1][2]) == list(av[2])
+                or _unbounded_any(*previous)
+                or _unbounded_any(op, av)
+            ):
+                #   Like '\d+\d*' or '.*\s+': the text can be split between them in many ways.
+                hotspots.add("adjacent_quantifiers")
+
+            previous = (op, av)
+        elif not (op in REPEATS and av[0] == 0):
+            #   Anything but an optional item, like '\s?', keeps the quantifiers apart.
+            previous = None
+
+        for child in _children(op, av):
+            _find_hotspots(subpattern=child, hotspots=hotspots)
+
+
+def pattern_hotspots(pattern: str) -> list:
+    """Finds the constructs in a pattern that tend to make the regex engine backtrack
+    & so run slowly on long text, from the pattern alone:
+
+        nested_quantifier       A quantifier around one that matches varying lengths, like (\\w+\\s?)+
+        quantified_alternation  A quantifier around alternatives, like (a|ab)+
+        adjacent_quantifiers    Quantifiers in a row that can share text, like \\d+\\d* or .*\\s+
+        leading_dot_star        Starting with .* or .+, so every search rescans the rest of the text
+
+    Parameters
+    ----------
+    pattern : str
+
+    Returns
+    -------
+    hotspots : list of str  In the order above.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+
+    hotspots: set = set()
+    _find_hotspots(subpattern=parsed, hotspots=hotspots)
+    first = list(parsed)[:1]
+
+    #   Look into a leading group too, as in '(.*)x'.
+    while first and first[0][0] == sre_constants.SUBPATTERN:
+        first = list(first[0][1][3])[:1]
+
+    if first and _unbounded_any(*first[0]):
+        hotspots.add("leading_dot_star")
+
+    return [
+        hotspot
+        for hotspot in (
+            "nested_quantifier",
+            "quantified_alternation",
+            "adjacent_quantifiers",
+            "leading_dot_star",
+        )
+        if hotspot in hotspots
+    ]
+
+
+class RuleProfiler:
+    """
+    Runs a sheet's cleaning & extract patterns on its source column one row at a time
+    with Python's re, timing each pattern on each row. Far slower than processing the sheet,
+    which runs each pattern over the whole column at once, but it shows where the time goes.
+    """
+
+    def __init__(self, slowest_rows: int = DEFAULT_SLOWEST_ROWS) -> None:
+        """Sets up the profiler.
+
+        Parameters
+        ----------
+        slowest_rows : int  Rows listed for each pattern & for the sheet.
+        """
+        if not isinstance(slowest_rows, int) or slowest_rows < 1:
+            raise TypeError("Argument 'slowest_rows' is not the expected positive int.")
+
+        self.__slowest_rows = slowest_rows
+
+    @staticmethod
+    def __histogram(latencies: list) -> list:
+        """Counts the rows in each latency bucket.
+
+        Parameters
+        ----------
+        latencies : list of float   Seconds.
+
+        Returns
+        -------
+        histogram : list of dict    'max_seconds' (None for the last bucket) & 'rows'.
+        """
+        counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+        for latency in latencies:
+            bucket = 0
+
+            while bucket < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[bucket]:
+                bucket += 1
+
+            counts[bucket] += 1
+
+        return [
+            {"max_seconds": max_seconds, "rows": rows}
+            for max_seconds, rows in zip(LATENCY_BUCKETS + (None,), counts)
+        ]
+
+    def __profile_cleaning(
+        self, cleaning_rule: CleaningRule, texts: list, rows: list
+    ) -> dict:
+        """Times one cleaning pattern on each row, revising the text as the sheet would.
+
+        Parameters
+        ----------
+        cleaning_rule : CleaningRule
+        texts : list of str or None     Each row's text; revised in place.
+        rows : list                     Spreadsheet row number of each text.
+
+        Returns
+        -------
+        profile : dict  As from __summarize.
+        """
+        compiled = re.compile(cleaning_rule.pattern)
+        latencies = []
+        changed = 0
+
+        for position, text in enumerate(texts):
+            if text is None:
+                latencies.append(0.0)
+                continue
+
+            start = time.perf_counter()
+            revised = compiled.sub(cleaning_rule.replace, text)
+            latencies.append(time.perf_counter() - start)
+
+            if revised != text:
+                changed += 1
+                texts[position] = revised
+
+        return self.__summarize(
+            rule="cleaning",
+            new_column=None,
+            pattern=cleaning_rule.pattern,
+            alternative=None,
+            latencies=latencies,
+            matches=changed,
+            rows=rows,
+        )
+
+    def __profile_extract(
+        self, extract_rule: ExtractRule, texts: list, rows: list
+    ) -> list:
+        """Times each of an extract rule's patterns on each row.
+
+        Parameters
+        ----------
+        extract_rule : ExtractRule
+        texts : list of str or None     Each row's (cleaned) text.
+        rows : list                     Spreadsheet row number of each text.
+
+        Returns
+        -------
+        profiles : list of dict     One per pattern, as from __summarize.
+        """
+        alternatives = (
+            extract_rule.pattern
+            if isinstance(extract_rule.pattern, list)
+            else [extract_rule.pattern]
+        )
+        profiles = []
+
+        for number, pattern in enumerate(alternatives):
+            compiled = re.compile(pattern)
+            latencies = []
+            matches = 0
+
+            for text in texts:
+                if text is None:
+                    latencies.append(0.0)
+                    continue
+
+                start = time.perf_counter()
+
+                if extract_rule.mode == "all":
+                    found = sum(1 for _ in compiled.finditer(text)) > 0
+                else:
+                    found = compiled.search(text) is not None
+
+                latencies.append(time.perf_counter() - start)
+                matches += found
+
+            profiles.append(
+                self.__summarize(
+                    rule="extract",
+                    new_column=str(extract_rule.new_column),
+                    pattern=pattern,
+                    alternative=number + 1 if len(alternatives) > 1 else None,
+                    latencies=latencies,
+                    matches=matches,
+                    rows=rows,
+                )
+            )
+
+        return profiles
+
+    def profile_sheet(self, source: "pandas.Series", sheet_plan: SheetPlan) -> dict:
+        """Times each of a sheet's patterns on each row of its source column.
+
+        Parameters
+        ----------
+        source : pandas.Series  The source column, as loaded (& filtered), indexed by row from 0.
+        sheet_plan : SheetPlan
+
+        Returns
+        -------
+        profile : dict  'sheet', 'rows', 'seconds', 'patterns' (one entry per pattern, in the order run:
+                            'rule', 'new_column', 'pattern', 'alternative', 'seconds', 'matches',
+                            'max_seconds', 'histogram', 'slowest_rows' & 'hotspots')
+                            & 'slowest_rows' (by time for all patterns together).
+                            Row numbers are as in the spreadsheet, counting the header as row 1.
+        """
+        rows = [
+            index + 2 if isinstance(index, int) else str(index)
+            for index in source.index.tolist()
+        ]
+        texts = [text if isinstance(text, str) else None for text in source.tolist()]
+        row_seconds = [0.0] * len(texts)
+        patterns = []
+
+        for cleaning_rule in sheet_plan.cleaning:
+            patterns.append(
+                self.__profile_cleaning(
+                    cleaning_rule=cleaning_rule, texts=texts, rows=rows
+                )
+            )
+
+        for extract_rule in sheet_plan.extracts:
+            patterns.extend(
+                self.__profile_extract(
+                    extract_rule=extract_rule, texts=texts, rows=rows
+                )
+            )
+
+        for pattern_profile in patterns:
+            for position, latency in enumerate(pattern_profile.pop("_latencies")):
+                row_seconds[position] += latency
+
+        return {
+            "sheet": sheet_plan.name,
+            "rows": len(texts),
+            "seconds": sum(row_seconds),
+            "patterns": patterns,
+            "slowest_rows": self.__slowest(latencies=row_seconds, rows=rows),
+        }
+
+    def __slowest(self, latencies: list, rows: list) -> list:
+        """Lists the slowest rows, slowest first.
+
+        Parameters
+        ----------
+        latencies : list of float
+        rows : list     Spreadsheet row number of each latency.
+
+        Returns
+        -------
+        slowest_rows : list of dict     'row' & 'seconds'.
+        """
+        slowest = sorted(
+            range(len(latencies)),
+            key=lambda position: latencies[position],
+            reverse=True,
+        )[: self.__slowest_rows]
+        return [
+            {"row": rows[position], "seconds": latencies[position]}
+            for position in slowest
+        ]
+
+    def __summarize(
+        self,
+        rule: str,
+        new_column: Union[str, None],
+        pattern: str,
+        alternative: Union[int, None],
+        latencies: list,
+        matches: int,
+        rows: list,
+    ) -> dict:
+        """Sums up one pattern's timings.
+
+        Parameters
+        ----------
+        rule : str                  'cleaning' or 'extract'.
+        new_column : str or None
+        pattern : str
+        alternative : int or None   Which of the rule's patterns, if it has several.
+        latencies : list of float   Seconds for each row.
+        matches : int               Rows matched (or, for cleaning, changed).
+        rows : list                 Spreadsheet row number of each latency.
+
+        Returns
+        -------
+        profile : dict  Still holding the latencies, as '_latencies'.
+        """
+        return {
+            "rule": rule,
+            "new_column": new_column,
+            "pattern": pattern,
+            "alternative": alternative,
+            "seconds": sum(latencies),
+            "matches": matches,
+            "max_seconds": max(latencies, default=0.0),
+            "histogram": self.__histogram(latencies=latencies),
+            "slowest_rows": self.__slowest(latencies=latencies, rows=rows),
+            "hotspots": pattern_hotspots(pattern=pattern),
+            "_latencies": latencies,
+        }
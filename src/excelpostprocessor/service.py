@@ -0,0 +1,276 @@
+"""
+Module: contains class ParserService, which keeps the interpreter & compiled configs warm
+and runs jobs arriving over a local socket or through a spool directory.
+"""
+import concurrent.futures
+import json
+import os
+import socketserver
+import threading
+import time
+from typing import Union
+
+from excelpostprocessor.parser_runner import ParserRunner
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+#   Spool directory layout: jobs are dropped in as *.json files, moved to 'done'
+#   once run, with the results written alongside as *.result.json.
+JOB_EXTENSION = ".json"
+RESULT_EXTENSION = ".result.json"
+DONE_DIRECTORY = "done"
+
+
+def run_job(config_filename: str, source_filename: Union[str, None] = None) -> dict:
+    """Runs one job through ParserRunner. Never raises, so one bad job can't stop the service.
+    Lives at module level so process pools can pickle it.
+
+    Parameters
+    ----------
+    config_filename : str
+    source_filename : Optional str  Workbook to process instead of the one named in the config file.
+
+    Returns
+    -------
+    result : dict   'success', 'outputs', per-sheet 'sheets' stats, 'seconds' & any 'error'.
+    """
+    start = time.perf_counter()
+
+    try:
+        runner = ParserRunner(config_filename=config_filename)
+        success = runner.process(source_filename=source_filename)
+        result = runner.report()
+        result["success"] = success
+    except Exception as e:
+        result = {
+            "config": config_filename,
+            "source": source_filename,
+            "success": False,
+            "outputs": [],
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """
+    Reads one JSON job per line & answers each with one JSON result line.
+    """
+
+    def handle(self) -> None:
+        service: ParserService = self.server.service  # type: ignore[attr-defined]
+
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+                result = service.submit(
+                    config_filename=job["config"],
+                    source_filename=job.get("workbook"),
+                ).result()
+            except (ValueError, KeyError, TypeError) as e:
+                result = {"success": False, "error": f"Bad job request: {e}"}
+
+            self.wfile.write((json.dumps(result) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _JobServer(socketserver.ThreadingTCPServer):
+    """
+    Serves each connection on its own thread, without holding up shutdown or a restart on the same port.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class ParserService:
+    """
+    Long-lived job runner: pays the pandas/openpyxl import cost once, caches each compiled config
+    & runs jobs on a pool of workers.
+    """
+
+    def __init__(self, workers: int = 2, use_processes: bool = False) -> None:
+        """Starts the worker pool.
+
+        Parameters
+        ----------
+        workers : int           Number of jobs run at once.
+        use_processes : bool    Run jobs in worker processes (each keeping its own warm imports
+                                    & config cache) instead of threads.
+        """
+        if not isinstance(workers, int) or workers < 1:
+            raise TypeError("Argument 'workers' is not the expected positive int.")
+
+        self.__executor: concurrent.futures.Executor
+
+        if use_processes:
+            self.__executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers
+            )
+        else:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+        self.__stop = threading.Event()
+        self.__server: Union[_JobServer, None] = None
+
+    def address(self) -> Union[tuple, None]:
+        """Where serve_socket is listening, useful when it was started on port 0.
+
+        Returns
+        -------
+        address : (host, port) tuple or None if not serving.
+        """
+        if self.__server is None:
+            return None
+
+        address: tuple = self.__server.server_address
+        return address
+
+    def close(self) -> None:
+        """Stops serving & waits for the jobs already running to finish."""
+        self.stop()
+        self.__executor.shutdown(wait=True)
+
+    def serve_socket(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        """Accepts jobs over a local TCP socket until stop() is called.
+        Each request is a line of JSON like {"config": "a.xml", "workbook": "b.xlsx"}
+        ('workbook' is optional); the reply is a line of JSON with the job's result.
+
+        Parameters
+        ----------
+        host : str
+        port : int
+        """
+        with _JobServer((host, port), _JobHandler) as server:
+            server.service = self  # type: ignore[attr-defined]
+            self.__server = server
+            print(f"Listening for jobs on {host}:{server.server_address[1]}.")
+            server.serve_forever(poll_interval=0.5)
+
+        self.__server = None
+
+    def serve_spool(
+        self,
+        spool_directory: str,
+        poll_seconds: float = 1.0,
+        max_polls: Union[int, None] = None,
+    ) -> None:
+        """Runs the jobs dropped into a directory as .json files (same format as socket requests)
+        until stop() is called. Each job's result is written next to it as a .result.json file
+        & the job file is moved into a 'done' subdirectory. Write job files under another name
+        & rename them into place, so a half-written job is never picked up.
+
+        Parameters
+        ----------
+        spool_directory : str
+        poll_seconds : float            Time between looks at the directory.
+        max_polls : Optional int        Stop after this many looks (mostly for testing).
+        """
+        if not os.path.isdir(spool_directory):
+            raise FileNotFoundError(f"Unable to find directory '{spool_directory}'.")
+
+        done_directory = os.path.join(spool_directory, DONE_DIRECTORY)
+        os.makedirs(done_directory, exist_ok=True)
+        pending: dict = {}
+        polls = 0
+
+        while not self.__stop.is_set():
+            for entry in sorted(os.listdir(spool_directory)):
+                job_filename = os.path.join(spool_directory, entry)
+
+                if (
+                    entry.endswith(JOB_EXTENSION)
+                    and not entry.endswith(RESULT_EXTENSION)
+                    and job_filename not in pending
+                ):
+                    pending[job_filename] = self.__submit_spool_job(job_filename)
+
+            for job_filename, future in list(pending.items()):
+                if future.done():
+                    self.__finish_spool_job(
+                        job_filename=job_filename,
+                        result=future.result(),
+                        done_directory=done_directory,
+                    )
+                    del pending[job_filename]
+
+            polls += 1
+
+            if max_polls is not None and polls >= max_polls and not pending:
+                break
+
+            self.__stop.wait(poll_seconds)
+
+    def stop(self) -> None:
+        """Asks serve_socket or serve_spool to return."""
+        self.__stop.set()
+
+        if self.__server is not None:
+            self.__server.shutdown()
+
+    def submit(
+        self, config_filename: str, source_filename: Union[str, None] = None
+    ) -> concurrent.futures.Future:
+        """Queues a job for the worker pool.
+
+        Parameters
+        ----------
+        config_filename : str
+        source_filename : Optional str  Workbook to process instead of the one named in the config file.
+
+        Returns
+        -------
+        future : concurrent.futures.Future  Resolves to the job's result dict.
+        """
+        if not isinstance(config_filename, str):
+            raise TypeError("Argument 'config_filename' is not the expected str.")
+
+        return self.__executor.submit(run_job, config_filename, source_filename)
+
+    @staticmethod
+    def __finish_spool_job(
+        job_filename: str, result: dict, done_directory: str
+    ) -> None:
+        """Writes out a spooled job's result & moves the job file out of the way.
+
+        Parameters
+        ----------
+        job_filename : str
+        result : dict
+        done_directory : str
+        """
+        result_filename = job_filename[: -len(JOB_EXTENSION)] + RESULT_EXTENSION
+
+        with open(result_filename, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+        os.replace(
+            job_filename,
+            os.path.join(done_directory, os.path.basename(job_filename)),
+        )
+
+    def __submit_spool_job(self, job_filename: str) -> concurrent.futures.Future:
+        """Reads a spooled job file & queues it.
+
+        Parameters
+        ----------
+        job_filename : str
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+        """
+        try:
+            with open(job_filename, "r", encoding="utf-8") as file:
+                job = json.load(file)
+
+            return self.submit(
+                config_filename=job["config"], source_filename=job.get("workbook")
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            future.set_result({"success": False, "error": f"Bad job file: {e}"})
+            return future
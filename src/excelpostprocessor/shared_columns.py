@@ -0,0 +1,253 @@
+"""
+Module: contains class SharedColumns, which publishes text columns in shared memory
+so worker processes can read the rows they need without the DataFrame being pickled to them.
+"""
+import os
+import sys
+from typing import TYPE_CHECKING, NamedTuple, Type, cast
+
+import numpy
+
+if TYPE_CHECKING:  # pragma: no cover
+    from multiprocessing.shared_memory import SharedMemory
+
+    import pandas
+
+
+class SharedColumn(NamedTuple):
+    """
+    Everything a worker needs to find one published column: small enough to pickle with every task.
+    """
+
+    name: object
+    dtype: object
+    length: int
+
+    #   UTF-8 text of every row, back to back.
+    data_block: str
+
+    #   length + 1 int64 byte offsets into the text, then length bools: is the row a string?
+    index_block: str
+
+    #   Process that published the column, & so registered its blocks with the resource tracker.
+    owner_pid: int
+
+
+def _attach(block_name: str, owner_pid: int) -> "SharedMemory":
+    """Opens an existing shared memory block without taking responsibility for removing it.
+
+    Parameters
+    ----------
+    block_name : str
+    owner_pid : int     Process that created the block.
+
+    Returns
+    -------
+    block : SharedMemory
+    """
+    shared_memory_class = _shared_memory_class()
+
+    if sys.version_info >= (3, 13):
+        return shared_memory_class(name=block_name, track=False)
+
+    block = shared_memory_class(name=block_name)
+
+    #   Before Python 3.13, attaching registers the block with this process's resource tracker.
+    #   The owner & the workers it starts share one tracker, where the block is already registered,
+    #   but a tracker of our own would warn of a leak or remove the block under its owner.
+    if os.name == "posix" and owner_pid not in (os.getpid(), os.getppid()):
+        from multiprocessing import resource_tracker
+
+        #   Registered under the name with its leading slash.
+        resource_tracker.unregister("/" + block.name, "shared_memory")
+
+    return block
+
+
+def _shared_memory_class() -> "Type[SharedMemory]":
+    """Imports multiprocessing.shared_memory's SharedMemory, which arrived in Python 3.8.
+
+    Returns
+    -------
+    shared_memory_class : type
+
+    Raises
+    ------
+    RuntimeError    Before Python 3.8.
+    """
+    try:
+        from multiprocessing.shared_memory import SharedMemory
+    except ImportError as e:
+        raise RuntimeError(
+            "Sharing rows with worker processes needs Python 3.8 or later."
+        ) from e
+
+    return SharedMemory
+
+
+def read_rows(shared_column: SharedColumn, start: int, stop: int) -> "pandas.Series":
+    """Attaches to a published column & copies out just rows [start, stop).
+
+    Parameters
+    ----------
+    shared_column : SharedColumn
+    start : int
+    stop : int
+
+    Returns
+    -------
+    rows : pandas.Series    Indexed start to stop - 1, with the published column's dtype.
+    """
+    import pandas
+
+    stop = min(stop, shared_column.length)
+    data_block = _attach(
+        block_name=shared_column.data_block, owner_pid=shared_column.owner_pid
+    )
+    index_block = _attach(
+        block_name=shared_column.index_block, owner_pid=shared_column.owner_pid
+    )
+
+    try:
+        offsets_array = numpy.ndarray(
+            (shared_column.length + 1,), dtype=numpy.int64, buffer=index_block.buf
+        )
+        valid_array = numpy.ndarray(
+            (shared_column.length,),
+            dtype=numpy.bool_,
+            buffer=index_block.buf,
+            offset=offsets_array.nbytes,
+        )
+        last = stop + 1
+        offsets = offsets_array[start:last].tolist()
+        valid = valid_array[start:stop].tolist()
+
+        #   The numpy views must go before the blocks can be closed.
+        del offsets_array, valid_array
+        first, last = offsets[0], offsets[-1]
+        text = bytes(cast(memoryview, data_block.buf)[first:last])
+    finally:
+        data_block.close()
+        index_block.close()
+
+    relative = [offset - offsets[0] for offset in offsets]
+    values = [
+        text[begin:end].decode("utf-8") if is_text else None
+        for begin, end, is_text in zip(relative, relative[1:], valid)
+    ]
+    return pandas.Series(
+        values,
+        index=pandas.RangeIndex(start, stop),
+        name=shared_column.name,
+        dtype=shared_column.dtype,
+    )
+
+
+class SharedColumns:
+    """
+    Copies text columns once into shared memory as UTF-8 bytes plus offsets (no pyarrow needed).
+    Workers attach read-only with read_rows; the owner must close() to free the memory.
+    """
+
+    def __init__(self, df: "pandas.DataFrame", column_names: list) -> None:
+        """Publishes the columns.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+        column_names : list     Columns to publish. Values that aren't strings are published as missing.
+        """
+        if not isinstance(column_names, list):
+            raise TypeError("Argument 'column_names' is not the expected list.")
+
+        self.__blocks: list = []
+        self.__handles: dict = {}
+
+        try:
+            for column_name in column_names:
+                self.__handles[column_name] = self.__publish(df[column_name])
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self) -> "SharedColumns":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Frees the shared memory."""
+        for block in self.__blocks:
+            block.close()
+
+            try:
+                block.unlink()
+            except FileNotFoundError:  # pragma: no cover
+                pass
+
+        self.__blocks = []
+
+    def handles(self) -> dict:
+        """What workers need to attach.
+
+        Returns
+        -------
+        handles : dict  Column name -> SharedColumn
+        """
+        return dict(self.__handles)
+
+    def __publish(self, column: "pandas.Series") -> SharedColumn:
+        """Copies one column into two new shared memory blocks.
+
+        Parameters
+        ----------
+        column : pandas.Series
+
+        Returns
+        -------
+        shared_column : SharedColumn
+        """
+        encoded = [
+            value.encode("utf-8") if isinstance(value, str) else None
+            for value in column.tolist()
+        ]
+        length = len(encoded)
+        offsets = numpy.zeros(length + 1, dtype=numpy.int64)
+        numpy.cumsum(
+            [0 if value is None else len(value) for value in encoded],
+            out=offsets[1:],
+        )
+        valid = numpy.array([value is not None for value in encoded], dtype=numpy.bool_)
+
+        shared_memory_class = _shared_memory_class()
+
+        #   Zero-size blocks aren't allowed.
+        data_block = shared_memory_class(create=True, size=max(int(offsets[-1]), 1))
+        self.__blocks.append(data_block)
+        index_block = shared_memory_class(
+            create=True, size=offsets.nbytes + max(valid.nbytes, 1)
+        )
+        self.__blocks.append(index_block)
+        data_buffer = cast(memoryview, data_block.buf)
+        index_buffer = cast(memoryview, index_block.buf)
+        position = 0
+
+        for value in encoded:
+            if value:
+                end = position + len(value)
+                data_buffer[position:end] = value
+                position = end
+
+        offsets_end = offsets.nbytes
+        valid_end = offsets_end + valid.nbytes
+        index_buffer[:offsets_end] = offsets.tobytes()
+        index_buffer[offsets_end:valid_end] = valid.tobytes()
+        return SharedColumn(
+            name=column.name,
+            dtype=column.dtype,
+            length=length,
+            data_block=data_block.name,
+            index_block=index_block.name,
+            owner_pid=os.getpid(),
+        )
@@ -0,0 +1,294 @@
+"""
+Module: contains class FolderWatcher, which processes workbooks as they land in a directory.
+"""
+import concurrent.futures
+import fnmatch
+import os
+import threading
+import time
+from typing import Union
+
+from excelpostprocessor.diagnostics import DIAGNOSTICS_SUFFIX
+from excelpostprocessor.parser_runner import ParserRunner
+from excelpostprocessor.service import ParserService
+
+
+class FolderWatcher:
+    """
+    Watches a directory & runs each new or changed workbook through the config matching its name.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        rules: list,
+        workers: int = 2,
+        debounce_seconds: float = 2.0,
+        process_existing: bool = False,
+    ) -> None:
+        """Sets up the watcher; call watch() to start.
+
+        Parameters
+        ----------
+        directory : str                 Directory to watch.
+        rules : list of (str, str)      (filename pattern, config filename) pairs, like ('echo_*.xlsx', 'echo.xml').
+                                            The first pattern matching a file's name picks its config.
+        workers : int                   Workbooks processed at once; more wait their turn.
+        debounce_seconds : float        How long a file's size & modification time must stay unchanged
+                                            before it's considered completely written.
+        process_existing : bool         Also process the matching files already there at startup.
+        """
+        if not isinstance(directory, str) or not os.path.isdir(directory):
+            raise FileNotFoundError(f"Unable to find directory '{directory}'.")
+
+        if not isinstance(rules, list) or not rules:
+            raise TypeError("Argument 'rules' is not the expected non-empty list.")
+
+        self.__directory = directory
+        self.__rules = []
+
+        for pattern, config_filename in rules:
+            #   Our own outputs are named '<workbook>_<sheet>.xlsx' (plus any
+            #   '<workbook>_<sheet>_diagnostics.xlsx'), so remember each config's
+            #   sheet names to recognize the files we create for the workbooks alongside them.
+            plan = ParserRunner(config_filename=config_filename).plan(
+                check_source=False
+            )
+            sheet_names = tuple(sheet_plan.name for sheet_plan in plan.sheets)
+            self.__rules.append((pattern, config_filename, sheet_names))
+
+        self.__workers = workers
+        self.__debounce_seconds = debounce_seconds
+        self.__service = ParserService(workers=workers)
+        self.__stop = threading.Event()
+
+        #   filename -> (size, mtime) signature & when it was first seen with that signature.
+        self.__candidates: dict = {}
+
+        #   filename -> signature when it was last queued.
+        self.__processed: dict = {}
+
+        #   Files the jobs reported writing.
+        self.__written: set = set()
+        self.__pending: dict = {}
+        self.__results: list = []
+
+        if not process_existing:
+            for filename, (signature, _) in self.__scan().items():
+                self.__processed[filename] = signature
+
+    def close(self) -> None:
+        """Stops watching & waits for queued workbooks to finish."""
+        self.stop()
+        self.__service.close()
+
+    def __collect_finished(self) -> list:
+        """Takes the finished jobs off the pending list, remembering the files they wrote.
+
+        Returns
+        -------
+        finished : list of dict     Their results.
+        """
+        finished = []
+
+        for filename, future in list(self.__pending.items()):
+            if future.done():
+                result = future.result()
+                finished.append(result)
+                del self.__pending[filename]
+                self.__written.update(result.get("outputs", []))
+                self.__written.update(
+                    sheet["diagnostics"]
+                    for sheet in result.get("sheets", [])
+                    if sheet.get("diagnostics")
+                )
+
+                for output in result.get("outputs", []):
+                    print(f"Created file '{output}'.")
+
+                if result.get("error"):
+                    print(f"Unable to process '{filename}': {result['error']}")
+
+        return finished
+
+    @staticmethod
+    def __outputs_of(filename: str, sheet_names: tuple) -> set:
+        """Names the files processing a workbook writes: one per sheet, plus each sheet's diagnostics.
+
+        Parameters
+        ----------
+        filename : str
+        sheet_names : tuple of str
+
+        Returns
+        -------
+        outputs : set of str
+        """
+        outputs = set()
+
+        for sheet_name in sheet_names:
+            output_filename = ParserRunner.output_filename(
+                source_file=filename, sheet_name=sheet_name
+            )
+            outputs.add(output_filename)
+            outputs.add(
+                os.path.splitext(output_filename)[0] + DIAGNOSTICS_SUFFIX + ".xlsx"
+            )
+
+        return outputs
+
+    def poll(self) -> list:
+        """Looks at the directory once, queuing files that have settled & collecting finished results.
+
+        Returns
+        -------
+        results : list of dict  Results of the jobs that finished since the last poll.
+        """
+        now = time.monotonic()
+        scanned = self.__scan()
+
+        #   Files that have gone (or turned out to be outputs) no longer need settling.
+        for filename in list(self.__candidates):
+            if filename not in scanned:
+                del self.__candidates[filename]
+
+        self.__queue_settled(scanned=scanned, now=now)
+        finished = self.__collect_finished()
+        self.__results.extend(finished)
+        return finished
+
+    def __queue_settled(self, scanned: dict, now: float) -> None:
+        """Queues the files whose signature hasn't changed for the debounce time, while workers are free.
+
+        Parameters
+        ----------
+        scanned : dict  filename -> ((size, modification time), config filename), as from __scan.
+        now : float     Monotonic time of the scan.
+        """
+        for filename, (signature, config_filename) in scanned.items():
+            if (
+                self.__processed.get(filename) == signature
+                or filename in self.__pending
+            ):
+                continue
+
+            first_seen = self.__candidates.get(filename)
+
+            if first_seen is None or first_seen[0] != signature:
+                #   New or still being written; start (or restart) its debounce clock.
+                self.__candidates[filename] = (signature, now)
+                continue
+
+            if (
+                now - first_seen[1] < self.__debounce_seconds
+                or len(self.__pending) >= self.__workers
+            ):
+                continue
+
+            del self.__candidates[filename]
+            self.__processed[filename] = signature
+            self.__pending[filename] = self.__service.submit(
+                config_filename=config_filename, source_filename=filename
+            )
+
+    def results(self) -> list:
+        """Results of all the jobs finished so far.
+
+        Returns
+        -------
+        results : list of dict
+        """
+        return list(self.__results)
+
+    def __rule_for(self, filename: str) -> Union[tuple, None]:
+        """Finds the rule for a file, if its name matches one.
+
+        Parameters
+        ----------
+        filename : str
+
+        Returns
+        -------
+        rule : (str, tuple of str) or None  The config filename & the names of the sheets it processes.
+        """
+        basename = os.path.basename(filename)
+
+        if basename.startswith(("~$", ".")):
+            #   Excel lock files & hidden temporary files.
+            return None
+
+        for pattern, config_filename, sheet_names in self.__rules:
+            if fnmatch.fnmatch(basename, pattern):
+                return config_filename, sheet_names
+
+        return None
+
+    def __scan(self) -> dict:
+        """Lists the files in the directory that match a rule, other than our outputs: the files
+        the jobs reported writing & the ones named exactly as a workbook alongside them would be processed into.
+
+        Returns
+        -------
+        scanned : dict  filename -> ((size, modification time), config filename)
+        """
+        scanned = {}
+        outputs = set(self.__written)
+
+        with os.scandir(self.__directory) as entries:
+            for entry in entries:
+                rule = self.__rule_for(entry.path) if entry.is_file() else None
+
+                if rule is None:
+                    continue
+
+                outputs.update(
+                    self.__outputs_of(filename=entry.path, sheet_names=rule[1])
+                )
+                stat = entry.stat()
+                scanned[entry.path] = ((stat.st_size, stat.st_mtime_ns), rule[0])
+
+        return {
+            filename: found
+            for filename, found in scanned.items()
+            if filename not in outputs
+        }
+
+    def stop(self) -> None:
+        """Asks watch() to return."""
+        self.__stop.set()
+
+    def watch(
+        self, poll_seconds: float = 1.0, max_polls: Union[int, None] = None
+    ) -> None:
+        """Polls the directory until stop() is called.
+
+        Parameters
+        ----------
+        poll_seconds : float        Time between looks at the directory.
+        max_polls : Optional int    Stop after this many looks once nothing is queued (mostly for testing).
+        """
+        polls = 0
+
+        while not self.__stop.is_set():
+            self.poll()
+            polls += 1
+
+            if (
+                max_polls is not None
+                and polls >= max_polls
+                and not self.__pending
+                and not self.__candidates
+            ):
+                break
+
+            self.__stop.wait(poll_seconds)
+
+    def wait(self) -> list:
+        """Blocks until every queued workbook has been processed.
+
+        Returns
+        -------
+        results : list of dict  Results of the jobs that finished.
+        """
+        concurrent.futures.wait(list(self.__pending.values()))
+        return self.poll()
@@ -42,6 +42,18 @@ def fixture_test_config_filename_column_name_missing(request) -> str:
     return os.path.join(test_dir, "excel_postprocess_column_name_missing.xml")
 
 
+@pytest.fixture(name="test_config_filename_engine")
+def fixture_test_config_filename_engine(request) -> str:
+    test_dir = os.path.dirname(request.module.__file__)
+    return os.path.join(test_dir, "excel_postprocess_engine.xml")
+
+
+@pytest.fixture(name="test_config_filename_engine_unknown")
+def fixture_test_config_filename_engine_unknown(request) -> str:
+    test_dir = os.path.dirname(request.module.__file__)
+    return os.path.join(test_dir, "excel_postprocess_engine_unknown.xml")
+
+
 @pytest.fixture(name="test_config_filename_extract_pattern_missing")
 def fixture_test_config_filename_extract_pattern_missing(request) -> str:
     test_dir = os.path.dirname(request.module.__file__)
@@ -108,6 +120,12 @@ def fixture_test_config_filename_source_column_field_missing(request) -> str:
     return os.path.join(test_dir, "excel_postprocess_source_column_field_missing.xml")
 
 
+@pytest.fixture(name="test_config_filename_string_storage")
+def fixture_test_config_filename_string_storage(request) -> str:
+    test_dir = os.path.dirname(request.module.__file__)
+    return os.path.join(test_dir, "excel_postprocess_string_storage.xml")
+
+
 @pytest.fixture(name="test_config_filename_workbook_dict_missing")
 def fixture_test_config_filename_workbook_dict_missing(request) -> str:
     test_dir = os.path.dirname(request.module.__file__)
@@ -172,3 +190,9 @@ def fixture_test_realistic_excel_filename(request) -> str:
 def fixture_test_revised_excel_filename(request) -> str:
     test_dir = os.path.dirname(request.module.__file__)
     return os.path.join(test_dir, "revised_dummy_data.xlsx")
+
+
+@pytest.fixture(name="test_csv_filename")
+def fixture_test_csv_filename(request) -> str:
+    test_dir = os.path.dirname(request.module.__file__)
+    return os.path.join(test_dir, "test_data.csv")
@@ -0,0 +1,121 @@
+"""
+Module test_checkpoint.py, which performs automated testing of the CheckpointJournal class
+& resuming interrupted runs.
+"""
+import json
+import os
+import shutil
+
+import pytest
+
+from excelpostprocessor.checkpoint import CheckpointJournal, journal_filename
+from excelpostprocessor.parser_runner import ParserRunner
+
+SHEET = """<sheet>
+    <name>{sheet_name}</name>
+    <source_column>
+        <name>REPORT</name>
+        <extract>
+            <pattern>{pattern}</pattern>
+            <new_column>Number</new_column>
+        </extract>
+    </source_column>
+</sheet>"""
+
+
+def write_config(config_filename: str, workbook: str, labs_pattern: str) -> None:
+    sheets = SHEET.format(sheet_name="Patients", pattern="(\\d+)") + SHEET.format(
+        sheet_name="Labs", pattern=labs_pattern
+    )
+
+    with open(config_filename, "w") as file:
+        file.write(f"<workbook><name>{workbook}</name>{sheets}</workbook>")
+
+
+def test_resume(tmp_path, test_realistic_excel_filename):
+    workbook = os.path.join(tmp_path, "test_data.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, workbook)
+    config_filename = os.path.join(tmp_path, "test_data.xml")
+
+    #   The run dies on the second sheet: only the first is journaled.
+    write_config(config_filename, workbook, labs_pattern="(\\d+)")
+    runner = ParserRunner(config_filename=config_filename)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        original_apply_rules = ParserRunner.apply_rules
+
+        def apply_rules(excel_parser, sheet_plan, **kwargs):
+            if sheet_plan.name == "Labs":
+                raise MemoryError("Out of memory.")
+
+            return original_apply_rules(
+                excel_parser=excel_parser, sheet_plan=sheet_plan, **kwargs
+            )
+
+        monkeypatch.setattr(ParserRunner, "apply_rules", staticmethod(apply_rules))
+
+        with pytest.raises(MemoryError):
+            runner.process(checkpoint=True)
+
+    with open(journal_filename(source_file=workbook)) as file:
+        assert list(json.load(file)["sheets"]) == ["Patients"]
+
+    patients_output = os.path.join(tmp_path, "test_data_Patients.xlsx")
+    modified = os.stat(patients_output).st_mtime_ns
+
+    #   Resuming keeps the first sheet's output & does the second.
+    assert runner.process(resume=True)
+    sheets = runner.report()["sheets"]
+    assert sheets[0]["resumed"] and "resumed" not in sheets[1]
+    assert os.stat(patients_output).st_mtime_ns == modified
+    assert runner.report()["outputs"] == [
+        patients_output,
+        os.path.join(tmp_path, "test_data_Labs.xlsx"),
+    ]
+
+    #   A changed output, or changed rules, means the sheet is redone.
+    with open(patients_output, "ab") as file:
+        file.write(b"\0")
+
+    write_config(config_filename, workbook, labs_pattern="(\\d+\\.\\d+)")
+    assert runner.process(resume=True)
+    assert not any(sheet.get("resumed") for sheet in runner.report()["sheets"])
+
+    assert runner.process(resume=True)
+    assert all(sheet.get("resumed") for sheet in runner.report()["sheets"])
+
+    #   Without resume, everything is redone, & the journal is left alone.
+    modified = os.stat(journal_filename(source_file=workbook)).st_mtime_ns
+    assert runner.process()
+    assert not any(sheet.get("resumed") for sheet in runner.report()["sheets"])
+    assert os.stat(journal_filename(source_file=workbook)).st_mtime_ns == modified
+
+    #   No journal unless asked for.
+    os.remove(journal_filename(source_file=workbook))
+    assert runner.process()
+    assert not os.path.exists(journal_filename(source_file=workbook))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_checkpoint_journal(tmp_path):
+    filename = os.path.join(tmp_path, "journal.json")
+
+    with open(filename, "w") as file:
+        file.write("{not json")
+
+    journal = CheckpointJournal(filename=filename, resume=True)
+    assert journal.completed(sheet_name="Labs", fingerprint="abc") is None
+
+    output = os.path.join(tmp_path, "output.xlsx")
+
+    with open(output, "wb") as file:
+        file.write(b"results")
+
+    journal.record(sheet_name="Labs", fingerprint="abc", output=output, rows=4)
+    journal = CheckpointJournal(filename=filename, resume=True)
+    assert journal.completed(sheet_name="Labs", fingerprint="abc")["rows"] == 4
+    assert journal.completed(sheet_name="Labs", fingerprint="def") is None
+    assert CheckpointJournal(filename=filename).completed("Labs", "abc") is None
+
+    with pytest.raises(TypeError):
+        CheckpointJournal(filename=None)
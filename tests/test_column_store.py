@@ -0,0 +1,128 @@
+"""
+Module test_column_store.py, which performs automated testing of the ColumnStore class.
+"""
+import os
+import pickle
+import shutil
+
+import pandas
+import pytest
+
+from excelpostprocessor.excel_postprocessor import ExcelParser
+from excelpostprocessor.parser_runner import ParserRunner
+
+pytest.importorskip("pyarrow")
+
+from excelpostprocessor.column_store import ColumnStore  # noqa: E402
+
+
+@pytest.fixture(name="long_text_filename")
+def fixture_long_text_filename(tmp_path) -> str:
+    filename = os.path.join(tmp_path, "long_text.csv")
+    pandas.DataFrame(
+        {
+            "MRN": range(2000),
+            "REPORT": [
+                f"LVIDd: {row % 7}.{row % 10} cm " + "x" * 500 for row in range(2000)
+            ],
+        }
+    ).to_csv(filename, index=False)
+    return filename
+
+
+def test_column_store(tmp_path):
+    store = ColumnStore(directory=os.path.join(tmp_path, "spill"), min_bytes=0)
+    column = pandas.Series(["a", None, "b"], dtype=object, name="text")
+    mapped = store.map(column)
+    filename = store.filename(mapped)
+    assert os.path.dirname(filename) == store.directory()
+    assert mapped.tolist()[0] == "a" and pandas.isna(mapped.tolist()[1])
+    assert store.filename(column) is None
+
+    #   Already mapped, numbers & small columns stay as they are.
+    assert store.map(mapped) is mapped
+    numbers = pandas.Series([1, 2, 3])
+    assert store.map(numbers) is numbers
+    assert ColumnStore(min_bytes=1000).map(column) is column
+
+    store.close()
+    assert os.listdir(store.directory()) == []
+
+    #   Files a copy writes (as in a worker process) go with the original's close().
+    store = ColumnStore(directory=os.path.join(tmp_path, "spill"), min_bytes=0)
+    copy = pickle.loads(pickle.dumps(store))
+    copy.map(column)
+    assert os.listdir(store.directory()) != []
+    store.close()
+    assert os.listdir(store.directory()) == []
+
+    #   A store making its own directory removes it.
+    store = ColumnStore()
+    store.map(pandas.Series(["a"]))
+    pickle.loads(pickle.dumps(store)).close()
+    assert os.path.exists(store.directory())
+    store.close()
+    assert not os.path.exists(store.directory())
+
+    with pytest.raises(TypeError):
+        ColumnStore(min_bytes=-1)
+
+
+def test_parser_column_store(long_text_filename):
+    expected = ExcelParser(excel_filename=long_text_filename)
+    store = ColumnStore(min_bytes=0)
+    parser = ExcelParser(excel_filename=long_text_filename, column_store=store)
+    assert store.filename(parser.data()["REPORT"]) is not None
+
+    for this_parser in (expected, parser):
+        this_parser.clean_column(column_name="REPORT", pattern="x+", replace="y")
+        this_parser.extract_into_new_column(
+            column_name="REPORT", pattern=r"LVIDd: (\d+\.\d+)", new_column="LVIDd"
+        )
+        this_parser.restore_original_column(column_name="REPORT")
+
+    assert parser.data()["LVIDd"].tolist() == expected.data()["LVIDd"].tolist()
+    assert parser.data()["REPORT"].tolist() == expected.data()["REPORT"].tolist()
+
+    #   Pickling (as for a worker process) sends filenames, not the text.
+    pickled = pickle.dumps(parser)
+    assert len(pickled) < len(pickle.dumps(expected)) / 4
+    copy = pickle.loads(pickled)
+    assert copy.data()["REPORT"].tolist() == expected.data()["REPORT"].tolist()
+
+    parser.close()
+    assert not os.path.exists(store.directory())
+
+    with pytest.raises(TypeError):
+        ExcelParser(excel_filename=long_text_filename, column_store="store")
+
+
+def test_spill_config(tmp_path, test_realistic_excel_filename):
+    workbook = os.path.join(tmp_path, "patients.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, workbook)
+    spill_directory = os.path.join(tmp_path, "spill")
+    config_filename = os.path.join(tmp_path, "patients.xml")
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <spill>true</spill>
+                <spill_directory>{spill_directory}</spill_directory>
+                <sheet>
+                    <name>Patients</name>
+                    <source_column>
+                        <name>REPORT</name>
+                        <extract>
+                            <pattern>LVIDd:\\s?(\\d+\\.?\\d*)\\s?cm</pattern>
+                            <new_column>LVIDd</new_column>
+                        </extract>
+                    </source_column>
+                </sheet>
+            </workbook>"""
+        )
+
+    runner = ParserRunner(config_filename=config_filename)
+    assert runner.plan().spill
+    assert runner.process()
+    assert os.listdir(spill_directory) == []
@@ -0,0 +1,103 @@
+"""
+Module test_config_loader.py, which performs automated testing of the streaming config parser
+& the on-disk cache of compiled configs.
+"""
+import glob
+import os
+import shutil
+
+import pytest
+import xmltodict
+
+from excelpostprocessor.config_cache import PlanCache
+from excelpostprocessor.config_loader import parse_config
+from excelpostprocessor.parser_runner import ParserRunner
+
+
+def test_streaming_matches_xmltodict(test_config_filename):
+    test_dir = os.path.dirname(test_config_filename)
+
+    for filename in glob.glob(os.path.join(test_dir, "*.xml")):
+        if os.path.basename(filename) == "malformed.xml":
+            continue
+
+        with open(filename, encoding="utf-8") as file:
+            expected = xmltodict.parse(file.read())
+
+        assert parse_config(filename=filename, streaming=True) == expected, filename
+        assert parse_config(filename=filename) == expected
+
+
+def test_streaming_shapes(tmp_path):
+    filename = os.path.join(tmp_path, "shapes.xml")
+
+    with open(filename, "w") as file:
+        file.write(
+            """<workbook>
+                <!-- A comment. -->
+                <name>a.xlsx</name>
+                <empty/>
+                <extract mode="all">
+                    <new_column group="2">Diastolic</new_column>
+                    <new_column>Pulse</new_column>
+                </extract>
+                <mixed>text<child>1</child> more</mixed>
+            </workbook>"""
+        )
+
+    with open(filename, encoding="utf-8") as file:
+        expected = xmltodict.parse(file.read())
+
+    assert parse_config(filename=filename, streaming=True) == expected
+
+    with open(os.path.join(tmp_path, "malformed.xml"), "w") as file:
+        file.write("<workbook><name>a.xlsx</workbook>")
+
+    with pytest.raises(Exception):
+        parse_config(filename=os.path.join(tmp_path, "malformed.xml"), streaming=True)
+
+
+def test_plan_cache(tmp_path, test_config_filename, monkeypatch):
+    config_filename = os.path.join(tmp_path, "config.xml")
+    shutil.copyfile(test_config_filename, config_filename)
+    cache_directory = os.path.join(tmp_path, "cache")
+
+    plan = ParserRunner(
+        config_filename=config_filename, cache_directory=cache_directory
+    ).plan(check_source=False)
+    assert len(os.listdir(cache_directory)) == 1
+
+    #   Another process (no in-memory cache) gets the plan without parsing the file.
+    monkeypatch.setattr(ParserRunner, "_ParserRunner__plan_cache", {})
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Config parsed again.")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("excelpostprocessor.parser_runner.parse_config", fail)
+        cached_plan = ParserRunner(
+            config_filename=config_filename, cache_directory=cache_directory
+        ).plan(check_source=False)
+
+    assert cached_plan == plan
+
+    #   Changed contents mean compiling again.
+    with open(config_filename, "a") as file:
+        file.write("\n<!-- Edited. -->\n")
+
+    monkeypatch.setattr(ParserRunner, "_ParserRunner__plan_cache", {})
+    cache = PlanCache(directory=cache_directory)
+    assert cache.load(config_filename=config_filename, content_hash="old") is None
+
+    #   Whatever else unpickles, even with a matching hash, isn't taken for a plan.
+    cache.save(config_filename=config_filename, content_hash="other", plan=("plan",))
+    assert cache.load(config_filename=config_filename, content_hash="other") is None
+    assert (
+        ParserRunner(config_filename=config_filename, cache_directory=cache_directory)
+        .plan(check_source=False)
+        .sheets
+        == plan.sheets
+    )
+
+    with pytest.raises(TypeError):
+        PlanCache(directory=None)
@@ -0,0 +1,115 @@
+"""
+Module test_diagnostics.py, which performs automated testing of the MatchDiagnostics class.
+"""
+import os
+import shutil
+
+import openpyxl
+import pytest
+
+from excelpostprocessor.diagnostics import MatchDiagnostics
+from excelpostprocessor.excel_postprocessor import ExcelParser
+from excelpostprocessor.parser_runner import ParserRunner
+
+CONFIG = """<workbook>
+    <name>{workbook}</name>
+    <diagnostics>{diagnostics}</diagnostics>
+    <sheet>
+        <name>Labs</name>
+        <source_column>
+            <name>REPORT</name>
+            <cleaning>
+                <pattern>\\.$</pattern>
+                <replace>;</replace>
+            </cleaning>
+            <extract>
+                <pattern>pH: ?(\\d+\\.?\\d*)</pattern>
+                <pattern>(\\d+\\.?\\d*) ?pH</pattern>
+                <new_column>pH</new_column>
+            </extract>
+            <extract>
+                <pattern>TDS: ?(\\d+\\.?\\d*)</pattern>
+                <new_column>TDS</new_column>
+            </extract>
+        </source_column>
+    </sheet>
+</workbook>"""
+
+
+def test_diagnostics(test_realistic_excel_filename):
+    diagnostics = MatchDiagnostics(sample_size=2, seed=0)
+    parser = ExcelParser(
+        excel_filename=test_realistic_excel_filename,
+        sheet_name="Labs",
+        diagnostics=diagnostics,
+    )
+    assert parser.diagnostics() is diagnostics
+
+    parser.clean_column(column_name="REPORT", pattern=r"\.$", replace="")
+    parser.extract_into_new_column(
+        column_name="REPORT",
+        pattern=[r"pH: ?(\d+\.?\d*)", r"(\d+\.?\d*) ?pH"],
+        new_column="pH",
+    )
+    parser.extract_into_new_column(
+        column_name="REPORT", pattern=r"TDS: ?(\d+\.?\d*)", new_column="TDS"
+    )
+    rules = diagnostics.rules()
+
+    #   Cleaning, each pH alternative, the pH list as a whole & TDS.
+    assert [rule["rule"] for rule in rules] == ["cleaning"] + ["extract"] * 4
+    assert rules[0]["matches"] == 2
+    assert [rule["matches"] for rule in rules[1:]] == [3, 1, 4, 0]
+    assert [rule["alternative"] for rule in rules[1:]] == [1, 2, "all", None]
+    assert rules[3]["match_rate"] == 1.0
+    assert rules[4]["nulls"] == 4
+
+    #   Nothing matched TDS, so a sample of its rows is kept.
+    unmatched = diagnostics.unmatched()
+    assert len(unmatched) == 2
+    assert all(sample["new_column"] == "TDS" for sample in unmatched)
+
+    with pytest.raises(TypeError):
+        MatchDiagnostics(sample_size=-1)
+
+    with pytest.raises(TypeError):
+        ExcelParser(
+            excel_filename=test_realistic_excel_filename, diagnostics="diagnostics"
+        )
+
+
+@pytest.mark.parametrize("diagnostics", ["true", "false", "maybe"])
+def test_diagnostics_config(tmp_path, test_realistic_excel_filename, diagnostics):
+    workbook = os.path.join(tmp_path, "labs.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, workbook)
+    config_filename = os.path.join(tmp_path, "labs.xml")
+
+    with open(config_filename, "w") as file:
+        file.write(CONFIG.format(workbook=workbook, diagnostics=diagnostics))
+
+    runner = ParserRunner(config_filename=config_filename)
+
+    if diagnostics == "maybe":
+        with pytest.raises(SyntaxError):
+            runner.process()
+
+        return
+
+    assert runner.process()
+    sheet_stats = runner.report()["sheets"][0]
+
+    if diagnostics == "false":
+        assert "diagnostics" not in sheet_stats
+        return
+
+    assert sheet_stats["diagnostics"] == os.path.join(
+        tmp_path, "labs_Labs_diagnostics.xlsx"
+    )
+    wb_obj = openpyxl.load_workbook(sheet_stats["diagnostics"])
+    rules = list(wb_obj["Rules"].iter_rows(values_only=True))
+    assert rules[0][:3] == ("Column", "Rule", "New column")
+    assert len(rules) == 6
+
+    #   Every TDS row is unmatched, with its spreadsheet row number.
+    unmatched = list(wb_obj["Unmatched"].iter_rows(values_only=True))
+    assert [row[1] for row in unmatched[1:]] == [2, 3, 4, 5]
@@ -0,0 +1,112 @@
+"""
+Module test_estimator.py, which performs automated testing of the RunEstimator class & --estimate.
+"""
+import os
+
+import pandas
+import pytest
+
+from excelpostprocessor.__main__ import format_bytes, format_seconds, main
+from excelpostprocessor.estimator import RunEstimator
+from excelpostprocessor.parser_runner import ParserRunner
+
+ROWS = 3000
+
+
+@pytest.fixture(name="estimate_config_filename")
+def fixture_estimate_config_filename(tmp_path) -> str:
+    workbook = os.path.join(tmp_path, "reports.xlsx")
+    pandas.DataFrame(
+        {
+            "MRN": range(ROWS),
+            "REPORT": [
+                f"LVIDd: {row % 7}.{row % 10} cm " + "word " * (row % 40)
+                for row in range(ROWS)
+            ],
+        }
+    ).to_excel(workbook, sheet_name="Reports", index=False)
+    config_filename = os.path.join(tmp_path, "reports.xml")
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <sheet>
+                    <name>Reports</name>
+                    <source_column>
+                        <name>REPORT</name>
+                        <extract>
+                            <pattern>LVIDd:\\s?(\\d+\\.?\\d*)</pattern>
+                            <new_column>LVIDd</new_column>
+                        </extract>
+                        <extract>
+                            <pattern>(\\w+\\s?\\w*)\\s+missing</pattern>
+                            <new_column>Slow</new_column>
+                        </extract>
+                    </source_column>
+                </sheet>
+                <sheet>
+                    <name>Missing</name>
+                    <source_column>
+                        <name>REPORT</name>
+                        <extract>
+                            <pattern>(\\d+)</pattern>
+                            <new_column>Number</new_column>
+                        </extract>
+                    </source_column>
+                </sheet>
+            </workbook>"""
+        )
+
+    return config_filename
+
+
+def test_estimate(estimate_config_filename):
+    runner = ParserRunner(config_filename=estimate_config_filename)
+    estimate = runner.estimate(sample_rows=300, seed=1)
+    sheet, missing = estimate["sheets"]
+    assert missing == {"sheet": "Missing", "skipped": True}
+    assert sheet["rows"] == ROWS and sheet["sample_rows"] == 300
+    assert estimate["seconds"] == sheet["seconds"] > 0
+    assert sheet["peak_memory_bytes"] > 0
+
+    #   The pattern without a literal to search for is the one to look at.
+    dominant = [rule["new_column"] for rule in sheet["rules"] if rule["dominant"]]
+    assert dominant == ["Slow"]
+
+    #   The same sample each time, & nothing written.
+    assert runner.estimate(sample_rows=300, seed=1)["output_bytes"] == pytest.approx(
+        estimate["output_bytes"], rel=0.01
+    )
+    assert not runner.report()
+
+    #   In the right ballpark of the real output.
+    runner.process()
+    output_bytes = os.path.getsize(runner.report()["outputs"][0])
+    assert output_bytes / 2 < estimate["output_bytes"] < output_bytes * 2
+
+    #   A sample as large as the sheet is the whole sheet.
+    sheet = runner.estimate(sample_rows=ROWS * 2)["sheets"][0]
+    assert sheet["sample_rows"] == ROWS
+
+    with pytest.raises(TypeError):
+        RunEstimator(sample_rows=0)
+
+
+def test_estimate_main(estimate_config_filename, capsys):
+    with pytest.raises(SystemExit) as e:
+        main(
+            ["--config", estimate_config_filename, "--estimate", "--sample-rows", "50"]
+        )
+
+    assert e.value.code == 0
+    output = capsys.readouterr().out
+    assert "Sheet 'Reports': 3,000 rows (sampled 50)" in output
+    assert "of rule time: extract Slow" in output
+
+    with pytest.raises(SystemExit) as e:
+        main(["--config", estimate_config_filename, "--estimate", "--sample-rows", "0"])
+
+    assert e.value.code == 1
+    assert format_bytes(1536) == "1.5 KB" and format_bytes(10) == "10 bytes"
+    assert format_seconds(3725) == "1h 02m" and format_seconds(200) == "3m 20s"
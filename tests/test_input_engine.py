@@ -0,0 +1,159 @@
+"""
+Module test_input_engine.py, which performs automated testing of the InputEngine class.
+"""
+import os
+import re
+import shutil
+import struct
+import zipfile
+
+import openpyxl
+import pandas
+import pytest
+
+from excelpostprocessor.excel_postprocessor import ExcelParser
+from excelpostprocessor.input_engine import InputEngine
+
+
+def _xlsb_record(record_type: int, payload: bytes) -> bytes:
+    header = bytes([(record_type & 0x7F) | 0x80, record_type >> 7])
+    return header + bytes([len(payload)]) + payload
+
+
+def _xlsb_sheet(name: str, rel_id: str) -> bytes:
+    payload = struct.pack("<II", 0, 1)
+    payload += struct.pack("<I", len(rel_id)) + rel_id.encode("utf-16-le")
+    payload += struct.pack("<I", len(name)) + name.encode("utf-16-le")
+    return _xlsb_record(0x009C, payload)
+
+
+def test_active_sheet(test_excel_filename, test_realistic_excel_filename):
+    for filename in [test_excel_filename, test_realistic_excel_filename]:
+        wb = openpyxl.load_workbook(filename)
+        expected = wb.active.title
+        wb.close()
+        assert InputEngine(filename=filename).active_sheet_name() == expected
+
+
+def test_active_sheet_xlsb(tmp_path):
+    book_view = _xlsb_record(0x0087, struct.pack("<7IB", 0, 0, 100, 100, 600, 0, 1, 0))
+    workbook_bin = (
+        book_view + _xlsb_sheet("Patients", "rId1") + _xlsb_sheet("Labs", "rId2")
+    )
+    filename = os.path.join(tmp_path, "binary.xlsb")
+
+    with zipfile.ZipFile(filename, "w") as archive:
+        archive.writestr("xl/workbook.bin", workbook_bin)
+
+    assert InputEngine(filename=filename).active_sheet_name() == "Labs"
+
+
+def test_csv_input(tmp_path, test_csv_filename):
+    #   A copy, so the output is written next to it.
+    csv_filename = os.path.join(tmp_path, "test_data.csv")
+    shutil.copyfile(test_csv_filename, csv_filename)
+    engine = InputEngine(filename=csv_filename)
+    assert engine.active_sheet_name() == "test_data"
+    assert engine.output_extension() == ".xlsx"
+
+    parser = ExcelParser(excel_filename=csv_filename)
+    extracted_data = parser.extract(
+        column_name="REPORT", pattern=r"Date of Exam:\s?(\d{1,2}/\d{1,2}/\d{4})"
+    )
+    assert extracted_data[0] == "12/25/1999"
+
+    new_filename = parser.write_to_excel()
+    assert new_filename.endswith("test_data_revised.xlsx")
+    df = pandas.read_excel(new_filename, sheet_name="test_data")
+    assert isinstance(df, pandas.DataFrame)
+    assert "REPORT" in df
+
+
+def test_input_engine_error():
+    with pytest.raises(TypeError):
+        InputEngine(filename=1979)
+
+
+def test_engine_and_dtype(test_realistic_excel_filename):
+    parser = ExcelParser(
+        excel_filename=test_realistic_excel_filename,
+        sheet_name="Patients",
+        engine="openpyxl",
+        dtype={"REPORT": "string"},
+    )
+    assert isinstance(parser.data()["REPORT"].dtype, pandas.StringDtype)
+    assert parser.data()["MRN"].dtype == "int64"
+
+    with pytest.raises(ValueError):
+        InputEngine(filename=test_realistic_excel_filename, engine="pyarrow")
+
+    with pytest.raises(TypeError):
+        InputEngine(filename=test_realistic_excel_filename, engine=1979)
+
+    with pytest.raises(TypeError):
+        ExcelParser(excel_filename=test_realistic_excel_filename, dtype="string")
+
+
+def test_calamine_engine(test_realistic_excel_filename):
+    pytest.importorskip("python_calamine")
+    reference = ExcelParser(
+        excel_filename=test_realistic_excel_filename,
+        sheet_name="Patients",
+        engine="openpyxl",
+    )
+    parser = ExcelParser(
+        excel_filename=test_realistic_excel_filename,
+        sheet_name="Patients",
+        engine="calamine",
+        dtype={"REPORT": "string"},
+    )
+    assert parser.data()["REPORT"].tolist() == reference.data()["REPORT"].tolist()
+
+
+def test_row_count(test_realistic_excel_filename, test_csv_filename):
+    engine = InputEngine(filename=test_realistic_excel_filename)
+    assert engine.row_count(sheet_name="Labs") == 4
+    assert engine.row_count(sheet_name="Missing") is None
+    assert InputEngine(filename=test_csv_filename).row_count(sheet_name="") == 4
+
+    #   Sized from the workbook's records, before reading the sheet.
+    size = engine.sheet_size(sheet_name="Labs")
+    assert (size["rows"], size["columns"]) == (4, 3) and size["text_bytes"] > 0
+    size = InputEngine(filename=test_csv_filename).sheet_size(sheet_name="")
+    assert (size["rows"], size["columns"]) == (4, 2)
+    assert size["text_bytes"] == os.path.getsize(test_csv_filename)
+
+    df = engine.read(sheet_name="Labs", rows={1, 3})
+    assert df["MRN"].tolist() == [2345, 4567]
+    #   Streamed, like a full read but for the rows left out.
+    pandas.testing.assert_frame_equal(
+        engine.read(sheet_name="Labs", rows={0, 1, 2, 3}),
+        engine.read(sheet_name="Labs"),
+    )
+    assert engine.read(sheet_name="Labs", rows={0}, dtype={"MRN": "string"})[
+        "MRN"
+    ].tolist() == ["1234"]
+
+    with pytest.raises(ValueError):
+        engine.read(sheet_name="Missing", rows={0})
+
+    df = InputEngine(filename=test_csv_filename).read(sheet_name="", rows={0})
+    assert len(df) == 1
+
+
+def test_sheet_size_missing_target(tmp_path, test_realistic_excel_filename):
+    #   A relationship without a Target leaves the size unknown rather than failing.
+    filename = os.path.join(tmp_path, "no_target.xlsx")
+
+    with zipfile.ZipFile(test_realistic_excel_filename) as source, zipfile.ZipFile(
+        filename, "w"
+    ) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+
+            if item.filename == "xl/_rels/workbook.xml.rels":
+                data = re.sub(rb' Target="[^"]*worksheets/[^"]*"', b"", data)
+
+            target.writestr(item, data)
+
+    assert InputEngine(filename=filename).sheet_size(sheet_name="Labs") is None
@@ -1,9 +1,12 @@
 """
 Module test_main.py, which performs automated testing of the ParserRunner class.
 """
+import io
 import os
+import shutil
 import pandas
 import pytest
+from excelpostprocessor.__main__ import main
 from excelpostprocessor.parser_runner import ParserRunner
 
 
@@ -168,6 +171,22 @@ def test_error_cases(
         parser.process()
 
 
+def test_engine_config(
+    test_config_filename_engine,
+    test_config_filename_engine_unknown,
+    test_labs_excel_filename,
+):
+    runner = ParserRunner(config_filename=test_config_filename_engine)
+    assert runner.process()
+
+    df = pandas.read_excel(test_labs_excel_filename, sheet_name="Labs")
+    assert df.iloc[3]["pH"] == 10.83
+
+    with pytest.raises(SyntaxError):
+        runner = ParserRunner(config_filename=test_config_filename_engine_unknown)
+        runner.process()
+
+
 def test_main(test_config_filename_ivus):
     parser = ParserRunner(config_filename=test_config_filename_ivus)
     parser.process()
@@ -191,6 +210,325 @@ def test_multiple_rules(test_config_filename_multiple_rules, test_labs_excel_fil
     assert df.iloc[3]["pH"] == 10.83
 
 
+def test_string_storage(
+    test_config_filename_string_storage, test_patients_excel_filename
+):
+    pytest.importorskip("pyarrow")
+
+    if os.path.exists(test_patients_excel_filename):
+        os.remove(test_patients_excel_filename)
+
+    runner = ParserRunner(config_filename=test_config_filename_string_storage)
+    assert runner.process()
+
+    #   The cleaned text is used for matching, but the original text is written out.
+    df = pandas.read_excel(test_patients_excel_filename, sheet_name="Patients")
+    assert df.iloc[3]["LV EF %"] == 32
+    assert "VL EF MOD" in df.iloc[3]["REPORT"]
+    assert df["Not present"].isna().all()
+
+
 def test_sheet_missing(test_config_filename_sheet_missing):
     runner = ParserRunner(config_filename=test_config_filename_sheet_missing)
     assert not runner.process()
+
+
+@pytest.mark.parametrize(
+    "new_columns, expected",
+    [
+        (
+            "<new_column>Systolic</new_column><new_column>Diastolic</new_column>",
+            ["Systolic", "Diastolic"],
+        ),
+        ('<new_column group="2">Diastolic</new_column>', ["Diastolic"]),
+        ("<new_column>Systolic</new_column>", ["Systolic"]),
+        (
+            "<new_column>Systolic</new_column><new_column>Diastolic</new_column>"
+            "<new_column>Pulse</new_column>",
+            None,
+        ),
+        ('<new_column group="rate">Rate</new_column>', None),
+        (
+            '<new_column group="1">Systolic</new_column><new_column>Diastolic</new_column>',
+            None,
+        ),
+    ],
+)
+def test_multiple_groups(tmp_path, new_columns, expected):
+    workbook = os.path.join(tmp_path, "vitals.csv")
+    pandas.DataFrame({"REPORT": ["BP 120/80", "BP 110/70"]}).to_csv(
+        workbook, index=False
+    )
+    config_filename = os.path.join(tmp_path, "vitals.xml")
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <sheet>
+                    <name>vitals</name>
+                    <source_column>
+                        <name>REPORT</name>
+                        <extract>
+                            <pattern>BP (\\d+)/(\\d+)</pattern>
+                            {new_columns}
+                        </extract>
+                    </source_column>
+                </sheet>
+            </workbook>"""
+        )
+
+    runner = ParserRunner(config_filename=config_filename)
+
+    if expected is None:
+        with pytest.raises(SyntaxError):
+            runner.process()
+
+        return
+
+    assert runner.process()
+    df = pandas.read_excel(runner.report()["outputs"][0])
+    assert list(df.columns) == expected + ["REPORT"]
+    assert df[expected[-1]].tolist()[0] in (120, 80)
+
+
+@pytest.mark.parametrize("max_matches", [None, 2, "two"])
+def test_extract_all(tmp_path, max_matches):
+    workbook = os.path.join(tmp_path, "ivus.csv")
+    pandas.DataFrame(
+        {"REPORT": ["Stenosis 40% LAD, stenosis 70% RCA", "Stenosis 20% LCX"]}
+    ).to_csv(workbook, index=False)
+    config_filename = os.path.join(tmp_path, "ivus.xml")
+    max_matches_config = (
+        "" if max_matches is None else f"<max_matches>{max_matches}</max_matches>"
+    )
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <sheet>
+                    <name>ivus</name>
+                    <source_column>
+                        <name>REPORT</name>
+                        <extract mode="all">
+                            <pattern>[Ss]tenosis (\\d+)%</pattern>
+                            <new_column>Stenosis</new_column>
+                            {max_matches_config}
+                        </extract>
+                    </source_column>
+                </sheet>
+            </workbook>"""
+        )
+
+    runner = ParserRunner(config_filename=config_filename)
+
+    if max_matches == "two":
+        with pytest.raises(SyntaxError):
+            runner.process()
+
+        return
+
+    assert runner.process()
+    output = runner.report()["outputs"][0]
+
+    if max_matches is None:
+        df = pandas.read_excel(output, sheet_name="Stenosis")
+        assert df["Stenosis"].tolist() == [40, 70, 20]
+    else:
+        df = pandas.read_excel(output)
+        assert df["Stenosis 2"].tolist()[0] == 70
+
+
+def test_write_workers(tmp_path, test_realistic_excel_filename):
+    workbook = os.path.join(tmp_path, "test_data.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, workbook)
+    config_filename = os.path.join(tmp_path, "test_data.xml")
+    sheets = "".join(
+        f"""<sheet>
+                <name>{sheet_name}</name>
+                <source_column>
+                    <name>REPORT</name>
+                    <extract>
+                        <pattern>(\\d+\\.?\\d*)</pattern>
+                        <new_column>Number</new_column>
+                    </extract>
+                </source_column>
+            </sheet>"""
+        for sheet_name in ("Patients", "Labs", "Missing")
+    )
+
+    with open(config_filename, "w") as file:
+        file.write(f"<workbook><name>{workbook}</name>{sheets}</workbook>")
+
+    runner = ParserRunner(
+        config_filename=config_filename, write_workers=2, max_pending_writes=1
+    )
+    assert not runner.process()
+    sheet_stats = runner.flush()
+    assert [stats["sheet"] for stats in sheet_stats] == ["Patients", "Labs"]
+    assert all(os.path.exists(stats["output"]) for stats in sheet_stats)
+    assert runner.report()["outputs"] == [stats["output"] for stats in sheet_stats]
+    assert [stats["sheet"] for stats in runner.report()["sheets"]] == [
+        "Patients",
+        "Labs",
+        "Missing",
+    ]
+    assert runner.flush() == []
+
+    #   A failed write is reported by flush(), not raised.
+    os.makedirs(sheet_stats[0]["output"] + ".dir")
+    os.remove(sheet_stats[0]["output"])
+    os.rename(sheet_stats[0]["output"] + ".dir", sheet_stats[0]["output"])
+    runner.process()
+    assert "error" in runner.flush()[0]
+
+    #   & the command line exits with an error, so scripts can tell outputs were lost.
+    with pytest.raises(SystemExit) as exit_info:
+        main(["--config", config_filename, "--write-workers", "2"])
+
+    assert exit_info.value.code == 1
+
+    with pytest.raises(TypeError):
+        ParserRunner(config_filename=config_filename, write_workers=-1)
+
+    with pytest.raises(TypeError):
+        ParserRunner(config_filename=config_filename, max_pending_writes=0)
+
+
+def test_process_data(
+    test_config_filename_multiple_rules, test_realistic_excel_filename
+):
+    runner = ParserRunner(config_filename=test_config_filename_multiple_rules)
+
+    with open(test_realistic_excel_filename, "rb") as file:
+        contents = file.read()
+
+    results = runner.process_data(data=contents)
+    assert list(results) == ["Labs"]
+    assert results["Labs"].iloc[3]["pH"] == "10.83"
+    assert runner.report()["outputs"] == []
+
+    df = pandas.read_excel(test_realistic_excel_filename, sheet_name="Labs")
+    from_df = runner.process_data(data={"Labs": df})
+    pandas.testing.assert_frame_equal(from_df["Labs"], results["Labs"])
+    assert runner.process_data(data={"Patients": df}) == {}
+
+    workbook = runner.process_data(data=df, as_bytes=True)["Labs"]
+    assert workbook.startswith(b"PK")
+    assert pandas.read_excel(io.BytesIO(workbook)).iloc[3]["pH"] == 10.83
+
+    with pytest.raises(TypeError):
+        runner.process_data(data=test_realistic_excel_filename)
+
+
+@pytest.mark.parametrize("rule_set", ["numbers", "missing"])
+def test_rule_sets(tmp_path, test_realistic_excel_filename, rule_set):
+    workbook = os.path.join(tmp_path, "test_data.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, workbook)
+    config_filename = os.path.join(tmp_path, "test_data.xml")
+    sheets = "".join(
+        f"""<sheet>
+                <name>{sheet_name}</name>
+                <source_column>
+                    <name>REPORT</name>
+                    <rule_set>{rule_set}</rule_set>
+                </source_column>
+            </sheet>"""
+        for sheet_name in ("Patients", "Labs")
+    )
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <rule_set>
+                    <name>numbers</name>
+                    <cleaning>
+                        <pattern>,</pattern>
+                        <replace>;</replace>
+                    </cleaning>
+                    <extract>
+                        <pattern>(\\d+\\.?\\d*)</pattern>
+                        <new_column>Number</new_column>
+                    </extract>
+                </rule_set>
+                {sheets}
+            </workbook>"""
+        )
+
+    runner = ParserRunner(config_filename=config_filename)
+
+    if rule_set == "missing":
+        with pytest.raises(SyntaxError):
+            runner.plan()
+
+        return
+
+    #   Both sheets share the rules compiled once.
+    patients, labs = runner.plan().sheets
+    assert patients.extracts[0] is labs.extracts[0]
+    assert patients.cleaning[0].replace == ";"
+    assert runner.process()
+    df = pandas.read_excel(runner.report()["outputs"][1])
+    assert list(df.columns)[-2:] == ["Number", "REPORT"]
+
+
+@pytest.mark.parametrize(
+    "row_filter, expected",
+    [
+        ("<equals>1234</equals>", [1234]),
+        ("<isin><value>1234</value><value>4567</value></isin>", [1234, 4567]),
+        ("<pattern>12/25/200[01]</pattern>", [2354, 3456]),
+        ("<equals>1234</equals><pattern>1</pattern>", SyntaxError),
+        ("", SyntaxError),
+    ],
+)
+@pytest.mark.parametrize("others", ["drop", "keep"])
+def test_row_filter(
+    tmp_path, test_realistic_excel_filename, row_filter, expected, others
+):
+    workbook = os.path.join(tmp_path, "test_data.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, workbook)
+    config_filename = os.path.join(tmp_path, "test_data.xml")
+    column = "REPORT" if "pattern" in row_filter else "MRN"
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <sheet>
+                    <name>Patients</name>
+                    <filter others="{others}">
+                        <column>{column}</column>
+                        {row_filter}
+                    </filter>
+                    <source_column>
+                        <name>REPORT</name>
+                        <extract>
+                            <pattern>EF MOD BP: (\\d+)%</pattern>
+                            <new_column>EF</new_column>
+                        </extract>
+                    </source_column>
+                </sheet>
+            </workbook>"""
+        )
+
+    runner = ParserRunner(config_filename=config_filename)
+
+    if expected is SyntaxError:
+        with pytest.raises(SyntaxError):
+            runner.plan()
+
+        return
+
+    assert runner.process()
+    df = pandas.read_excel(runner.report()["outputs"][0])
+    source = pandas.read_excel(workbook, sheet_name="Patients")
+
+    if others == "drop":
+        assert df["MRN"].tolist() == expected
+    else:
+        #   The other rows are passed through, in place, with nothing extracted.
+        assert df["MRN"].tolist() == source["MRN"].tolist()
+        assert df.loc[df["EF"].notna(), "MRN"].tolist() == expected
@@ -0,0 +1,166 @@
+"""
+Module test_memory_planner.py, which performs automated testing of the MemoryPlanner class & --memory-budget.
+"""
+import os
+
+import pandas
+import pytest
+
+from excelpostprocessor.__main__ import main
+from excelpostprocessor.memory_planner import (
+    MIN_CHUNK_ROWS,
+    MemoryPlanner,
+    parse_size,
+)
+from excelpostprocessor.parser_runner import ParserRunner
+
+ROWS = 3000
+
+
+@pytest.fixture(name="budget_config_filename")
+def fixture_budget_config_filename(tmp_path) -> str:
+    workbook = os.path.join(tmp_path, "reports.xlsx")
+    pandas.DataFrame(
+        {
+            "MRN": range(ROWS),
+            "REPORT": [
+                f"LVIDd: {row % 7}.{row % 10} cm " + "word " * (row % 40)
+                for row in range(ROWS)
+            ],
+        }
+    ).to_excel(workbook, sheet_name="Reports", index=False)
+    config_filename = os.path.join(tmp_path, "reports.xml")
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <sheet>
+                    <name>Reports</name>
+                    <source_column>
+                        <name>REPORT</name>
+                        <cleaning>
+                            <pattern>word</pattern>
+                            <replace>w</replace>
+                        </cleaning>
+                        <extract>
+                            <pattern>LVIDd:\\s?(\\d+\\.?\\d*)</pattern>
+                            <new_column>LVIDd</new_column>
+                        </extract>
+                    </source_column>
+                </sheet>
+            </workbook>"""
+        )
+
+    return config_filename
+
+
+def test_plan_sheet(budget_config_filename):
+    plan = ParserRunner(config_filename=budget_config_filename).plan()
+    sheet_plan = plan.sheets[0]
+
+    def decide(budget_bytes: int) -> tuple:
+        return MemoryPlanner(budget_bytes=budget_bytes).plan_sheet(
+            plan=plan, sheet_plan=sheet_plan, source_file=plan.source_filename
+        )
+
+    load_plan, decision = decide(budget_bytes=parse_size("8G"))
+    assert decision["mode"] == "in_memory"
+    assert (decision["rows"], decision["columns"]) == (ROWS, 2)
+    assert load_plan == plan
+
+    #   Just too little for the whole sheet: the rules run in chunks.
+    load_plan, decision = decide(budget_bytes=decision["estimated_bytes"] - 1)
+    assert decision["mode"] == "chunked"
+    assert MIN_CHUNK_ROWS <= load_plan.chunk_rows == decision["chunk_rows"] < ROWS
+    assert not load_plan.spill
+
+    #   Enough to read the sheet, but not for the rules' copies: streamed.
+    read_bytes = decision["read_bytes"]
+    load_plan, decision = decide(budget_bytes=read_bytes)
+    assert (decision["mode"], decision["fits"]) == ("streaming", True)
+    assert decision["estimated_bytes"] == read_bytes
+    assert load_plan.spill and MIN_CHUNK_ROWS <= load_plan.chunk_rows < ROWS
+
+    #   Too little to even read the sheet, which streaming does whole too.
+    load_plan, decision = decide(budget_bytes=read_bytes - 1)
+    assert (decision["mode"], decision["fits"]) == ("streaming", False)
+    assert decision["estimated_bytes"] >= read_bytes
+
+    #   Chunking the config asks for is kept.
+    _, decision = MemoryPlanner(budget_bytes=parse_size("8G")).plan_sheet(
+        plan=plan._replace(chunk_rows=10),
+        sheet_plan=sheet_plan,
+        source_file=plan.source_filename,
+    )
+    assert (decision["mode"], decision["chunk_rows"]) == ("in_memory", 10)
+
+    #   Nothing recorded to go on.
+    _, decision = MemoryPlanner(budget_bytes=1).plan_sheet(
+        plan=plan,
+        sheet_plan=sheet_plan._replace(name="Missing"),
+        source_file=plan.source_filename,
+    )
+    assert decision["mode"] == "in_memory" and decision["estimated_bytes"] is None
+    assert decision["fits"] is None
+
+    with pytest.raises(TypeError):
+        MemoryPlanner(budget_bytes="8G")
+
+
+def test_memory_budget(budget_config_filename):
+    pytest.importorskip("pyarrow")
+    expected_runner = ParserRunner(config_filename=budget_config_filename)
+    expected_runner.process()
+    output = expected_runner.report()["outputs"][0]
+    expected = pandas.read_excel(output)
+    os.remove(output)
+
+    plan = expected_runner.plan()
+    _, decision = MemoryPlanner(budget_bytes=1).plan_sheet(
+        plan=plan, sheet_plan=plan.sheets[0], source_file=plan.source_filename
+    )
+    runner = ParserRunner(
+        config_filename=budget_config_filename, memory_budget=decision["read_bytes"]
+    )
+    assert runner.process()
+    sheet_stats = runner.report()["sheets"][0]
+    assert sheet_stats["memory"]["mode"] == "streaming"
+    assert sheet_stats["memory"]["budget_bytes"] == decision["read_bytes"]
+    pandas.testing.assert_frame_equal(pandas.read_excel(output), expected)
+
+    #   Skipped, not run out of memory.
+    os.remove(output)
+    runner = ParserRunner(config_filename=budget_config_filename, memory_budget=1)
+    assert not runner.process()
+    sheet_stats = runner.report()["sheets"][0]
+    assert sheet_stats["skipped"] and sheet_stats["memory"]["fits"] is False
+    assert not os.path.exists(output)
+
+    main(["--config", budget_config_filename, "--memory-budget", "1.5GB"])
+    pandas.testing.assert_frame_equal(pandas.read_excel(output), expected)
+
+    with pytest.raises(SystemExit):
+        main(["--config", budget_config_filename, "--memory-budget", "lots"])
+
+    with pytest.raises(TypeError):
+        ParserRunner(config_filename=budget_config_filename, memory_budget=-1)
+
+
+@pytest.mark.parametrize(
+    "text, size",
+    [
+        ("1000", 1000),
+        ("8G", 8 * 1024**3),
+        ("512 MB", 512 * 1024**2),
+        ("1.5kib", 1536),
+    ],
+)
+def test_parse_size(text, size):
+    assert parse_size(text) == size
+
+
+@pytest.mark.parametrize("text", ["", "eight", "0", "-1G", "8X"])
+def test_parse_size_errors(text):
+    with pytest.raises(ValueError):
+        parse_size(text)
@@ -2,10 +2,13 @@
 Module test_parser.py, which performs automated testing of the ExcelParser class.
 """
 from numpy import isnan
+import io
+import openpyxl
 import os.path
 import pandas
 import pytest
-from excelpostprocessor.excel_postprocessor import ExcelParser
+import warnings
+from excelpostprocessor.excel_postprocessor import MAX_COLUMN_WIDTH, ExcelParser
 
 
 def test_parser(test_excel_filename):
@@ -235,3 +238,326 @@ def test_parser_writing(test_excel_filename, test_revised_excel_filename):
     assert isinstance(df, pandas.DataFrame)
     assert "Date" in df
     assert "Air temp" in df
+
+
+def test_parser_string_storage(test_realistic_excel_filename):
+    pytest.importorskip("pyarrow")
+    parser = ExcelParser(
+        excel_filename=test_realistic_excel_filename,
+        sheet_name="Patients",
+        string_storage="pyarrow",
+    )
+    df = parser.data()
+    assert df["REPORT"].dtype == pandas.StringDtype(storage="pyarrow")
+    assert df["MRN"].dtype == "int64"
+
+    parser.extract_into_new_column(
+        column_name="REPORT", pattern=r"LVIDd:\s?(\d+\.?\d*)\s?cm", new_column="LVIDd"
+    )
+    assert parser.data()["LVIDd"].dtype == pandas.StringDtype(storage="pyarrow")
+
+    with pytest.raises(ValueError):
+        ExcelParser(excel_filename=test_realistic_excel_filename, string_storage="C")
+
+
+@pytest.mark.parametrize("string_storage", [None, "pyarrow"])
+def test_parser_chunk_rows(test_realistic_excel_filename, string_storage):
+    if string_storage:
+        pytest.importorskip("pyarrow")
+
+    parsers = [
+        ExcelParser(
+            excel_filename=test_realistic_excel_filename,
+            sheet_name="Patients",
+            string_storage=string_storage,
+            chunk_rows=chunk_rows,
+        )
+        for chunk_rows in (None, 1, 3)
+    ]
+
+    for parser in parsers:
+        parser.clean_column(
+            column_name="REPORT", pattern="VL EF MOD", replace=r"\(LV EF MOD"
+        )
+        parser.extract_into_new_column(
+            column_name="REPORT",
+            pattern=[r"LV EF MOD BP:\s?(\d+\.?\d*)\s?%", r"Not present: (\d+)"],
+            new_column="LV EF %",
+        )
+
+    #   Working a few rows at a time gives the same answers.
+    expected = parsers[0].data()
+
+    for parser in parsers[1:]:
+        pandas.testing.assert_frame_equal(parser.data(), expected)
+
+    with pytest.raises(TypeError):
+        ExcelParser(excel_filename=test_realistic_excel_filename, chunk_rows=0)
+
+
+def test_parser_one_row(tmp_path):
+    filename = os.path.join(tmp_path, "one_row.csv")
+    pandas.DataFrame({"REPORT": ["LVIDd: 1.23 cm"]}).to_csv(filename, index=False)
+    parser = ExcelParser(excel_filename=filename)
+    assert parser.extract(
+        column_name="REPORT", pattern=r"LVIDd:\s?(\d+\.?\d*)\s?cm"
+    ) == ["1.23"]
+    parser.extract_into_new_column(
+        column_name="REPORT", pattern=r"LVIDd:\s?(\d+\.?\d*)\s?cm", new_column="LVIDd"
+    )
+    assert parser.data()["LVIDd"].tolist() == ["1.23"]
+
+
+def test_parser_groups(tmp_path):
+    filename = os.path.join(tmp_path, "vitals.csv")
+    pandas.DataFrame(
+        {"REPORT": ["BP 120/80 HR 72", "BP 110/70", "nothing", "HR 60 BP 130/85"]}
+    ).to_csv(filename, index=False)
+    parser = ExcelParser(excel_filename=filename)
+
+    #   Several groups, named in order.
+    pattern = r"BP (\d+)/(\d+)"
+    assert parser.extract(column_name="REPORT", pattern=pattern)[0] == ("120", "80")
+    parser.extract_into_new_column(
+        column_name="REPORT", pattern=pattern, new_column=["Systolic", "Diastolic"]
+    )
+
+    #   Named groups, by name or number.
+    parser.extract_into_new_column(
+        column_name="REPORT",
+        pattern=[r"BP \d+/\d+ HR (?P<rate>\d+)", r"HR (?P<rate>\d+) BP"],
+        new_column={"rate": "Heart rate"},
+    )
+    parser.extract_into_new_column(
+        column_name="REPORT", pattern=pattern, new_column={2: "Diastolic again"}
+    )
+    df = parser.data()
+    assert list(df.columns) == [
+        "Systolic",
+        "Diastolic",
+        "Heart rate",
+        "Diastolic again",
+        "REPORT",
+    ]
+    assert df["Systolic"].tolist()[:2] == ["120", "110"]
+    assert df["Heart rate"].tolist()[0] == "72"
+    assert df["Heart rate"].tolist()[3] == "60"
+    assert df["Diastolic again"].equals(df["Diastolic"].rename("Diastolic again"))
+
+    with pytest.raises(ValueError):
+        parser.extract_into_new_column(
+            column_name="REPORT", pattern=pattern, new_column=["Systolic"]
+        )
+
+    with pytest.raises(ValueError):
+        parser.extract_into_new_column(
+            column_name="REPORT", pattern=pattern, new_column={"rate": "Rate"}
+        )
+
+    with pytest.raises(TypeError):
+        parser.extract_into_new_column(
+            column_name="REPORT", pattern=pattern, new_column=["Systolic", 2]
+        )
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 1])
+def test_parser_extract_all(tmp_path, chunk_rows):
+    filename = os.path.join(tmp_path, "ivus.csv")
+    pandas.DataFrame(
+        {
+            "REPORT": [
+                "Stenosis 40% LAD, stenosis 70% RCA",
+                "No stenosis",
+                "Stenosis 20% LCX",
+            ]
+        }
+    ).to_csv(filename, index=False)
+    pattern = r"[Ss]tenosis (\d+)% (\w+)"
+    new_column = ["Stenosis %", "Segment"]
+
+    #   Wide: a fixed number of numbered columns.
+    parser = ExcelParser(excel_filename=filename, chunk_rows=chunk_rows)
+    parser.extract_all(
+        column_name="REPORT", pattern=pattern, new_column=new_column, max_matches=3
+    )
+    df = parser.data()
+    assert list(df.columns)[:4] == [
+        "Stenosis % 1",
+        "Segment 1",
+        "Stenosis % 2",
+        "Segment 2",
+    ]
+    assert df.columns[-1] == "REPORT"
+    assert df["Segment 2"].tolist()[0] == "RCA"
+    assert df["Stenosis % 1"].isna().tolist() == [False, True, False]
+    assert df["Stenosis % 3"].isna().all()
+
+    #   Long: one row per match in a side sheet, keyed by spreadsheet row.
+    parser = ExcelParser(excel_filename=filename, chunk_rows=chunk_rows)
+    parser.extract_all(column_name="REPORT", pattern=pattern, new_column=new_column)
+    side_data = parser.side_sheets()["Stenosis %"]
+    assert side_data["Row"].tolist() == [2, 2, 4]
+    assert side_data["Match"].tolist() == [1, 2, 1]
+    assert side_data["Segment"].tolist() == ["LAD", "RCA", "LCX"]
+
+    new_file_name = os.path.join(tmp_path, "ivus_revised.xlsx")
+    parser.write_to_excel(new_file_name=new_file_name)
+    side_sheet = pandas.read_excel(new_file_name, sheet_name="Stenosis %")
+    assert side_sheet["Stenosis %"].tolist() == [40, 70, 20]
+
+    with pytest.raises(TypeError):
+        parser.extract_all(
+            column_name="REPORT", pattern=pattern, new_column=new_column, max_matches=0
+        )
+
+
+def test_parser_in_memory(test_realistic_excel_filename):
+    expected = ExcelParser(
+        excel_filename=test_realistic_excel_filename, sheet_name="Patients"
+    )
+    expected.extract_into_new_column(
+        column_name="REPORT", pattern=r"(\d+\.?\d*)", new_column="Number"
+    )
+
+    with open(test_realistic_excel_filename, "rb") as file:
+        contents = file.read()
+
+    with open(test_realistic_excel_filename, "rb") as file:
+        parsers = [
+            ExcelParser.from_bytes(data=contents, sheet_name="Patients"),
+            ExcelParser.from_bytes(data=file, sheet_name="Patients"),
+            ExcelParser.from_dataframe(
+                df=pandas.read_excel(
+                    test_realistic_excel_filename, sheet_name="Patients"
+                ),
+                sheet_name="Patients",
+            ),
+        ]
+
+    for parser in parsers:
+        parser.extract_into_new_column(
+            column_name="REPORT", pattern=r"(\d+\.?\d*)", new_column="Number"
+        )
+        pandas.testing.assert_frame_equal(parser.data(), expected.data())
+
+    #   The results come back as an .xlsx workbook's contents, as write_to_excel would save them.
+    written = ExcelParser.from_bytes(data=parsers[2].to_bytes()).data()
+    assert list(written.columns) == list(expected.data().columns)
+    assert written["REPORT"].tolist() == expected.data()["REPORT"].tolist()
+
+    #   The caller's DataFrame is left alone.
+    df = pandas.DataFrame({"REPORT": ["pH 7"]})
+    ExcelParser.from_dataframe(df=df).clean_column(
+        column_name="REPORT", pattern="pH", replace=""
+    )
+    assert df["REPORT"].tolist() == ["pH 7"]
+
+    with pytest.raises(TypeError):
+        ExcelParser.from_bytes(data="not bytes")
+
+    with pytest.raises(TypeError):
+        ExcelParser.from_dataframe(df={"REPORT": []})
+
+
+def test_filter_rows():
+    df = pandas.DataFrame(
+        {
+            "Type": ["Echo", "Labs", "Echo", None],
+            "REPORT": ["EF 55", "pH 7 and 8", "EF 60", "EF 65"],
+        }
+    )
+    parser = ExcelParser.from_dataframe(df=df)
+    assert parser.filter_rows(column_name="Type", equals="Echo") == 2
+    assert parser.data()["REPORT"].tolist() == ["EF 55", "EF 60"]
+
+    #   Rows set aside come back in their places, with the new columns empty.
+    parser = ExcelParser.from_dataframe(df=df)
+    assert parser.filter_rows(column_name="Type", values=["Labs"], keep_others=True)
+    parser.extract_into_new_column(
+        column_name="REPORT", pattern=r"(\d+)", new_column="Number"
+    )
+    parser.extract_all(column_name="REPORT", pattern=r"(\d+)", new_column="Number")
+    parser.rejoin_rows()
+    assert parser.data()["REPORT"].tolist() == df["REPORT"].tolist()
+    assert parser.data()["Number"].isna().tolist() == [True, False, True, True]
+
+    #   Row numbers in side sheets still count from the top of the whole sheet.
+    assert parser.side_sheets()["Number"]["Row"].tolist() == [3, 3]
+
+    parser = ExcelParser.from_dataframe(df=df)
+    assert parser.filter_rows(column_name="REPORT", pattern=r"^EF [56]") == 3
+
+    with pytest.raises(TypeError):
+        parser.filter_rows(column_name="Type", equals="Echo", pattern="E")
+
+    with pytest.raises(AttributeError):
+        parser.filter_rows(column_name="Missing", equals="Echo")
+
+
+def test_parser_wide_frame():
+    df = pandas.DataFrame({f"Column {i}": range(50) for i in range(150)})
+    df["REPORT"] = [f"EF {i}% TAPSE {i % 7} mm" for i in range(50)]
+    parser = ExcelParser.from_dataframe(df=df)
+
+    #   The new columns are built into the frame together, not one at a time,
+    #   so pandas doesn't warn of a fragmented frame.
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+
+        for rule in range(120):
+            parser.clean_column(column_name="REPORT", pattern="TAPSE", replace="T")
+            assert parser.extract(column_name="REPORT", pattern=r"(T) \d")[0] == "T"
+            parser.extract_into_new_column(
+                column_name="REPORT", pattern=r"EF (\d+)%", new_column=f"EF {rule}"
+            )
+
+        parser.extract_into_new_column(
+            column_name="REPORT", pattern=r"EF (\d+)%", new_column="EF 0"
+        )
+        parser.restore_original_column(column_name="REPORT")
+        data = parser.data()
+
+    assert list(data.columns) == list(df.columns[:-1]) + [
+        f"EF {rule}" for rule in range(120)
+    ] + ["REPORT"]
+    assert data["EF 119"].tolist() == [str(i) for i in range(50)]
+    assert data["REPORT"].tolist() == df["REPORT"].tolist()
+    assert data["Column 149"].tolist() == list(range(50))
+
+    #   A column that isn't lined up with the rows is refused, rather than shifting them.
+    parser._ExcelParser__set_column(
+        column_name="Shifted", column=pandas.Series(range(50), index=range(1, 51))
+    )
+
+    with pytest.raises(ValueError):
+        parser.data()
+
+
+def test_parser_output_format():
+    df = pandas.DataFrame(
+        {
+            "MRN": range(3000),
+            "REPORT": [f"EF {i % 90}% " + "normal " * 20 for i in range(3000)],
+        }
+    )
+    parser = ExcelParser.from_dataframe(df=df, sheet_name="Echo")
+    parser.extract_into_new_column(
+        column_name="REPORT", pattern=r"EF (\d+)%", new_column="Ejection fraction"
+    )
+    parser.extract_all(column_name="REPORT", pattern=r"(\d+)", new_column="Number")
+    wb_obj = openpyxl.load_workbook(io.BytesIO(parser.to_bytes()))
+
+    for sheet, rows in ((wb_obj["Echo"], 3000), (wb_obj["Number"], 3000)):
+        assert sheet.freeze_panes == "A2"
+        assert sheet.auto_filter.ref.endswith(str(rows + 1))
+        assert all(cell.font.b for cell in sheet[1])
+
+    sheet = wb_obj["Echo"]
+    assert sheet.auto_filter.ref == "A1:C3001"
+
+    #   Wide enough for the header, & the long reports capped.
+    widths = {
+        column: sheet.column_dimensions[column].width for column in ("A", "B", "C")
+    }
+    assert widths["B"] >= len("Ejection fraction")
+    assert widths["A"] < widths["B"] < widths["C"] == MAX_COLUMN_WIDTH
@@ -0,0 +1,113 @@
+"""
+Module test_pipeline.py, which performs automated testing of the PipelineRunner class.
+"""
+import os
+import shutil
+
+import openpyxl
+import pytest
+
+from excelpostprocessor.__main__ import main
+from excelpostprocessor.excel_postprocessor import ExcelParser
+from excelpostprocessor.parser_runner import ParserRunner
+from excelpostprocessor.pipeline import PipelineRunner
+
+
+@pytest.fixture(name="workbook_copies")
+def fixture_workbook_copies(tmp_path, test_realistic_excel_filename) -> list:
+    filenames = []
+
+    for index in range(3):
+        filename = os.path.join(tmp_path, f"incoming{index}.xlsx")
+        shutil.copyfile(test_realistic_excel_filename, filename)
+        filenames.append(filename)
+
+    return filenames
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_pipeline(test_config_filename, workbook_copies, use_processes):
+    jobs = [(test_config_filename, filename) for filename in workbook_copies]
+    jobs.append(("not there.xml", None))
+    runner = PipelineRunner(
+        compute_workers=2, queue_size=1, use_processes=use_processes
+    )
+    results = runner.run(jobs=jobs)
+    assert len(results) == 4
+
+    for filename, result in zip(workbook_copies, results):
+        assert result["success"]
+        assert result["outputs"] == [filename.replace(".xlsx", "_Patients.xlsx")]
+        assert result["sheets"][0]["rows"] == 4
+        assert "compute_seconds" in result["sheets"][0]
+
+    #   A bad job doesn't stop the others.
+    assert not results[3]["success"]
+    assert "FileExistsError" in results[3]["error"]
+
+
+def test_pipeline_matches_runner(tmp_path, test_config_filename, workbook_copies):
+    #   The pipeline & the one-at-a-time runner produce the same workbook.
+    expected_filename = os.path.join(tmp_path, "serial.xlsx")
+    shutil.copyfile(workbook_copies[0], expected_filename)
+    ParserRunner(config_filename=test_config_filename).process(
+        source_filename=expected_filename
+    )
+    result = PipelineRunner(use_processes=False).run(
+        jobs=[(test_config_filename, workbook_copies[0])]
+    )[0]
+
+    def cells(filename: str) -> list:
+        sheet = openpyxl.load_workbook(filename).active
+        return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+    assert cells(result["outputs"][0]) == cells(
+        expected_filename.replace(".xlsx", "_Patients.xlsx")
+    )
+
+
+def test_pipeline_compute_error(monkeypatch, test_config_filename, workbook_copies):
+    #   A sheet whose rules fail is still closed, so its column store's files go.
+    closed = []
+
+    def fail(excel_parser, sheet_plan):
+        raise RuntimeError("rules failed")
+
+    monkeypatch.setattr(ParserRunner, "apply_rules", staticmethod(fail))
+    monkeypatch.setattr(ExcelParser, "close", lambda self: closed.append(self))
+    results = PipelineRunner(use_processes=False).run(
+        jobs=[(test_config_filename, filename) for filename in workbook_copies]
+    )
+    assert all("rules failed" in result["error"] for result in results)
+    assert len(closed) == len(workbook_copies)
+
+
+def test_pipeline_errors():
+    with pytest.raises(TypeError):
+        PipelineRunner(read_workers=0)
+
+    with pytest.raises(TypeError):
+        PipelineRunner().run(jobs="jobs")
+
+
+def test_main_workbooks(test_config_filename, workbook_copies):
+    argv = ["--config", test_config_filename]
+
+    for filename in workbook_copies:
+        argv.extend(["--workbook", filename])
+
+    main(argv)
+
+    for filename in workbook_copies:
+        assert os.path.exists(filename.replace(".xlsx", "_Patients.xlsx"))
+
+    #   A workbook that fails makes the run fail.
+    with pytest.raises(SystemExit) as exit_info:
+        main(argv + ["--workbook", "not there.xlsx"])
+
+    assert exit_info.value.code == 1
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(argv + ["--resume", "--memory-budget", "8G"])
+
+    assert exit_info.value.code == 2
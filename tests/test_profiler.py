@@ -0,0 +1,108 @@
+"""
+Module test_profiler.py, which performs automated testing of the RuleProfiler class,
+pattern_hotspots & --profile.
+"""
+import json
+import os
+
+import pandas
+import pytest
+
+from excelpostprocessor.__main__ import main
+from excelpostprocessor.parser_runner import ParserRunner
+from excelpostprocessor.plan import CleaningRule, ExtractRule, SheetPlan
+from excelpostprocessor.profiler import LATENCY_BUCKETS, RuleProfiler, pattern_hotspots
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        (r"Date of Exam: (\d{1,2}/\d{1,2}/\d{4})", []),
+        (r"(\d{2})+", []),
+        (r"(\w+\s?)+x", ["nested_quantifier"]),
+        (r"(?:a|ab)+c", ["quantified_alternation"]),
+        (r"(\d+\s?\d*)", ["adjacent_quantifiers"]),
+        (r"(.*)Impression", ["leading_dot_star"]),
+        (r"^.*Impression", []),
+        (r".*\s+(\d+)", ["adjacent_quantifiers", "leading_dot_star"]),
+        ("(", []),
+    ],
+)
+def test_pattern_hotspots(pattern, expected):
+    assert pattern_hotspots(pattern=pattern) == expected
+
+
+def test_pattern_hotspots_before_3_11(monkeypatch):
+    #   Python 3.7-3.10 have no possessive quantifiers or atomic groups.
+    monkeypatch.setattr("excelpostprocessor.profiler.POSSESSIVE_REPEAT", None)
+    monkeypatch.setattr("excelpostprocessor.profiler.ATOMIC_GROUP", None)
+    assert pattern_hotspots(r"EF:\s?(\d+)%") == []
+    assert pattern_hotspots(r"(?=x)(\w+\s?)+x") == ["nested_quantifier"]
+    assert pattern_hotspots(r"(a)?(?(1)b|c)\d+\d*") == ["adjacent_quantifiers"]
+
+
+def test_profile_sheet():
+    source = pandas.Series(
+        ["EF 55%", None, "a" * 18 + "!", "EF 60% EF 65%", 7], name="REPORT"
+    )
+    sheet_plan = SheetPlan(
+        name="Echo",
+        column_name="REPORT",
+        dtype=None,
+        cleaning=(CleaningRule(pattern="%", replace=" percent"),),
+        extracts=(
+            ExtractRule(pattern=[r"EF (\d+) percent", r"(a+)+$"], new_column="EF"),
+            ExtractRule(pattern=r"EF (\d+)", new_column="Every EF", mode="all"),
+        ),
+    )
+    profile = RuleProfiler(slowest_rows=2).profile_sheet(
+        source=source, sheet_plan=sheet_plan
+    )
+    assert profile["rows"] == 5
+    cleaning, first, backtracking, every = profile["patterns"]
+    assert cleaning["matches"] == 2 and cleaning["rule"] == "cleaning"
+
+    #   Extracts see the cleaned text.
+    assert first["matches"] == 2 and first["alternative"] == 1
+    assert every["matches"] == 2 and every["alternative"] is None
+
+    #   The row that makes '(a+)+$' backtrack is singled out, by its spreadsheet row.
+    assert backtracking["hotspots"] == ["nested_quantifier"]
+    assert backtracking["slowest_rows"][0]["row"] == 4
+    assert profile["slowest_rows"][0]["row"] == 4
+    assert len(backtracking["slowest_rows"]) == 2
+
+    for pattern in profile["patterns"]:
+        assert len(pattern["histogram"]) == len(LATENCY_BUCKETS) + 1
+        assert sum(bucket["rows"] for bucket in pattern["histogram"]) == 5
+
+    assert profile["seconds"] == pytest.approx(
+        sum(pattern["seconds"] for pattern in profile["patterns"])
+    )
+
+    with pytest.raises(TypeError):
+        RuleProfiler(slowest_rows=0)
+
+
+def test_profile_main(tmp_path, test_config_filename):
+    profile = ParserRunner(config_filename=test_config_filename).profile()
+    seconds = [pattern["seconds"] for pattern in profile["slowest_patterns"]]
+    assert seconds == sorted(seconds, reverse=True)
+    assert profile["version"] == 1
+
+    report_filename = os.path.join(tmp_path, "profile.json")
+
+    with pytest.raises(SystemExit) as e:
+        main(["--config", test_config_filename, "--profile", report_filename])
+
+    assert e.value.code == 0
+
+    with open(report_filename) as file:
+        report = json.load(file)
+
+    assert [sheet["sheet"] for sheet in report["sheets"]] == [
+        sheet["sheet"] for sheet in profile["sheets"]
+    ]
+    assert {"pattern", "seconds", "histogram", "slowest_rows", "hotspots"} <= set(
+        report["slowest_patterns"][0]
+    )
@@ -0,0 +1,115 @@
+"""
+Module test_service.py, which performs automated testing of the ParserService class.
+"""
+import json
+import os
+import shutil
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+from excelpostprocessor.__main__ import main
+from excelpostprocessor.service import ParserService, run_job
+
+
+@pytest.fixture(name="workbook_copy")
+def fixture_workbook_copy(tmp_path, test_realistic_excel_filename) -> str:
+    filename = os.path.join(tmp_path, "incoming.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, filename)
+    return filename
+
+
+def test_run_job(test_config_filename, workbook_copy):
+    result = run_job(
+        config_filename=test_config_filename, source_filename=workbook_copy
+    )
+    assert result["success"]
+    assert result["outputs"] == [workbook_copy.replace(".xlsx", "_Patients.xlsx")]
+    assert os.path.exists(result["outputs"][0])
+    assert result["sheets"][0]["rows"] == 4
+
+    #   Errors are reported, not raised.
+    result = run_job(config_filename="not there.xml")
+    assert not result["success"]
+    assert "FileExistsError" in result["error"]
+
+
+def test_spool(tmp_path, test_config_filename, workbook_copy):
+    spool_directory = os.path.join(tmp_path, "spool")
+    os.makedirs(spool_directory)
+
+    with open(os.path.join(spool_directory, "job1.json"), "w") as file:
+        json.dump({"config": test_config_filename, "workbook": workbook_copy}, file)
+
+    with open(os.path.join(spool_directory, "job2.json"), "w") as file:
+        file.write("not json")
+
+    service = ParserService(workers=2)
+    service.serve_spool(spool_directory=spool_directory, poll_seconds=0.01, max_polls=1)
+    service.close()
+
+    with open(os.path.join(spool_directory, "job1.result.json")) as file:
+        result = json.load(file)
+
+    assert result["success"]
+    assert os.path.exists(result["outputs"][0])
+    assert os.path.exists(os.path.join(spool_directory, "done", "job1.json"))
+
+    with open(os.path.join(spool_directory, "job2.result.json")) as file:
+        assert not json.load(file)["success"]
+
+
+def test_socket(test_config_filename, workbook_copy):
+    service = ParserService(workers=1)
+    thread = threading.Thread(target=service.serve_socket, kwargs={"port": 0})
+    thread.start()
+
+    while service.address() is None:
+        time.sleep(0.01)
+
+    with socket.create_connection(service.address()) as connection:
+        stream = connection.makefile("rwb")
+        job = {"config": test_config_filename, "workbook": workbook_copy}
+        stream.write((json.dumps(job) + "\n").encode("utf-8"))
+        stream.flush()
+        result = json.loads(stream.readline())
+
+    service.close()
+    thread.join()
+    assert result["success"]
+    assert os.path.exists(result["outputs"][0])
+
+    #   The stdlib's server class is left as it was.
+    assert not socketserver.ThreadingTCPServer.allow_reuse_address
+
+
+def test_service_error(tmp_path):
+    with pytest.raises(TypeError):
+        ParserService(workers=0)
+
+    service = ParserService()
+
+    with pytest.raises(TypeError):
+        service.submit(config_filename=1979)
+
+    with pytest.raises(FileNotFoundError):
+        service.serve_spool(spool_directory=os.path.join(tmp_path, "not there"))
+
+    service.close()
+
+
+def test_main_help(capsys):
+    with pytest.raises(SystemExit):
+        main([])
+
+    assert "--serve" in capsys.readouterr().out
+
+    #   Options the mode would ignore are refused.
+    with pytest.raises(SystemExit) as exit_info:
+        main(["--serve", "--config-cache", "cache"])
+
+    assert exit_info.value.code == 2
+    assert "--config-cache" in capsys.readouterr().err
@@ -0,0 +1,182 @@
+"""
+Module test_shared_columns.py, which performs automated testing of the SharedColumns class
+& the rules running on rows shared with worker processes.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import shutil
+import sys
+
+import pandas
+import pytest
+
+from excelpostprocessor.excel_postprocessor import ExcelParser
+from excelpostprocessor.parser_runner import ParserRunner
+from excelpostprocessor.plan import ExtractRule, SheetPlan
+from excelpostprocessor.shared_columns import SharedColumns, read_rows
+
+
+def test_shared_columns():
+    df = pandas.DataFrame({"text": ["a", None, "ünïcode", "", "last"], "n": range(5)})
+
+    with SharedColumns(df=df, column_names=["text"]) as shared:
+        handles = shared.handles()
+        assert list(handles) == ["text"]
+        rows = read_rows(shared_column=handles["text"], start=1, stop=10)
+
+    assert list(rows.index) == [1, 2, 3, 4]
+    assert pandas.isna(rows[1])
+    assert rows.tolist()[1:] == ["ünïcode", "", "last"]
+    assert rows.dtype == df["text"].dtype
+
+    with pytest.raises(TypeError):
+        SharedColumns(df=df, column_names="text")
+
+
+def test_shared_columns_tracking(monkeypatch):
+    df = pandas.DataFrame({"text": ["a", "b"]})
+    registered = []
+    unregistered = []
+
+    with SharedColumns(df=df, column_names=["text"]) as shared:
+        handle = shared.handles()["text"]
+
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+
+            monkeypatch.setattr(
+                resource_tracker,
+                "register",
+                lambda name, rtype: registered.append(name),
+            )
+            monkeypatch.setattr(
+                resource_tracker,
+                "unregister",
+                lambda name, rtype: unregistered.append(name),
+            )
+
+        #   The publisher (& the workers it starts) share its tracker: its registration stands.
+        read_rows(shared_column=handle, start=0, stop=2)
+        assert unregistered == []
+
+        #   Any other reader hands the blocks straight back to the tracker it registered them with.
+        registered.clear()
+        read_rows(shared_column=handle._replace(owner_pid=-1), start=0, stop=2)
+        assert sorted(unregistered) == sorted(registered)
+        assert len(registered) == (
+            2 if os.name == "posix" and sys.version_info < (3, 13) else 0
+        )
+
+        monkeypatch.undo()
+
+    #   Before Python 3.8, there's no shared memory: a clear error, not a failed import.
+    monkeypatch.delattr(multiprocessing, "shared_memory", raising=False)
+    monkeypatch.setitem(sys.modules, "multiprocessing.shared_memory", None)
+
+    with pytest.raises(RuntimeError):
+        SharedColumns(df=df, column_names=["text"])
+
+
+def test_apply_rules_shared(test_realistic_excel_filename):
+    sheet_plan = SheetPlan(
+        name="Labs",
+        column_name="REPORT",
+        dtype=None,
+        cleaning=(),
+        extracts=(
+            ExtractRule(pattern=r"pH: ?(\d+\.?\d*)", new_column="pH"),
+            ExtractRule(pattern=r"(\d+\.?\d*)", new_column="Number", mode="all"),
+        ),
+    )
+    expected = ParserRunner.apply_rules(
+        excel_parser=ExcelParser(
+            excel_filename=test_realistic_excel_filename, sheet_name="Labs"
+        ),
+        sheet_plan=sheet_plan,
+    )
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        parser = ParserRunner.apply_rules(
+            excel_parser=ExcelParser(
+                excel_filename=test_realistic_excel_filename, sheet_name="Labs"
+            ),
+            sheet_plan=sheet_plan,
+            executor=executor,
+            workers=3,
+        )
+
+    pandas.testing.assert_frame_equal(parser.data(), expected.data())
+    pandas.testing.assert_frame_equal(
+        parser.side_sheets()["Number"], expected.side_sheets()["Number"]
+    )
+
+
+def test_apply_rules_shared_chunk_rows(test_realistic_excel_filename, monkeypatch):
+    sheet_plan = SheetPlan(
+        name="Labs",
+        column_name="REPORT",
+        dtype=None,
+        cleaning=(),
+        extracts=(ExtractRule(pattern=r"pH: ?(\d+\.?\d*)", new_column="pH"),),
+    )
+    attach = ExcelParser.attach
+    chunk_rows = []
+
+    def spy(**kwargs):
+        chunk_rows.append(kwargs.get("chunk_rows"))
+        return attach(**kwargs)
+
+    monkeypatch.setattr(ExcelParser, "attach", spy)
+
+    #   Threads, so the workers' calls are seen here.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        ParserRunner.apply_rules(
+            excel_parser=ExcelParser(
+                excel_filename=test_realistic_excel_filename,
+                sheet_name="Labs",
+                chunk_rows=1,
+            ),
+            sheet_plan=sheet_plan,
+            executor=executor,
+            workers=2,
+        )
+
+    #   The workers run the rules in the chunks configured for the sheet.
+    assert chunk_rows == [1, 1]
+
+
+def test_workers_config(tmp_path, test_realistic_excel_filename, monkeypatch):
+    workbook = os.path.join(tmp_path, "patients.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, workbook)
+    config_filename = os.path.join(tmp_path, "patients.xml")
+
+    with open(config_filename, "w") as file:
+        file.write(
+            f"""<workbook>
+                <name>{workbook}</name>
+                <workers>2</workers>
+                <sheet>
+                    <name>Patients</name>
+                    <source_column>
+                        <name>REPORT</name>
+                        <extract>
+                            <pattern>LVIDd:\\s?(\\d+\\.?\\d*)\\s?cm</pattern>
+                            <new_column>LVIDd</new_column>
+                        </extract>
+                    </source_column>
+                </sheet>
+            </workbook>"""
+        )
+
+    runner = ParserRunner(config_filename=config_filename)
+    assert runner.plan().workers == 2
+    assert runner.process()
+
+    monkeypatch.setattr(ParserRunner, "_ParserRunner__plan_cache", {})
+    monkeypatch.setattr(
+        "excelpostprocessor.parser_runner.SHARED_MEMORY_AVAILABLE", False
+    )
+
+    with pytest.raises(SyntaxError):
+        ParserRunner(config_filename=config_filename).plan()
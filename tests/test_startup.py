@@ -0,0 +1,73 @@
+"""
+Module test_startup.py, which makes sure the command line starts quickly:
+'--help' & '--check-config' mustn't import pandas or openpyxl.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from excelpostprocessor.__main__ import check_config
+
+#   Wall-clock time depends on the machine, so the import is only timed against a budget
+#   when one's given, like IMPORT_SECONDS_BUDGET=1.0. Importing pandas alone usually blows through that.
+IMPORT_SECONDS_BUDGET = os.environ.get("IMPORT_SECONDS_BUDGET")
+HEAVY_MODULES = ["numpy", "openpyxl", "pandas"]
+
+
+def _run_python(code: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def test_import_time():
+    measurement = _run_python(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import excelpostprocessor.__main__\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': seconds, 'heavy': heavy}))\n"
+    )
+    print(f"Import took {measurement['seconds']:.3f} s.")
+    assert measurement["heavy"] == []
+
+    if IMPORT_SECONDS_BUDGET:
+        assert measurement["seconds"] < float(IMPORT_SECONDS_BUDGET)
+
+
+def test_check_config_stays_light(test_config_filename):
+    test_dir = os.path.dirname(test_config_filename)
+    measurement = _run_python(
+        "import json, os, sys\n"
+        "from excelpostprocessor.__main__ import main\n"
+        f"os.chdir({test_dir!r})\n"
+        "try:\n"
+        f"    main(['--check-config', '--config', {test_config_filename!r}])\n"
+        "except SystemExit as e:\n"
+        "    code = e.code\n"
+        f"heavy = [m for m in {HEAVY_MODULES} if m in sys.modules]\n"
+        "print(json.dumps({'code': code, 'heavy': heavy}))\n"
+    )
+    assert measurement == {"code": 0, "heavy": []}
+
+
+def test_check_config(
+    test_config_filename,
+    test_config_filename_extract_pattern_missing,
+    test_malformed_config_filename,
+    capsys,
+):
+    assert check_config(config_filename=test_config_filename)
+    assert "1 sheet(s), 9 rule(s)" in capsys.readouterr().out
+    assert not check_config(
+        config_filename=test_config_filename_extract_pattern_missing
+    )
+    assert not check_config(config_filename=test_malformed_config_filename)
@@ -0,0 +1,89 @@
+"""
+Module test_watcher.py, which performs automated testing of the FolderWatcher class.
+"""
+import os
+import shutil
+
+import pytest
+
+from excelpostprocessor.__main__ import watch_rules
+from excelpostprocessor.watcher import FolderWatcher
+
+
+def test_watcher(tmp_path, test_config_filename, test_realistic_excel_filename):
+    existing = os.path.join(tmp_path, "existing.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, existing)
+
+    watcher = FolderWatcher(
+        directory=str(tmp_path),
+        rules=[("echo_*.xlsx", test_config_filename)],
+        debounce_seconds=0,
+    )
+
+    #   Files already there & files not matching a pattern are left alone.
+    arrived = os.path.join(tmp_path, "echo_today.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, arrived)
+    shutil.copyfile(test_realistic_excel_filename, os.path.join(tmp_path, "echo.csv"))
+
+    #   First look starts the debounce clock; the second queues the settled file.
+    assert watcher.poll() == []
+    watcher.poll()
+    results = watcher.wait()
+    assert len(results) == 1
+    assert results[0]["success"]
+    assert results[0]["outputs"] == [os.path.join(tmp_path, "echo_today_Patients.xlsx")]
+
+    #   Our output file matches 'echo_*.xlsx' but isn't processed again,
+    #   and neither is the unchanged workbook.
+    watcher.watch(poll_seconds=0, max_polls=3)
+    assert len(watcher.results()) == 1
+    assert not os.path.exists(os.path.join(tmp_path, "existing_Patients.xlsx"))
+    watcher.close()
+
+
+def test_watcher_outputs(tmp_path, test_config_filename, test_realistic_excel_filename):
+    watcher = FolderWatcher(
+        directory=str(tmp_path),
+        rules=[("*.xlsx", test_config_filename)],
+        debounce_seconds=0,
+    )
+
+    #   Named like an output, but there's no 'clinic.xlsx' it could have come from.
+    clinic = os.path.join(tmp_path, "clinic_Patients.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, clinic)
+
+    #   A file that goes away before it settles is forgotten.
+    gone = os.path.join(tmp_path, "gone.xlsx")
+    shutil.copyfile(test_realistic_excel_filename, gone)
+    watcher.poll()
+    os.remove(gone)
+    watcher.poll()
+    results = watcher.wait()
+    assert [result["source"] for result in results] == [clinic]
+    assert results[0]["outputs"] == [
+        os.path.join(tmp_path, "clinic_Patients_Patients.xlsx")
+    ]
+
+    #   Returns once the output has been recognized, without the vanished file holding it up.
+    watcher.watch(poll_seconds=0, max_polls=2)
+    assert len(watcher.results()) == 1
+    watcher.close()
+
+
+def test_watcher_error(tmp_path, test_config_filename):
+    with pytest.raises(FileNotFoundError):
+        FolderWatcher(
+            directory=os.path.join(tmp_path, "not there"),
+            rules=[("*.xlsx", test_config_filename)],
+        )
+
+    with pytest.raises(TypeError):
+        FolderWatcher(directory=str(tmp_path), rules=[])
+
+    assert watch_rules(matches=None, config_filename="a.xml") == [("*.xlsx", "a.xml")]
+    assert watch_rules(matches=["e*.xlsb=b.xml"], config_filename="a.xml") == [
+        ("e*.xlsb", "b.xml")
+    ]
+
+    with pytest.raises(SyntaxError):
+        watch_rules(matches=["e*.xlsb"], config_filename="a.xml")